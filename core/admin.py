@@ -1,5 +1,12 @@
 from django.contrib import admin
-from .models import Usuario, Categoria, Producto, Movimiento, Venta, DetalleVenta
+from django.db import transaction
+
+from .autenticacion import invalidar_usuario
+from .catalogo import invalidar_catalogo
+from .inventario import aplicar_delta, estado, registrar_ajustes, registrar_cambios, tocar_revision
+from .models import Usuario, Categoria, Producto, Movimiento, Venta, DetalleVenta, BloqueFolio, Ubicacion
+from .sincronizacion import marcar_categoria, registrar_bajas
+from .ubicaciones import quitar_productos
 
 @admin.register(Usuario)
 class UsuarioAdmin(admin.ModelAdmin):
@@ -7,25 +14,145 @@ class UsuarioAdmin(admin.ModelAdmin):
     search_fields = ('email', 'role')
     list_filter = ('role', 'is_staff', 'is_active')
 
+    @transaction.atomic
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        tocar_revision()
+        invalidar_usuario(obj.pk)
+
+    @transaction.atomic
+    def delete_model(self, request, obj):
+        usuario_id = obj.pk
+        super().delete_model(request, obj)
+        tocar_revision()
+        invalidar_usuario(usuario_id)
+
+    @transaction.atomic
+    def delete_queryset(self, request, queryset):
+        ids = list(queryset.values_list('pk', flat=True))
+        super().delete_queryset(request, queryset)
+        tocar_revision()
+        for usuario_id in ids:
+            invalidar_usuario(usuario_id)
+
 @admin.register(Categoria)
 class CategoriaAdmin(admin.ModelAdmin):
     list_display = ('nombre', 'descripcion')
     search_fields = ('nombre',)
 
+    # Los cambios de categorías llegan a las terminales POS por la sincronización
+    @transaction.atomic
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        marcar_categoria(obj)
+        tocar_revision()
+        invalidar_catalogo()
+
+    @transaction.atomic
+    def delete_model(self, request, obj):
+        registrar_bajas('Categoria', [obj.pk])
+        super().delete_model(request, obj)
+        tocar_revision()
+        invalidar_catalogo()
+
+    @transaction.atomic
+    def delete_queryset(self, request, queryset):
+        registrar_bajas('Categoria', list(queryset.values_list('pk', flat=True)))
+        super().delete_queryset(request, queryset)
+        tocar_revision()
+        invalidar_catalogo()
+
 @admin.register(Producto)
 class ProductoAdmin(admin.ModelAdmin):
     list_display = ('sku', 'nombre', 'stock_actual', 'nivel_minimo_stock', 'categoria', 'is_active')
     list_filter = ('categoria', 'is_active')
     search_fields = ('sku', 'nombre')
     list_editable = ('nivel_minimo_stock', 'is_active')
+    # Se mantienen desde core/reservas.py y core/sincronizacion.py
+    readonly_fields = ('stock_reservado', 'version')
+
+    # Las ediciones del admin también mantienen los totales del dashboard
+    @transaction.atomic
+    def save_model(self, request, obj, form, change):
+        antes = estado(Producto.objects.get(pk=obj.pk)) if change else None
+        super().save_model(request, obj, form, change)
+        registrar_ajustes([(obj, antes)], request.user)
+        registrar_cambios([(obj, antes)])
+        invalidar_catalogo()
+
+    @transaction.atomic
+    def delete_model(self, request, obj):
+        antes = estado(obj)
+        quitar_productos([obj])
+        super().delete_model(request, obj)
+        registrar_cambios([(None, antes)])
+        registrar_bajas('Producto', [obj.sku])
+        invalidar_catalogo()
+
+    @transaction.atomic
+    def delete_queryset(self, request, queryset):
+        productos = list(queryset)
+        quitar_productos(productos)
+        super().delete_queryset(request, queryset)
+        registrar_cambios([(None, estado(p)) for p in productos])
+        registrar_bajas('Producto', [p.sku for p in productos])
+        invalidar_catalogo()
+
+@admin.register(Ubicacion)
+class UbicacionAdmin(admin.ModelAdmin):
+    list_display = ('nombre', 'tipo', 'es_principal', 'is_active')
+    list_filter = ('tipo', 'is_active')
+    search_fields = ('nombre',)
+    # La principal la crea la migración y recibe el stock de las rutas sin ubicación
+    readonly_fields = ('es_principal',)
+
+    def has_delete_permission(self, request, obj=None):
+        # Las rutas guardan su id por proceso (ubicaciones.id_principal)
+        if obj is not None and obj.es_principal:
+            return False
+        return super().has_delete_permission(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        super().delete_queryset(request, queryset.exclude(es_principal=True))
+
+    @transaction.atomic
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        tocar_revision()
 
 @admin.register(Movimiento)
 class MovimientoAdmin(admin.ModelAdmin):
-    list_display = ('tipo', 'producto', 'cantidad', 'usuario', 'fecha')
-    list_filter = ('tipo', 'fecha')
+    list_display = ('tipo', 'producto', 'cantidad', 'ubicacion', 'ubicacion_destino', 'usuario', 'fecha')
+    list_filter = ('tipo', 'ubicacion', 'fecha')
     search_fields = ('producto__sku', 'producto__nombre')
     readonly_fields = ('fecha',)
 
+    def _contar(self, movimientos, signo):
+        tipos = [m.tipo for m in movimientos]
+        aplicar_delta(
+            total_entradas=signo * tipos.count('Entrada'),
+            total_salidas=signo * tipos.count('Salida'),
+            revision=1
+        )
+
+    @transaction.atomic
+    def save_model(self, request, obj, form, change):
+        if change:
+            self._contar([Movimiento.objects.get(pk=obj.pk)], -1)
+        super().save_model(request, obj, form, change)
+        self._contar([obj], 1)
+
+    @transaction.atomic
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        self._contar([obj], -1)
+
+    @transaction.atomic
+    def delete_queryset(self, request, queryset):
+        movimientos = list(queryset)
+        super().delete_queryset(request, queryset)
+        self._contar(movimientos, -1)
+
 class DetalleVentaInline(admin.TabularInline):
     model = DetalleVenta
     extra = 0
@@ -38,4 +165,21 @@ class VentaAdmin(admin.ModelAdmin):
     list_filter = ('fecha',)
     search_fields = ('folio',)
     inlines = [DetalleVentaInline]
-    readonly_fields = ('folio', 'fecha', 'total', 'usuario')
\ No newline at end of file
+    readonly_fields = ('folio', 'fecha', 'total', 'usuario')
+
+    # Borrar ventas cambia el listado de /api/ventas/ (ETag)
+    @transaction.atomic
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        tocar_revision()
+
+    @transaction.atomic
+    def delete_queryset(self, request, queryset):
+        super().delete_queryset(request, queryset)
+        tocar_revision()
+
+@admin.register(BloqueFolio)
+class BloqueFolioAdmin(admin.ModelAdmin):
+    list_display = ('prefijo', 'inicio', 'fin', 'proceso', 'fecha')
+    list_filter = ('prefijo',)
+    readonly_fields = ('prefijo', 'inicio', 'fin', 'proceso', 'fecha')
@@ -0,0 +1,45 @@
+"""Conjunto de alertas de stock bajo mantenido por las rutas de escritura.
+
+``inventario.registrar_cambios`` detecta los productos que entran, siguen o
+salen del stock bajo y los pasa a ``actualizar_alertas``, que los guarda con un
+solo upsert marcado con la versión de la transacción (ver core/versiones.py).
+Las pantallas de resurtido leen las alertas activas una vez y después sondean
+con ``desde=<version>`` para recibir solo lo que cambió, incluidas las alertas
+resueltas. Los productos borrados físicamente desde el admin pierden su fila.
+"""
+from .models import AlertaStock
+from .versiones import marca_segura, version_transaccion
+
+CONTADOR = 'alertas_stock'
+CAMPOS_ACTUALIZABLES = ['activa', 'stock', 'minimo', 'version', 'fecha']
+
+
+def actualizar_alertas(cambios):
+    """Guarda ``(producto, en_alerta)``; debe llamarse dentro de la transacción del cambio."""
+    if not cambios:
+        return
+    version = version_transaccion(CONTADOR)
+    AlertaStock.objects.bulk_create(
+        [
+            AlertaStock(producto_id=producto.id, activa=en_alerta, stock=producto.stock_actual,
+                        minimo=producto.nivel_minimo_stock, version=version)
+            for producto, en_alerta in cambios
+        ],
+        update_conflicts=True,
+        unique_fields=['producto'],
+        update_fields=CAMPOS_ACTUALIZABLES,
+    )
+
+
+def listar_alertas(desde=None):
+    """Devuelve ``(marca, filas)``: alertas activas o, con ``desde``, todo lo que cambió."""
+    marca = marca_segura(CONTADOR)
+    alertas = AlertaStock.objects.all()
+    if desde is None:
+        alertas = alertas.filter(activa=True)
+    else:
+        alertas = alertas.filter(version__gte=desde)
+    filas = alertas.order_by('version', 'producto_id').values(
+        'producto_id', 'producto__sku', 'producto__nombre', 'stock', 'minimo', 'activa', 'fecha'
+    )
+    return marca, list(filas)
@@ -0,0 +1,141 @@
+"""Rollups diarios de ventas por producto y por cajero.
+
+``registrar`` actualiza las filas del día con cada venta y el comando
+``reconstruir_analitica`` las recalcula desde ``Venta``/``DetalleVenta``. Los
+endpoints de analítica leen solo estas tablas, que crecen con días x productos
+vendidos y no con el número de líneas de venta.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import DetalleVenta, Venta, VentaDiariaCajero, VentaDiariaProducto
+
+
+def _acumular_productos(fecha, por_producto):
+    ids = sorted(por_producto)
+    existentes = list(
+        VentaDiariaProducto.objects.select_for_update()
+        .filter(fecha=fecha, producto_id__in=ids).order_by('producto_id')
+    )
+    for fila in existentes:
+        unidades, importe, lineas = por_producto.pop(fila.producto_id)
+        fila.unidades += unidades
+        fila.importe += importe
+        fila.lineas += lineas
+    VentaDiariaProducto.objects.bulk_update(existentes, ['unidades', 'importe', 'lineas'])
+    VentaDiariaProducto.objects.bulk_create([
+        VentaDiariaProducto(fecha=fecha, producto_id=producto_id, unidades=u, importe=i, lineas=n)
+        for producto_id, (u, i, n) in por_producto.items()
+    ])
+
+
+def _acumular_cajero(fecha, usuario_id, num_ventas, unidades, importe):
+    cambios = {
+        'num_ventas': F('num_ventas') + num_ventas,
+        'unidades': F('unidades') + unidades,
+        'importe': F('importe') + importe,
+    }
+    filas = VentaDiariaCajero.objects.filter(fecha=fecha, usuario_id=usuario_id)
+    if filas.update(**cambios):
+        return
+    try:
+        with transaction.atomic():
+            VentaDiariaCajero.objects.create(
+                fecha=fecha, usuario_id=usuario_id, num_ventas=num_ventas, unidades=unidades, importe=importe
+            )
+    except IntegrityError:
+        filas.update(**cambios)
+
+
+def registrar_ventas(ventas, detalles):
+    """Suma al rollup del día las ventas y sus detalles recién guardados."""
+    fecha = timezone.localdate()
+
+    por_producto = {}
+    unidades_por_venta = defaultdict(int)
+    for detalle in detalles:
+        unidades, importe, lineas = por_producto.get(detalle.producto_id, (0, Decimal('0'), 0))
+        por_producto[detalle.producto_id] = (
+            unidades + detalle.cantidad,
+            importe + Decimal(str(detalle.subtotal)),
+            lineas + 1,
+        )
+        unidades_por_venta[detalle.venta_id] += detalle.cantidad
+
+    por_cajero = {}
+    for venta in ventas:
+        num, unidades, importe = por_cajero.get(venta.usuario_id, (0, 0, Decimal('0')))
+        por_cajero[venta.usuario_id] = (
+            num + 1, unidades + unidades_por_venta[venta.id], importe + Decimal(str(venta.total))
+        )
+
+    if por_producto:
+        try:
+            with transaction.atomic():
+                _acumular_productos(fecha, dict(por_producto))
+        except IntegrityError:
+            # Otra venta creó alguna de las filas del día al mismo tiempo: ya existen
+            _acumular_productos(fecha, dict(por_producto))
+    for usuario_id, totales in sorted(por_cajero.items(), key=lambda t: t[0] or 0):
+        _acumular_cajero(fecha, usuario_id, *totales)
+
+
+def reconstruir(desde=None, hasta=None):
+    """Recalcula los rollups de ``[desde, hasta)`` (datetimes con zona horaria)."""
+    detalles = DetalleVenta.objects.all()
+    ventas = Venta.objects.all()
+    rollup_productos = VentaDiariaProducto.objects.all()
+    rollup_cajeros = VentaDiariaCajero.objects.all()
+    if desde:
+        detalles = detalles.filter(venta__fecha__gte=desde)
+        ventas = ventas.filter(fecha__gte=desde)
+        rollup_productos = rollup_productos.filter(fecha__gte=timezone.localdate(desde))
+        rollup_cajeros = rollup_cajeros.filter(fecha__gte=timezone.localdate(desde))
+    if hasta:
+        detalles = detalles.filter(venta__fecha__lt=hasta)
+        ventas = ventas.filter(fecha__lt=hasta)
+        rollup_productos = rollup_productos.filter(fecha__lt=timezone.localdate(hasta))
+        rollup_cajeros = rollup_cajeros.filter(fecha__lt=timezone.localdate(hasta))
+
+    with transaction.atomic():
+        rollup_productos.delete()
+        rollup_cajeros.delete()
+
+        filas = (
+            detalles.annotate(dia=TruncDate('venta__fecha'))
+            .values('dia', 'producto_id')
+            .annotate(unidades=Sum('cantidad'), importe=Sum('subtotal'), lineas=Count('id'))
+            .order_by()
+        )
+        lote = []
+        total_productos = 0
+        for fila in filas.iterator(chunk_size=2000):
+            lote.append(VentaDiariaProducto(
+                fecha=fila['dia'], producto_id=fila['producto_id'],
+                unidades=fila['unidades'], importe=fila['importe'], lineas=fila['lineas']
+            ))
+            if len(lote) >= 2000:
+                total_productos += len(VentaDiariaProducto.objects.bulk_create(lote))
+                lote = []
+        total_productos += len(VentaDiariaProducto.objects.bulk_create(lote))
+
+        unidades = {
+            (f['dia'], f['venta__usuario_id']): f['unidades']
+            for f in detalles.annotate(dia=TruncDate('venta__fecha'))
+            .values('dia', 'venta__usuario_id').annotate(unidades=Sum('cantidad')).order_by()
+        }
+        cajeros = [
+            VentaDiariaCajero(
+                fecha=f['dia'], usuario_id=f['usuario_id'], num_ventas=f['num_ventas'],
+                unidades=unidades.get((f['dia'], f['usuario_id']), 0), importe=f['importe']
+            )
+            for f in ventas.annotate(dia=TruncDate('fecha'))
+            .values('dia', 'usuario_id').annotate(num_ventas=Count('id'), importe=Sum('total')).order_by()
+        ]
+        VentaDiariaCajero.objects.bulk_create(cajeros, batch_size=2000)
+    return total_productos, len(cajeros)
@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+
+        from .instrumentacion import instalar
+
+        # Cada conexión nueva cuenta sus consultas para InstrumentacionMiddleware
+        connection_created.connect(instalar, dispatch_uid='core.instrumentacion')
@@ -0,0 +1,117 @@
+"""Autenticación JWT sin consulta a la base en cada petición.
+
+``JWTAuthentication`` de simplejwt carga la fila de ``Usuario`` en cada request.
+``CachedJWTAuthentication`` guarda los pocos campos que usan las vistas (id,
+email, rol, banderas de estado) en la cache de Django con un TTL corto y arma
+el usuario a partir de ellos. Los cambios de rol o la desactivación desde
+``UsuarioViewSet`` o el admin borran la entrada; en el peor caso, con una cache
+por proceso, otro worker ve el cambio al vencer el TTL.
+
+El usuario devuelto es una copia de solo lectura: sirve para permisos y para
+asignarlo como llave foránea, pero ``save`` y ``delete`` lanzan ``TypeError``
+porque guardarlo sobrescribiría con vacíos los campos que no están en la cache.
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from .models import Usuario
+
+CAMPOS = ('id', 'email', 'username', 'role', 'is_active', 'is_staff', 'is_superuser')
+
+
+def _clave(usuario_id):
+    return f'auth:usuario:{usuario_id}'
+
+
+def datos_usuario(usuario_id):
+    clave = _clave(usuario_id)
+    datos = cache.get(clave)
+    if datos is None:
+        datos = Usuario.objects.filter(id=usuario_id).values(*CAMPOS).first()
+        if datos is None:
+            return None
+        cache.set(clave, datos, getattr(settings, 'AUTH_CACHE_TTL', 60))
+    return datos
+
+
+async def adatos_usuario(usuario_id):
+    clave = _clave(usuario_id)
+    datos = await cache.aget(clave)
+    if datos is None:
+        datos = await Usuario.objects.filter(id=usuario_id).values(*CAMPOS).afirst()
+        if datos is None:
+            return None
+        await cache.aset(clave, datos, getattr(settings, 'AUTH_CACHE_TTL', 60))
+    return datos
+
+
+def _solo_lectura(*args, **kwargs):
+    raise TypeError('El usuario autenticado desde la cache es de solo lectura; léelo de la base para modificarlo.')
+
+
+def usuario_desde_datos(datos):
+    usuario = Usuario(**datos)
+    usuario._state.adding = False
+    usuario._state.db = 'default'
+    # Le faltan la contraseña y demás campos: guardarlo los borraría
+    usuario.save = usuario.delete = _solo_lectura
+    return usuario
+
+
+def invalidar_usuario(usuario_id):
+    transaction.on_commit(lambda: cache.delete(_clave(usuario_id)))
+
+
+def validar_datos(datos):
+    if datos is None:
+        raise AuthenticationFailed(_("User not found"), code="user_not_found")
+    if api_settings.CHECK_USER_IS_ACTIVE and not datos['is_active']:
+        raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        # La revocación por cambio de contraseña necesita el hash: usamos la ruta normal
+        if api_settings.CHECK_REVOKE_TOKEN:
+            return super().get_user(validated_token)
+
+        try:
+            usuario_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_("Token contained no recognizable user identification")) from e
+
+        datos = datos_usuario(usuario_id)
+        validar_datos(datos)
+        return usuario_desde_datos(datos)
+
+
+async def autenticar_async(request):
+    """Equivalente async de ``CachedJWTAuthentication.authenticate`` para vistas de Django.
+
+    Devuelve ``None`` si la petición no trae token.
+    """
+    autenticacion = CachedJWTAuthentication()
+    encabezado = autenticacion.get_header(request)
+    if encabezado is None:
+        return None
+    token_crudo = autenticacion.get_raw_token(encabezado)
+    if token_crudo is None:
+        return None
+    token = autenticacion.get_validated_token(token_crudo)
+
+    if api_settings.CHECK_REVOKE_TOKEN:
+        return await sync_to_async(autenticacion.get_user)(token)
+    try:
+        usuario_id = token[api_settings.USER_ID_CLAIM]
+    except KeyError as e:
+        raise InvalidToken(_("Token contained no recognizable user identification")) from e
+
+    datos = await adatos_usuario(usuario_id)
+    validar_datos(datos)
+    return usuario_desde_datos(datos)
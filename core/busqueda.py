@@ -0,0 +1,118 @@
+"""Búsqueda de productos por SKU o nombre para el POS.
+
+En PostgreSQL se usa la base con índices trigram (``pg_trgm``) sobre
+``UPPER(sku)`` y ``UPPER(nombre)``, que son las expresiones que Django genera
+para ``icontains``/``istartswith``. En otros motores (SQLite en desarrollo) se
+usa un índice de prefijos en memoria por proceso que se reconstruye cuando
+cambia la versión del catálogo (``catalogo.version_catalogo``, guardada en la
+base para que la vean todos los workers).
+
+El orden de los resultados es: SKU exacto, SKU que empieza con el texto, nombre
+que empieza con el texto, palabra del nombre que empieza con el texto y, solo
+en PostgreSQL, coincidencias parciales ordenadas por similitud.
+"""
+import re
+import threading
+from bisect import bisect_left
+
+from django.db import connection
+from django.db.models import Case, IntegerField, Q, Value, When
+
+from .catalogo import version_catalogo
+from .models import Producto
+
+RANGO_SKU_EXACTO = 0
+RANGO_SKU_PREFIJO = 1
+RANGO_NOMBRE_PREFIJO = 2
+RANGO_PALABRA_PREFIJO = 3
+RANGO_CONTIENE = 4
+
+MAX_CANDIDATOS = 1000
+
+
+def _buscar_postgres(texto, limite, categoria):
+    from django.contrib.postgres.search import TrigramSimilarity
+
+    productos = Producto.objects.filter(is_active=True).filter(
+        Q(sku__icontains=texto) | Q(nombre__icontains=texto)
+    )
+    if categoria:
+        productos = productos.filter(categoria_id=categoria)
+    productos = productos.annotate(
+        rango=Case(
+            When(sku__iexact=texto, then=Value(RANGO_SKU_EXACTO)),
+            When(sku__istartswith=texto, then=Value(RANGO_SKU_PREFIJO)),
+            When(nombre__istartswith=texto, then=Value(RANGO_NOMBRE_PREFIJO)),
+            # Mismas palabras que el índice en memoria: separadas por espacios
+            When(nombre__iregex=r'\s' + re.escape(texto), then=Value(RANGO_PALABRA_PREFIJO)),
+            default=Value(RANGO_CONTIENE),
+            output_field=IntegerField(),
+        ),
+        similitud=TrigramSimilarity('nombre', texto),
+    ).order_by('rango', '-similitud', 'sku')
+    return list(productos.values_list('id', flat=True)[:limite])
+
+
+class IndicePrefijos:
+    """Lista ordenada de claves (SKU, nombre y cada palabra del nombre) para búsqueda por prefijo."""
+
+    def __init__(self):
+        # Solo un hilo reconstruye; los demás siguen respondiendo con el índice anterior
+        self._construyendo = threading.Lock()
+        self._indice = None
+
+    def _construir(self, version):
+        entradas = []
+        categorias = {}
+        filas = Producto.objects.filter(is_active=True).values_list('id', 'sku', 'nombre', 'categoria_id')
+        for producto_id, sku, nombre, categoria_id in filas.iterator(chunk_size=5000):
+            categorias[producto_id] = categoria_id
+            sku = sku.lower()
+            nombre = nombre.lower()
+            entradas.append((sku, RANGO_SKU_PREFIJO, producto_id))
+            entradas.append((nombre, RANGO_NOMBRE_PREFIJO, producto_id))
+            for palabra in set(nombre.split()[1:]):
+                entradas.append((palabra, RANGO_PALABRA_PREFIJO, producto_id))
+        entradas.sort()
+        return version, [e[0] for e in entradas], entradas, categorias
+
+    def _vigente(self):
+        version = version_catalogo()
+        indice = self._indice
+        if indice is not None and indice[0] == version:
+            return indice
+        # Sin índice todavía hay que esperar al que lo construye
+        if not self._construyendo.acquire(blocking=indice is None):
+            return indice
+        try:
+            if self._indice is None or self._indice[0] != version:
+                # Se arma fuera de cualquier candado de lectura y se publica con una sola asignación
+                self._indice = self._construir(version)
+            return self._indice
+        finally:
+            self._construyendo.release()
+
+    def buscar(self, texto, limite, categoria=None):
+        _, claves, entradas, categorias = self._vigente()
+        texto = texto.lower()
+        mejores = {}
+        i = bisect_left(claves, texto)
+        while i < len(claves) and claves[i].startswith(texto) and len(mejores) < MAX_CANDIDATOS:
+            clave, rango, producto_id = entradas[i]
+            if rango == RANGO_SKU_PREFIJO and clave == texto:
+                rango = RANGO_SKU_EXACTO
+            if categoria is None or categorias.get(producto_id) == categoria:
+                mejores[producto_id] = min(rango, mejores.get(producto_id, rango))
+            i += 1
+        ordenados = sorted(mejores.items(), key=lambda par: (par[1], par[0]))
+        return [producto_id for producto_id, _ in ordenados[:limite]]
+
+
+indice_prefijos = IndicePrefijos()
+
+
+def buscar_productos(texto, limite=20, categoria=None):
+    """Devuelve los ids de productos activos que coinciden, en orden de relevancia."""
+    if connection.vendor == 'postgresql':
+        return _buscar_postgres(texto, limite, categoria)
+    return indice_prefijos.buscar(texto, limite, categoria)
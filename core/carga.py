@@ -0,0 +1,393 @@
+"""Prueba de carga del punto de venta.
+
+Simula N cajeros concurrentes, cada uno en su propio hilo, que registran ventas
+con carritos de tamaño realista, hacen entradas y salidas de almacén y consultan
+el catálogo y el dashboard. La elección de productos sigue una distribución de
+Zipf para reproducir los SKU "calientes" que concentran los candados.
+
+Hay dos transportes: en proceso (``django.test.Client`` contra la base de datos
+configurada, sin servidor) o HTTP contra un servidor ya levantado con ``--url``.
+El reporte incluye rendimiento, percentiles de latencia por endpoint y los
+fallos clasificados: candados (SQLite "database is locked", timeouts de
+PostgreSQL), deadlocks e integridad. Con PostgreSQL además se muestrean las
+esperas de candados en ``pg_locks`` y el contador de deadlocks del servidor.
+
+Se usa con ``python manage.py prueba_carga``.
+"""
+import http.client
+import json
+import logging
+import math
+import random
+import threading
+import time
+from collections import Counter, defaultdict
+from decimal import Decimal
+from urllib.parse import urlencode, urlsplit
+
+from django.contrib.auth.hashers import make_password
+from django.db import connection, connections
+
+from .inventario import reconstruir_resumen
+from .models import Producto, Usuario
+
+MEZCLA_DEFAULT = {'venta': 50, 'entrada': 10, 'salida': 10, 'productos': 15, 'dashboard': 15}
+PREFIJO_SKU = 'CARGA-'
+DOMINIO_CAJEROS = 'prueba.local'
+STOCK_INICIAL = 1_000_000
+
+
+def email_cajero(n):
+    return f'cajero{n:03d}@{DOMINIO_CAJEROS}'
+
+
+def sembrar(cajeros, productos, password):
+    """Crea los cajeros y productos de la prueba que falten. Devuelve cuántos creó de cada uno."""
+    hash_password = make_password(password)
+    existentes = set(Usuario.objects.filter(email__endswith='@' + DOMINIO_CAJEROS).values_list('email', flat=True))
+    nuevos_usuarios = [
+        Usuario(username=email, email=email, password=hash_password, role='Operador')
+        for email in (email_cajero(n) for n in range(cajeros)) if email not in existentes
+    ]
+    Usuario.objects.bulk_create(nuevos_usuarios)
+
+    skus = [f'{PREFIJO_SKU}{i:06d}' for i in range(productos)]
+    existentes = set(Producto.objects.filter(sku__startswith=PREFIJO_SKU).values_list('sku', flat=True))
+    rng = random.Random(0)
+    nuevos_productos = [
+        Producto(sku=sku, nombre=f'Producto de carga {sku[len(PREFIJO_SKU):]}',
+                 costo=Decimal(rng.randint(100, 50000)) / 100, stock_actual=STOCK_INICIAL, nivel_minimo_stock=5)
+        for sku in skus if sku not in existentes
+    ]
+    Producto.objects.bulk_create(nuevos_productos, batch_size=1000)
+    if nuevos_productos:
+        reconstruir_resumen()
+    return len(nuevos_usuarios), len(nuevos_productos)
+
+
+# --- TRANSPORTES ---
+class ClienteLocal:
+    """Peticiones en proceso con el cliente de pruebas de Django."""
+
+    def __init__(self):
+        from django.test import Client
+        self.cliente = Client(raise_request_exception=False, HTTP_HOST='localhost')
+
+    def pedir(self, metodo, ruta, datos=None, token=None):
+        extra = {'HTTP_AUTHORIZATION': f'Bearer {token}'} if token else {}
+        if metodo == 'GET':
+            respuesta = self.cliente.get(ruta, datos, **extra)
+        else:
+            respuesta = self.cliente.post(ruta, json.dumps(datos), content_type='application/json', **extra)
+        texto = respuesta.content.decode('utf-8', 'replace') if not respuesta.streaming else ''
+        # Con un 500 el mensaje útil está en la excepción, no en la página de error
+        if getattr(respuesta, 'exc_info', None):
+            texto = f'{respuesta.exc_info[0].__name__}: {respuesta.exc_info[1]}'
+        return respuesta.status_code, texto
+
+    def cerrar(self):
+        # Cada hilo abre su propia conexión a la base de datos
+        connections.close_all()
+
+
+class ClienteHttp:
+    """Peticiones HTTP con una conexión keep-alive por cajero."""
+
+    def __init__(self, url):
+        partes = urlsplit(url)
+        self.clase = http.client.HTTPSConnection if partes.scheme == 'https' else http.client.HTTPConnection
+        self.host = partes.netloc
+        self.base = partes.path.rstrip('/')
+        self.conexion = None
+
+    def pedir(self, metodo, ruta, datos=None, token=None):
+        encabezados = {'Content-Type': 'application/json'}
+        if token:
+            encabezados['Authorization'] = f'Bearer {token}'
+        cuerpo = None
+        if metodo == 'GET':
+            if datos:
+                ruta = f'{ruta}?{urlencode(datos)}'
+        else:
+            cuerpo = json.dumps(datos)
+
+        for intento in range(2):
+            if self.conexion is None:
+                self.conexion = self.clase(self.host, timeout=60)
+            try:
+                self.conexion.request(metodo, self.base + ruta, body=cuerpo, headers=encabezados)
+                respuesta = self.conexion.getresponse()
+                return respuesta.status, respuesta.read().decode('utf-8', 'replace')
+            except (http.client.HTTPException, OSError):
+                # El servidor pudo cerrar la conexión keep-alive: se reintenta una vez
+                self.conexion.close()
+                self.conexion = None
+                if intento:
+                    raise
+
+    def cerrar(self):
+        if self.conexion is not None:
+            self.conexion.close()
+
+
+# --- CLASIFICACIÓN DE RESULTADOS ---
+def clasificar(status, texto):
+    if 200 <= status < 300:
+        return 'ok'
+    texto = texto.lower()
+    if 'deadlock' in texto:
+        return 'deadlock'
+    if 'database is locked' in texto or 'lock timeout' in texto or 'could not obtain lock' in texto:
+        return 'candado'
+    if 'unique constraint' in texto or 'duplicate key' in texto or 'integrityerror' in texto:
+        return 'integridad'
+    if 'stock insuficiente' in texto:
+        return 'sin_stock'
+    return 'error_5xx' if status >= 500 else 'error_4xx'
+
+
+def percentil(ordenados, p):
+    if not ordenados:
+        return 0.0
+    # Rango más cercano: el menor valor con al menos p% de las muestras a su izquierda
+    return ordenados[max(0, math.ceil(p / 100 * len(ordenados)) - 1)]
+
+
+class Resultados:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencias = defaultdict(list)
+        self.clases = defaultdict(Counter)
+        self.ejemplos = {}
+
+    def agregar(self, endpoint, segundos, clase, texto):
+        with self.lock:
+            self.latencias[endpoint].append(segundos)
+            self.clases[endpoint][clase] += 1
+            if clase not in ('ok', 'sin_stock') and clase not in self.ejemplos:
+                self.ejemplos[clase] = f'{endpoint}: {texto[:300]}'
+
+
+class MonitorCandados(threading.Thread):
+    """Muestrea en PostgreSQL cuántas sesiones esperan un candado."""
+
+    # Las esperas por filas son candados de tipo transactionid, sin base de datos:
+    # se filtra por las sesiones conectadas a esta base
+    CONSULTA = (
+        "SELECT count(DISTINCT pid) FROM pg_locks WHERE NOT granted AND pid IN "
+        "(SELECT pid FROM pg_stat_activity WHERE datname = current_database())"
+    )
+
+    def __init__(self, intervalo=0.05):
+        super().__init__(daemon=True)
+        self.intervalo = intervalo
+        self.detener = threading.Event()
+        self.muestras = []
+
+    def run(self):
+        try:
+            with connection.cursor() as cursor:
+                while not self.detener.is_set():
+                    cursor.execute(self.CONSULTA)
+                    self.muestras.append(cursor.fetchone()[0])
+                    self.detener.wait(self.intervalo)
+        finally:
+            connection.close()
+
+    def reporte(self):
+        if not self.muestras:
+            return {}
+        return {
+            'muestras': len(self.muestras),
+            'esperandoPromedio': round(sum(self.muestras) / len(self.muestras), 2),
+            'esperandoMaximo': max(self.muestras),
+            'fraccionConEspera': round(sum(1 for m in self.muestras if m) / len(self.muestras), 3),
+        }
+
+
+def deadlocks_servidor():
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT deadlocks FROM pg_stat_database WHERE datname = current_database()")
+        return cursor.fetchone()[0]
+
+
+# --- PRUEBA ---
+class PruebaCarga:
+    def __init__(self, cajeros=10, duracion=20.0, operaciones=None, mezcla=None, sesgo=1.1,
+                 carrito_medio=4, url=None, password='carga', semilla=1):
+        self.cajeros = cajeros
+        self.duracion = duracion
+        self.operaciones = operaciones
+        self.mezcla = mezcla or dict(MEZCLA_DEFAULT)
+        self.sesgo = sesgo
+        self.carrito_medio = carrito_medio
+        self.url = url
+        self.password = password
+        self.semilla = semilla
+        self.resultados = Resultados()
+        self.productos = []
+        self.fallos_inicio = []
+
+    def _cliente(self):
+        return ClienteHttp(self.url) if self.url else ClienteLocal()
+
+    def _login(self, cliente, n):
+        status, texto = cliente.pedir('POST', '/api/login', {'email': email_cajero(n), 'password': self.password})
+        if status != 200:
+            raise RuntimeError(f'No se pudo iniciar sesión como {email_cajero(n)} ({status}): {texto[:200]}')
+        return json.loads(texto)['access']
+
+    def _cargar_productos(self, cliente, token):
+        """Lista de ``(id, sku, costo)`` de los productos de la prueba, leída desde la API."""
+        productos = []
+        params = {'limite': 500}
+        while True:
+            status, texto = cliente.pedir('GET', '/api/productos/', params, token)
+            if status != 200:
+                raise RuntimeError(f'No se pudo leer el catálogo ({status}): {texto[:200]}')
+            datos = json.loads(texto)
+            productos.extend(
+                (p['ID_Producto'], p['SKU'], float(p['Costo']))
+                for p in datos['resultados'] if p['SKU'].startswith(PREFIJO_SKU)
+            )
+            if not datos['siguienteCursor']:
+                return productos
+            params['cursor'] = datos['siguienteCursor']
+
+    def _pesos_acumulados(self):
+        acumulado, pesos = 0.0, []
+        for rango in range(len(self.productos)):
+            acumulado += 1 / (rango + 1) ** self.sesgo
+            pesos.append(acumulado)
+        return pesos
+
+    def _operacion(self, cliente, token, rng, tipo, acumulados):
+        elegir = lambda: rng.choices(self.productos, cum_weights=acumulados)[0]
+        if tipo == 'venta':
+            tamano = min(1 + int(rng.expovariate(1 / max(self.carrito_medio - 1, 0.1))), 40)
+            items = [elegir() for _ in range(tamano)]
+            datos = {
+                'items': [
+                    {'id_producto': pid, 'cantidad': rng.randint(1, 3), 'precio': costo}
+                    for pid, _, costo in items
+                ],
+            }
+            datos['total'] = round(sum(i['cantidad'] * i['precio'] for i in datos['items']), 2)
+            return cliente.pedir('POST', '/api/ventas/registrar/', datos, token)
+        if tipo in ('entrada', 'salida'):
+            _, sku, _ = elegir()
+            return cliente.pedir('POST', f'/api/movimientos/{tipo}', {'SKU': sku, 'Cantidad': rng.randint(1, 20)}, token)
+        if tipo == 'productos':
+            return cliente.pedir('GET', '/api/productos/', {'limite': 100}, token)
+        return cliente.pedir('GET', '/api/dashboard/metrics', None, token)
+
+    def _cajero(self, n, barrera, fin):
+        cliente = self._cliente()
+        rng = random.Random(self.semilla * 1000 + n)
+        tipos, pesos = list(self.mezcla), list(self.mezcla.values())
+        try:
+            try:
+                token = self._login(cliente, n)
+                if n == 0:
+                    self.productos = self._cargar_productos(cliente, token)
+            except Exception as e:
+                self.fallos_inicio.append(str(e))
+                token = None
+            barrera.wait()
+            if token is None or not self.productos:
+                return
+            acumulados = self._pesos_acumulados()
+
+            hechas = 0
+            while time.monotonic() < fin[0] and (self.operaciones is None or hechas < self.operaciones):
+                tipo = rng.choices(tipos, weights=pesos)[0]
+                inicio = time.perf_counter()
+                try:
+                    status, texto = self._operacion(cliente, token, rng, tipo, acumulados)
+                except Exception as e:
+                    status, texto = 599, f'{type(e).__name__}: {e}'
+                self.resultados.agregar(tipo, time.perf_counter() - inicio, clasificar(status, texto), texto)
+                hechas += 1
+        finally:
+            cliente.cerrar()
+
+    def ejecutar(self):
+        es_postgres = connection.vendor == 'postgresql'
+        deadlocks_antes = deadlocks_servidor() if es_postgres else None
+        if not self.url:
+            # Los hilos abren sus propias conexiones; la del hilo principal no se usa
+            connection.close()
+
+        # Todos inician sesión y esperan en la barrera antes de arrancar el reloj
+        barrera = threading.Barrier(self.cajeros + 1)
+        # En proceso cada error 500 imprimiría su traceback; ya se cuentan en el reporte
+        registro = logging.getLogger('django.request')
+        nivel = registro.level
+        if not self.url:
+            registro.setLevel(logging.CRITICAL)
+        try:
+            return self._correr(barrera, es_postgres, deadlocks_antes)
+        finally:
+            registro.setLevel(nivel)
+
+    def _correr(self, barrera, es_postgres, deadlocks_antes):
+        fin = [float('inf')]
+        hilos = [threading.Thread(target=self._cajero, args=(n, barrera, fin)) for n in range(self.cajeros)]
+        for hilo in hilos:
+            hilo.start()
+        barrera.wait()
+        if self.fallos_inicio or not self.productos:
+            fin[0] = 0
+            for hilo in hilos:
+                hilo.join()
+            motivo = self.fallos_inicio[0] if self.fallos_inicio else (
+                f'No hay productos {PREFIJO_SKU}*; ejecuta con --sembrar.')
+            raise RuntimeError(motivo)
+
+        monitor = MonitorCandados() if es_postgres else None
+        if monitor:
+            monitor.start()
+        inicio = time.monotonic()
+        fin[0] = inicio + self.duracion
+        for hilo in hilos:
+            hilo.join()
+        transcurrido = time.monotonic() - inicio
+        if monitor:
+            monitor.detener.set()
+            monitor.join()
+
+        reporte = self.reporte(transcurrido)
+        reporte['baseDatos'] = connection.vendor if not self.url else None
+        if monitor:
+            reporte['candados'] = monitor.reporte()
+            reporte['candados']['deadlocksServidor'] = deadlocks_servidor() - deadlocks_antes
+        return reporte
+
+    def reporte(self, transcurrido):
+        endpoints = {}
+        total_ops = 0
+        totales = Counter()
+        for endpoint, latencias in sorted(self.resultados.latencias.items()):
+            ordenadas = sorted(latencias)
+            clases = self.resultados.clases[endpoint]
+            total_ops += len(ordenadas)
+            totales.update(clases)
+            endpoints[endpoint] = {
+                'operaciones': len(ordenadas),
+                'porSegundo': round(len(ordenadas) / transcurrido, 1),
+                'p50ms': round(percentil(ordenadas, 50) * 1000, 1),
+                'p95ms': round(percentil(ordenadas, 95) * 1000, 1),
+                'p99ms': round(percentil(ordenadas, 99) * 1000, 1),
+                'maxms': round(ordenadas[-1] * 1000, 1),
+                'resultados': dict(clases),
+            }
+        return {
+            'cajeros': self.cajeros,
+            'segundos': round(transcurrido, 2),
+            'operaciones': total_ops,
+            'porSegundo': round(total_ops / transcurrido, 1) if transcurrido else 0,
+            'resultados': dict(totales),
+            'endpoints': endpoints,
+            'ejemplosError': self.resultados.ejemplos,
+        }
+
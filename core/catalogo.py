@@ -0,0 +1,151 @@
+"""Ruta rápida de lectura del catálogo de productos.
+
+Construye las mismas filas que ``ProductoSerializer`` directamente desde un
+``values()`` con la categoría unida, sin instanciar modelos ni recorrer los
+campos del serializador. La prueba de paridad en ``core/tests.py`` verifica que
+ambas salidas coinciden.
+
+También concentra la versión del catálogo y la cache de SKU por proceso que
+usan la búsqueda y la resolución de carritos escaneados.
+"""
+import threading
+import time
+from decimal import Decimal
+
+from django.conf import settings
+
+from .models import ContadorVersion, Producto
+
+CAMPOS = (
+    'id', 'sku', 'nombre', 'descripcion', 'costo', 'stock_actual',
+    'nivel_minimo_stock', 'categoria_id', 'categoria__nombre',
+)
+
+CAMPOS_SIN_STOCK = tuple(campo for campo in CAMPOS if campo != 'stock_actual')
+
+CENTAVOS = Decimal('0.01')
+
+
+def fila_producto(valores):
+    fila = {
+        'ID_Producto': valores['id'],
+        'SKU': valores['sku'],
+        'Nombre_Producto': valores['nombre'],
+        'Descripcion': valores['descripcion'],
+        'Costo': str(valores['costo'].quantize(CENTAVOS)),
+        'Stock_Actual': valores['stock_actual'],
+        'Nivel_Minimo_Stock': valores['nivel_minimo_stock'],
+    }
+    # El serializador omite ambos campos cuando el producto no tiene categoría
+    if valores['categoria_id'] is not None:
+        fila['Nombre_Categoria'] = valores['categoria__nombre']
+        fila['categoria_id'] = valores['categoria_id']
+    return fila
+
+
+def filas_productos(queryset):
+    return [fila_producto(v) for v in queryset.values(*CAMPOS)]
+
+
+def con_ubicaciones(params):
+    """``?ubicaciones=true`` agrega a cada fila su stock por ubicación."""
+    return params.get('ubicaciones', '').lower() in ('true', '1')
+
+
+def filtrar_catalogo(params):
+    """Productos según ``activo`` (true, false o todos) y ``categoria``."""
+    activo = params.get('activo', 'true').lower()
+    if activo == 'todos':
+        queryset = Producto.objects.all()
+    else:
+        queryset = Producto.objects.filter(is_active=activo not in ('false', '0'))
+
+    categoria = params.get('categoria')
+    if categoria:
+        if not categoria.isdigit():
+            raise ValueError('La categoría debe ser un id numérico.')
+        queryset = queryset.filter(categoria_id=categoria)
+    return queryset
+
+
+# --- VERSIÓN DEL CATÁLOGO ---
+# Las cachés por proceso (índice de búsqueda, cache de SKU) guardan la versión con
+# la que se construyeron y se descartan cuando cambia. La versión es una fila de
+# ``ContadorVersion`` que se escribe en la misma transacción que el cambio, así
+# que todos los workers la ven al confirmarse, con cualquier backend de cache. Solo
+# la cambian los datos del catálogo (SKU, nombre, categoría, alta/baja): el stock
+# no se guarda en estas cachés.
+CONTADOR_CACHE = 'cache_catalogo'
+
+
+def version_catalogo():
+    return ContadorVersion.objects.filter(nombre=CONTADOR_CACHE).values_list('valor', flat=True).first()
+
+
+def invalidar_catalogo():
+    """Invalida las cachés del catálogo; los demás workers lo ven al confirmar la transacción."""
+    # Un valor nuevo y no un contador: una transacción revertida no deja una versión repetible
+    ContadorVersion.objects.bulk_create(
+        [ContadorVersion(nombre=CONTADOR_CACHE, valor=time.time_ns())],
+        update_conflicts=True, unique_fields=['nombre'], update_fields=['valor'],
+    )
+
+
+# --- CACHE DE SKU POR PROCESO ---
+class CacheSkus:
+    """Datos de catálogo por SKU, válidos mientras no cambie la versión del catálogo.
+
+    El stock no se guarda: cambia con cada venta y vaciaría la cache, así que se
+    lee en cada llamada con una consulta por id.
+    """
+    MAX_ENTRADAS = 50000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._filas = {}
+
+    def obtener(self, skus):
+        """Devuelve ``{sku: (fila, activo)}`` para los SKU que existen."""
+        version = version_catalogo()
+        with self._lock:
+            if self._version != version or len(self._filas) > self.MAX_ENTRADAS:
+                self._filas = {}
+                self._version = version
+            encontrados = {sku: self._filas[sku] for sku in skus if sku in self._filas}
+
+        faltantes = [sku for sku in skus if sku not in encontrados]
+        if faltantes:
+            nuevos = {
+                v['sku']: v for v in Producto.objects.filter(sku__in=faltantes).values(*CAMPOS_SIN_STOCK, 'is_active')
+            }
+            # Los SKU inexistentes también se recuerdan (None): crear uno invalida la versión
+            with self._lock:
+                if self._version == version:
+                    for sku in faltantes:
+                        self._filas[sku] = nuevos.get(sku)
+            encontrados.update(nuevos)
+
+        encontrados = {sku: valores for sku, valores in encontrados.items() if valores is not None}
+        stocks = dict(Producto.objects.filter(
+            id__in=[valores['id'] for valores in encontrados.values()]
+        ).values_list('id', 'stock_actual'))
+        # Un producto borrado después de llenar la cache ya no tiene stock que leer
+        return {
+            sku: (fila_producto({**valores, 'stock_actual': stocks[valores['id']]}), valores['is_active'])
+            for sku, valores in encontrados.items() if valores['id'] in stocks
+        }
+
+
+def consultar_skus(skus):
+    filas = Producto.objects.filter(sku__in=skus).values(*CAMPOS, 'is_active')
+    return {v['sku']: (fila_producto(v), v['is_active']) for v in filas}
+
+
+cache_skus = CacheSkus()
+
+
+def resolver_skus(skus):
+    if getattr(settings, 'CATALOGO_CACHE_SKUS', False):
+        return cache_skus.obtener(skus)
+    return consultar_skus(skus)
@@ -0,0 +1,135 @@
+"""Cierres periódicos de stock y consultas de "stock a una fecha".
+
+Un cierre guarda el stock y costo de cada producto a una fecha de corte. Para
+conocer el stock en cualquier otra fecha se parte del cierre más cercano y se
+aplican solo los movimientos entre ese corte y la fecha pedida, en lugar de
+recorrer todo el Kardex del producto.
+
+Modifican el stock en el Kardex las Entradas y Salidas y los ajustes que
+dejan las rutas que fijan el stock directamente (``inventario.registrar_ajustes``);
+'Creacion' y 'Eliminacion' registran altas y bajas lógicas.
+"""
+from datetime import datetime, time
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import CierreStock, Movimiento, Producto, SnapshotStock
+
+TAMANO_LOTE = 2000
+
+TIPOS_CON_STOCK = ['Entrada', 'Salida', 'AjusteEntrada', 'AjusteSalida']
+
+
+def _efecto():
+    return Case(
+        When(tipo__in=['Entrada', 'AjusteEntrada'], then=F('cantidad')),
+        When(tipo__in=['Salida', 'AjusteSalida'], then=-F('cantidad')),
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+
+
+def deltas_por_producto(desde=None, hasta=None, producto_ids=None):
+    """Cambio neto de stock por producto en el intervalo ``(desde, hasta]``."""
+    movimientos = Movimiento.objects.filter(tipo__in=TIPOS_CON_STOCK, producto__isnull=False)
+    if desde is not None:
+        movimientos = movimientos.filter(fecha__gt=desde)
+    if hasta is not None:
+        movimientos = movimientos.filter(fecha__lte=hasta)
+    if producto_ids is not None:
+        movimientos = movimientos.filter(producto_id__in=producto_ids)
+    return dict(
+        movimientos.values('producto_id').annotate(delta=Sum(_efecto())).values_list('producto_id', 'delta')
+    )
+
+
+def corte_por_defecto(tipo, ahora=None):
+    """Diario: medianoche de hoy. Mensual: medianoche del primer día del mes."""
+    hoy = timezone.localdate(ahora or timezone.now())
+    if tipo == 'Mensual':
+        hoy = hoy.replace(day=1)
+    return timezone.make_aware(datetime.combine(hoy, time.min))
+
+
+def cerrar_periodo(tipo, fecha_corte=None):
+    if tipo not in dict(CierreStock.TIPOS):
+        raise ValueError("El tipo debe ser 'Diario' o 'Mensual'.")
+    fecha_corte = fecha_corte or corte_por_defecto(tipo)
+    if fecha_corte > timezone.now():
+        raise ValueError('La fecha de corte no puede estar en el futuro.')
+    if CierreStock.objects.filter(fecha_corte=fecha_corte).exists():
+        raise ValueError('Ya existe un cierre para esa fecha de corte.')
+
+    # El stock al corte es el actual menos lo que se movió después. Ambos valores
+    # se leen en una sola sentencia para que una venta concurrente no los desfase.
+    posteriores = (
+        Movimiento.objects
+        .filter(producto=OuterRef('pk'), fecha__gt=fecha_corte, tipo__in=TIPOS_CON_STOCK)
+        .values('producto')
+        .annotate(delta=Sum(_efecto()))
+        .values('delta')
+    )
+    productos = (
+        Producto.objects
+        .filter(fecha_creacion__lte=fecha_corte)
+        .annotate(posterior=Coalesce(Subquery(posteriores), Value(0)))
+        .values_list('id', 'stock_actual', 'posterior', 'costo', 'is_active')
+        .order_by('id')
+    )
+
+    with transaction.atomic():
+        cierre = CierreStock.objects.create(tipo=tipo, fecha_corte=fecha_corte)
+        lote = []
+        for producto_id, stock, posterior, costo, activo in productos.iterator(chunk_size=TAMANO_LOTE):
+            lote.append(SnapshotStock(
+                cierre=cierre, producto_id=producto_id, stock=stock - posterior, costo=costo, activo=activo
+            ))
+            if len(lote) >= TAMANO_LOTE:
+                SnapshotStock.objects.bulk_create(lote)
+                lote = []
+        SnapshotStock.objects.bulk_create(lote)
+    return cierre
+
+
+def stock_en_fecha(fecha, producto_ids=None):
+    """Devuelve ``({producto_id: (stock, costo, activo)}, cierre_usado)`` a la fecha dada."""
+    snapshots = SnapshotStock.objects.all()
+    actuales = Producto.objects.filter(fecha_creacion__lte=fecha)
+    if producto_ids is not None:
+        snapshots = snapshots.filter(producto_id__in=producto_ids)
+        actuales = actuales.filter(id__in=producto_ids)
+
+    anterior = CierreStock.objects.filter(fecha_corte__lte=fecha).order_by('-fecha_corte').first()
+    siguiente = None
+    if anterior is None:
+        siguiente = CierreStock.objects.filter(fecha_corte__gt=fecha).order_by('fecha_corte').first()
+
+    resultado = {}
+    if anterior is not None:
+        # Hacia adelante: cierre anterior + movimientos (corte, fecha]
+        delta = deltas_por_producto(anterior.fecha_corte, fecha, producto_ids)
+        for producto_id, stock, costo, activo in snapshots.filter(cierre=anterior).values_list(
+                'producto_id', 'stock', 'costo', 'activo'):
+            resultado[producto_id] = (stock + delta.get(producto_id, 0), costo, activo)
+        # Productos creados después del cierre: se calculan hacia atrás desde el stock actual
+        actuales = actuales.filter(fecha_creacion__gt=anterior.fecha_corte)
+    elif siguiente is not None:
+        # Hacia atrás: cierre siguiente - movimientos (fecha, corte]
+        delta = deltas_por_producto(fecha, siguiente.fecha_corte, producto_ids)
+        for producto_id, stock, costo, activo in snapshots.filter(
+                cierre=siguiente, producto__fecha_creacion__lte=fecha).values_list(
+                'producto_id', 'stock', 'costo', 'activo'):
+            resultado[producto_id] = (stock - delta.get(producto_id, 0), costo, activo)
+        return resultado, siguiente
+
+    if anterior is None:
+        # Sin cierres: hacia atrás desde el stock actual
+        delta = deltas_por_producto(fecha, None, producto_ids)
+    else:
+        delta = deltas_por_producto(fecha, None, actuales.values('id'))
+    for producto_id, stock, costo, activo in actuales.values_list('id', 'stock_actual', 'costo', 'is_active'):
+        resultado[producto_id] = (stock - delta.get(producto_id, 0), costo, activo)
+    return resultado, anterior
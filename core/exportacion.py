@@ -0,0 +1,58 @@
+"""Exportaciones en streaming (CSV o NDJSON) para contabilidad.
+
+Las filas se leen con ``QuerySet.iterator()`` en bloques y se escriben a la
+respuesta conforme se generan, así que la memoria del worker no depende del
+número de filas exportadas.
+"""
+import csv
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.http import StreamingHttpResponse
+
+TAMANO_BLOQUE = 2000
+
+FORMATOS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+class _Eco:
+    """Pseudo-buffer para csv.writer: devuelve la línea en vez de guardarla."""
+
+    def write(self, valor):
+        return valor
+
+
+def _texto(valor):
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    if isinstance(valor, Decimal):
+        return str(valor)
+    return valor
+
+
+def _lineas_csv(encabezados, filas):
+    escritor = csv.writer(_Eco())
+    yield escritor.writerow(encabezados)
+    for fila in filas:
+        yield escritor.writerow([_texto(v) for v in fila])
+
+
+def _lineas_ndjson(encabezados, filas):
+    for fila in filas:
+        yield json.dumps(dict(zip(encabezados, fila)), default=_texto, ensure_ascii=False) + '\n'
+
+
+def respuesta_exportacion(nombre, encabezados, queryset, formato='csv'):
+    """Construye la respuesta en streaming a partir de un queryset de ``values_list``."""
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato no soportado: {formato}")
+
+    filas = queryset.iterator(chunk_size=TAMANO_BLOQUE)
+    generador = _lineas_csv if formato == 'csv' else _lineas_ndjson
+    respuesta = StreamingHttpResponse(generador(encabezados, filas), content_type=FORMATOS[formato])
+    respuesta['Content-Disposition'] = f'attachment; filename="{nombre}.{formato}"'
+    return respuesta
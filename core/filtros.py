@@ -0,0 +1,62 @@
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .ubicaciones import filtro_ubicacion
+
+
+def parsear_fecha(valor, fin_de_dia=False):
+    """Convierte 'AAAA-MM-DD' o un datetime ISO en un datetime con zona horaria.
+
+    Con ``fin_de_dia`` una fecha sin hora se interpreta como el inicio del día
+    siguiente, para usarla como límite exclusivo (``__lt``) sin castear la columna.
+    """
+    if not valor:
+        return None
+
+    fecha_hora = parse_datetime(valor)
+    if fecha_hora is None:
+        fecha = parse_date(valor)
+        if fecha is None:
+            raise ValueError(f"Fecha inválida: {valor}")
+        if fin_de_dia:
+            fecha += timedelta(days=1)
+        fecha_hora = datetime.combine(fecha, time.min)
+
+    if timezone.is_naive(fecha_hora):
+        fecha_hora = timezone.make_aware(fecha_hora)
+    return fecha_hora
+
+
+def filtrar_rango_fechas(queryset, params, campo='fecha'):
+    """Aplica ``fecha_desde`` (inclusivo) y ``fecha_hasta`` (inclusivo por día) al queryset."""
+    desde = parsear_fecha(params.get('fecha_desde'))
+    if desde:
+        queryset = queryset.filter(**{f'{campo}__gte': desde})
+
+    hasta_crudo = params.get('fecha_hasta')
+    if hasta_crudo:
+        hasta = parsear_fecha(hasta_crudo, fin_de_dia=True)
+        # Con hora explícita el límite es inclusivo; con solo fecha abarca el día completo
+        lookup = 'lte' if parse_datetime(hasta_crudo) else 'lt'
+        queryset = queryset.filter(**{f'{campo}__{lookup}': hasta})
+    return queryset
+
+
+def filtrar_movimientos(queryset, params, usuario):
+    """Filtros del Kardex; un Operador solo ve sus propios movimientos."""
+    es_superadmin = usuario.role == 'Superadmin'
+    if not es_superadmin:
+        queryset = queryset.filter(usuario_id=usuario.id)
+
+    queryset = filtrar_rango_fechas(queryset, params)
+    if params.get('tipo'):
+        queryset = queryset.filter(tipo=params['tipo'])
+    if params.get('sku'):
+        queryset = queryset.filter(producto__sku=params['sku'])
+    if params.get('usuario') and es_superadmin:
+        queryset = queryset.filter(usuario__email=params['usuario'])
+    if params.get('ubicacion'):
+        queryset = queryset.filter(filtro_ubicacion(params['ubicacion']))
+    return queryset
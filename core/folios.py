@@ -0,0 +1,98 @@
+"""Asignación de folios de venta por bloques.
+
+Cada proceso reserva en la base de datos un rango de números consecutivos
+(``TAMANO_BLOQUE``) y los entrega desde memoria, de modo que la mayoría de las
+ventas obtienen su folio sin consultar la base. Cada bloque queda registrado en
+``BloqueFolio`` para poder auditar los números que nunca se usaron (ventas
+fallidas o procesos que terminaron con el bloque a medias).
+
+La reserva se confirma en su propia transacción, por lo que debe pedirse el
+folio *antes* de abrir la transacción de la venta: si la venta se revierte, el
+bloque sigue reservado y no se vuelve a entregar.
+"""
+import os
+import socket
+import threading
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import BloqueFolio, SecuenciaFolio
+
+DIGITOS = 8
+
+
+def _config():
+    config = {
+        'PREFIJO': 'V',
+        'TAMANO_BLOQUE': 50,
+        'PREFIJOS_CAJA': {},
+    }
+    config.update(getattr(settings, 'FOLIOS', {}))
+    return config
+
+
+def formatear(prefijo, numero):
+    return f"{prefijo}-{numero:0{DIGITOS}d}"
+
+
+def prefijo_para(caja=None):
+    """Devuelve el prefijo configurado para una caja o sucursal."""
+    config = _config()
+    if caja in (None, ''):
+        return config['PREFIJO']
+    try:
+        return config['PREFIJOS_CAJA'][caja]
+    except KeyError:
+        raise ValueError(f"Caja no registrada: {caja}")
+
+
+def reservar_bloque(prefijo, tamano):
+    """Reserva ``tamano`` números para ``prefijo`` y devuelve ``(inicio, fin)``."""
+    with transaction.atomic():
+        secuencia, _ = SecuenciaFolio.objects.select_for_update().get_or_create(prefijo=prefijo)
+        inicio = secuencia.siguiente
+        fin = inicio + tamano - 1
+        secuencia.siguiente = fin + 1
+        secuencia.save(update_fields=['siguiente'])
+        BloqueFolio.objects.create(
+            prefijo=prefijo,
+            inicio=inicio,
+            fin=fin,
+            proceso=f"{socket.gethostname()}:{os.getpid()}"
+        )
+    return inicio, fin
+
+
+class AsignadorFolios:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._bloques = {}  # prefijo -> [siguiente, fin]
+
+    def siguiente(self, prefijo):
+        with self._lock:
+            # Un proceso hijo (fork) no debe reutilizar el bloque del padre
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._bloques = {}
+
+            bloque = self._bloques.get(prefijo)
+            if bloque is None or bloque[0] > bloque[1]:
+                inicio, fin = reservar_bloque(prefijo, _config()['TAMANO_BLOQUE'])
+                bloque = self._bloques[prefijo] = [inicio, fin]
+
+            numero = bloque[0]
+            bloque[0] += 1
+            return formatear(prefijo, numero)
+
+    def reiniciar(self):
+        with self._lock:
+            self._bloques = {}
+
+
+asignador = AsignadorFolios()
+
+
+def siguiente_folio(caja=None):
+    return asignador.siguiente(prefijo_para(caja))
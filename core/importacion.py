@@ -0,0 +1,243 @@
+"""Importación masiva de productos desde CSV o NDJSON.
+
+El archivo se lee fila por fila y se procesa en lotes: cada lote resuelve sus
+SKU existentes con una sola consulta, inserta y actualiza productos con
+sentencias masivas y registra los movimientos de 'Creacion' de una vez. La
+memoria usada depende del tamaño del lote, no del tamaño del archivo.
+
+Las columnas son las mismas que usa la API: SKU, Nombre_Producto, Descripcion,
+Costo, Stock_Actual, Nivel_Minimo_Stock y Nombre_Categoria. Los productos que
+ya existen y están activos solo actualizan sus datos de catálogo; el stock se
+modifica únicamente al crearlos o reactivarlos, igual que en la API.
+"""
+import csv
+import json
+from decimal import Decimal, InvalidOperation
+
+from django.db import DatabaseError, transaction
+
+from .catalogo import invalidar_catalogo
+from .inventario import estado, registrar_ajustes, registrar_cambios
+from .models import Categoria, Movimiento, Producto
+from .sincronizacion import CONTADOR as CONTADOR_CATALOGO
+from .versiones import version_transaccion
+
+TAMANO_LOTE = 1000
+MAX_ERRORES = 1000
+
+CAMPOS_ACTUALIZABLES = ['nombre', 'descripcion', 'costo', 'nivel_minimo_stock', 'categoria']
+
+
+def leer_filas(archivo, formato):
+    """Genera ``(numero_fila, datos)``; ``datos`` es un ``ValueError`` si la fila no se pudo leer."""
+    if formato == 'csv':
+        lector = csv.DictReader(archivo)
+        for fila in lector:
+            yield lector.line_num, fila
+    elif formato == 'ndjson':
+        for numero, linea in enumerate(archivo, start=1):
+            if not linea.strip():
+                continue
+            try:
+                fila = json.loads(linea)
+            except ValueError:
+                yield numero, ValueError('JSON inválido.')
+                continue
+            if not isinstance(fila, dict):
+                yield numero, ValueError('Cada línea debe ser un objeto JSON.')
+                continue
+            yield numero, fila
+    else:
+        raise ValueError(f"Formato no soportado: {formato}")
+
+
+def _entero(valor, campo, default):
+    if valor in (None, ''):
+        return default
+    try:
+        numero = int(valor)
+    except (TypeError, ValueError):
+        raise ValueError(f"{campo} debe ser un número entero.")
+    if numero < 0:
+        raise ValueError(f"{campo} no puede ser negativo.")
+    return numero
+
+
+def validar_fila(fila):
+    sku = str(fila.get('SKU') or '').strip()
+    nombre = str(fila.get('Nombre_Producto') or '').strip()
+    if not sku:
+        raise ValueError('SKU es obligatorio.')
+    if not nombre:
+        raise ValueError('Nombre_Producto es obligatorio.')
+    if len(sku) > 50:
+        raise ValueError('SKU excede 50 caracteres.')
+
+    try:
+        costo = Decimal(str(fila.get('Costo'))).quantize(Decimal('0.01'))
+    except (InvalidOperation, ValueError):
+        raise ValueError('Costo inválido.')
+    # NaN pasa por quantize, pero no se puede comparar
+    if not costo.is_finite():
+        raise ValueError('Costo inválido.')
+    if costo < 0 or costo >= Decimal('1e8'):
+        raise ValueError('Costo fuera de rango.')
+
+    categoria = str(fila.get('Nombre_Categoria') or '').strip() or None
+    return {
+        'sku': sku,
+        'nombre': nombre[:150],
+        'descripcion': fila.get('Descripcion') or None,
+        'costo': costo,
+        'stock': _entero(fila.get('Stock_Actual'), 'Stock_Actual', 0),
+        'minimo': _entero(fila.get('Nivel_Minimo_Stock'), 'Nivel_Minimo_Stock', 5),
+        'categoria': categoria[:100] if categoria else None,
+    }
+
+
+class Importacion:
+    def __init__(self, usuario=None, tamano_lote=TAMANO_LOTE):
+        self.usuario = usuario
+        self.tamano_lote = tamano_lote
+        self.categorias = dict(Categoria.objects.values_list('nombre', 'id'))
+        self.creados = 0
+        self.actualizados = 0
+        self.reactivados = 0
+        self.total_errores = 0
+        self.errores = []
+
+    def error(self, numero, sku, mensaje):
+        self.total_errores += 1
+        if len(self.errores) < MAX_ERRORES:
+            self.errores.append({'fila': numero, 'SKU': sku, 'error': mensaje})
+
+    def ejecutar(self, archivo, formato):
+        lote = {}
+        for numero, fila in leer_filas(archivo, formato):
+            if isinstance(fila, ValueError):
+                self.error(numero, None, str(fila))
+                continue
+            try:
+                datos = validar_fila(fila)
+            except ValueError as e:
+                self.error(numero, fila.get('SKU'), str(e))
+                continue
+
+            # Un SKU repetido dentro del lote: procesamos lo anterior y la última fila gana
+            if datos['sku'] in lote:
+                self._procesar(lote)
+                lote = {}
+            lote[datos['sku']] = (numero, datos)
+            if len(lote) >= self.tamano_lote:
+                self._procesar(lote)
+                lote = {}
+
+        if lote:
+            self._procesar(lote)
+        return self.reporte()
+
+    def _resolver_categorias(self, lote, version):
+        faltantes = {
+            datos['categoria'] for _, datos in lote.values()
+            if datos['categoria'] and datos['categoria'] not in self.categorias
+        }
+        if faltantes:
+            # Con la versión del lote las terminales POS reciben las categorías nuevas en su delta
+            Categoria.objects.bulk_create([Categoria(nombre=n, version=version) for n in faltantes],
+                                          ignore_conflicts=True)
+            self.categorias.update(Categoria.objects.filter(nombre__in=faltantes).values_list('nombre', 'id'))
+
+    def _procesar(self, lote):
+        try:
+            with transaction.atomic():
+                conteos = self._escribir(lote)
+        except DatabaseError as e:
+            for numero, datos in lote.values():
+                self.error(numero, datos['sku'], f"Error al guardar el lote: {e}")
+            return
+        self.creados += conteos[0]
+        self.actualizados += conteos[1]
+        self.reactivados += conteos[2]
+
+    def _escribir(self, lote):
+        # Una versión por lote, escrita con los productos en vez de marcarlos después
+        version = version_transaccion(CONTADOR_CATALOGO)
+        self._resolver_categorias(lote, version)
+        existentes = {
+            p.sku: p for p in Producto.objects.select_for_update().filter(sku__in=lote.keys()).order_by('id')
+        }
+
+        nuevos = []
+        actualizados = []
+        reactivados = []
+        cambios = []
+        for _, datos in lote.values():
+            categoria_id = self.categorias.get(datos['categoria']) if datos['categoria'] else None
+            producto = existentes.get(datos['sku'])
+            if producto is None:
+                nuevos.append(Producto(
+                    sku=datos['sku'],
+                    nombre=datos['nombre'],
+                    descripcion=datos['descripcion'],
+                    costo=datos['costo'],
+                    stock_actual=datos['stock'],
+                    nivel_minimo_stock=datos['minimo'],
+                    categoria_id=categoria_id,
+                    version=version,
+                ))
+                continue
+
+            antes = estado(producto)
+            producto.nombre = datos['nombre']
+            producto.descripcion = datos['descripcion']
+            producto.costo = datos['costo']
+            producto.nivel_minimo_stock = datos['minimo']
+            producto.categoria_id = categoria_id
+            producto.version = version
+            if not producto.is_active:
+                producto.is_active = True
+                producto.stock_actual = datos['stock']
+                reactivados.append(producto)
+            else:
+                actualizados.append(producto)
+            cambios.append((producto, antes))
+
+        Producto.objects.bulk_create(nuevos)
+        # Los existentes se reescriben con un INSERT ... ON CONFLICT (id) DO UPDATE:
+        # es una sola sentencia por lote y evita el CASE por fila de bulk_update
+        if reactivados:
+            Producto.objects.bulk_create(
+                reactivados, update_conflicts=True, unique_fields=['id'],
+                update_fields=CAMPOS_ACTUALIZABLES + ['is_active', 'stock_actual', 'version']
+            )
+        if actualizados:
+            Producto.objects.bulk_create(
+                actualizados, update_conflicts=True, unique_fields=['id'],
+                update_fields=CAMPOS_ACTUALIZABLES + ['version']
+            )
+
+        Movimiento.objects.bulk_create([
+            Movimiento(tipo='Creacion', producto=p, cantidad=p.stock_actual, usuario=self.usuario)
+            for p in nuevos + reactivados
+        ])
+        registrar_ajustes(cambios, self.usuario)
+        registrar_cambios(cambios + [(p, None) for p in nuevos], versionados=True)
+        invalidar_catalogo()
+        return len(nuevos), len(actualizados), len(reactivados)
+
+    def reporte(self):
+        return {
+            'creados': self.creados,
+            'actualizados': self.actualizados,
+            'reactivados': self.reactivados,
+            'totalErrores': self.total_errores,
+            'errores': self.errores,
+        }
+
+
+def detectar_formato(nombre_archivo, formato=None):
+    if formato:
+        return formato.lower()
+    if nombre_archivo.lower().endswith(('.ndjson', '.jsonl')):
+        return 'ndjson'
+    return 'csv'
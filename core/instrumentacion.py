@@ -0,0 +1,211 @@
+"""Instrumentación de rendimiento por petición.
+
+``InstrumentacionMiddleware`` (core/middleware.py) abre una ``Medicion`` por
+petición en una ``ContextVar``. Cada conexión a la base de datos lleva un
+``execute_wrapper`` (instalado desde ``CoreConfig.ready`` con la señal
+``connection_created``) que suma a la medición activa el número de consultas y
+su duración, también cuando la consulta corre en otro hilo bajo ASGI porque
+``sync_to_async`` copia el contexto.
+
+Los tiempos salen en el encabezado ``Server-Timing`` y se acumulan por endpoint
+en ``estadisticas``, que guarda las últimas muestras de cada uno para calcular
+percentiles e histograma. Las estadísticas son por proceso: con varios workers
+cada uno reporta lo suyo.
+"""
+import heapq
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter, deque
+from contextvars import ContextVar
+
+from django.conf import settings
+from rest_framework.renderers import JSONRenderer
+
+logger = logging.getLogger('core.rendimiento')
+
+_medicion = ContextVar('medicion', default=None)
+
+# Límites superiores (ms) de las cubetas del histograma
+CUBETAS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+CONSULTAS_LENTAS = 5
+
+
+def _config():
+    config = {'ACTIVA': True, 'UMBRAL_LENTO_MS': 500, 'MUESTRAS': 500}
+    config.update(getattr(settings, 'INSTRUMENTACION', {}))
+    return config
+
+
+class Medicion:
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.consultas = 0
+        self.tiempo_db = 0.0
+        self.render = 0.0
+        self.compresion = 0.0
+        self.lentas = []  # heap de (segundos, sql) con las más lentas
+        self.repetidas = Counter()
+        self.lock = threading.Lock()
+
+    def agregar(self, sql, segundos):
+        with self.lock:
+            self.consultas += 1
+            self.tiempo_db += segundos
+            self.repetidas[sql] += 1
+            if len(self.lentas) < CONSULTAS_LENTAS:
+                heapq.heappush(self.lentas, (segundos, sql))
+            elif segundos > self.lentas[0][0]:
+                heapq.heapreplace(self.lentas, (segundos, sql))
+
+
+def iniciar():
+    medicion = Medicion()
+    return medicion, _medicion.set(medicion)
+
+
+def terminar(token):
+    _medicion.reset(token)
+
+
+def registrar_consulta(execute, sql, params, many, context):
+    medicion = _medicion.get()
+    if medicion is None:
+        return execute(sql, params, many, context)
+    inicio = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        medicion.agregar(sql, time.perf_counter() - inicio)
+
+
+def instalar(sender, connection, **kwargs):
+    """Receptor de ``connection_created``: agrega el wrapper una sola vez por conexión."""
+    if registrar_consulta not in connection.execute_wrappers:
+        connection.execute_wrappers.append(registrar_consulta)
+
+
+def server_timing(medicion, total):
+    """``db`` son las consultas, ``render`` el JSON de DRF, ``compresion`` el gzip/brotli
+    y ``app`` el resto (vista y serializadores)."""
+    app = max(total - medicion.tiempo_db - medicion.render - medicion.compresion, 0)
+    return (
+        f'db;dur={medicion.tiempo_db * 1000:.1f};desc="{medicion.consultas} consultas", '
+        f'app;dur={app * 1000:.1f}, render;dur={medicion.render * 1000:.1f}, '
+        f'compresion;dur={medicion.compresion * 1000:.1f}, total;dur={total * 1000:.1f}'
+    )
+
+
+def medicion_actual():
+    return _medicion.get()
+
+
+class JSONRendererMedido(JSONRenderer):
+    """JSONRenderer que suma su tiempo a la medición de la petición."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        medicion = _medicion.get()
+        if medicion is None:
+            return self.serializar(data, accepted_media_type, renderer_context)
+        inicio = time.perf_counter()
+        try:
+            return self.serializar(data, accepted_media_type, renderer_context)
+        finally:
+            medicion.render += time.perf_counter() - inicio
+
+    def serializar(self, data, accepted_media_type=None, renderer_context=None):
+        return super().render(data, accepted_media_type, renderer_context)
+
+
+def nombre_endpoint(request):
+    """``GET api/productos/<sku>/``: método y patrón de la URL, sin los valores."""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return f'{request.method} (sin ruta)'
+    ruta = re.sub(r'\(\?P<(\w+)>[^)]*\)', r'<\1>', match.route).replace('^', '').replace('$', '')
+    return f'{request.method} {ruta}'
+
+
+def reportar_lenta(endpoint, status, medicion, total):
+    """Registra una petición lenta con sus consultas más lentas y la más repetida."""
+    lineas = [
+        f'Petición lenta {endpoint} ({status}): {total * 1000:.0f} ms, '
+        f'{medicion.consultas} consultas en {medicion.tiempo_db * 1000:.0f} ms'
+    ]
+    for segundos, sql in sorted(medicion.lentas, reverse=True):
+        lineas.append(f'  {segundos * 1000:.1f} ms: {sql[:500]}')
+    if medicion.repetidas:
+        sql, veces = medicion.repetidas.most_common(1)[0]
+        if veces > 1:
+            lineas.append(f'  repetida {veces} veces: {sql[:500]}')
+    logger.warning('\n'.join(lineas))
+
+
+def percentil(ordenados, p):
+    if not ordenados:
+        return 0
+    return ordenados[max(0, -(-len(ordenados) * p // 100) - 1)]
+
+
+class EstadisticasEndpoints:
+    """Últimas muestras ``(total_ms, db_ms, consultas)`` por endpoint, en memoria del proceso."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.muestras = {}
+        self.totales = Counter()
+        self.errores = Counter()
+
+    def registrar(self, endpoint, status, total, medicion):
+        muestra = (total * 1000, medicion.tiempo_db * 1000, medicion.consultas)
+        with self.lock:
+            if endpoint not in self.muestras:
+                self.muestras[endpoint] = deque(maxlen=_config()['MUESTRAS'])
+            self.muestras[endpoint].append(muestra)
+            self.totales[endpoint] += 1
+            if status >= 500:
+                self.errores[endpoint] += 1
+
+    def reiniciar(self):
+        with self.lock:
+            self.muestras.clear()
+            self.totales.clear()
+            self.errores.clear()
+
+    def resumen(self):
+        with self.lock:
+            copia = {endpoint: list(muestras) for endpoint, muestras in self.muestras.items()}
+            totales, errores = dict(self.totales), dict(self.errores)
+
+        endpoints = []
+        for endpoint, muestras in copia.items():
+            tiempos = sorted(m[0] for m in muestras)
+            histograma = Counter()
+            for t in tiempos:
+                cubeta = next((f'<={limite}' for limite in CUBETAS_MS if t <= limite), f'>{CUBETAS_MS[-1]}')
+                histograma[cubeta] += 1
+            endpoints.append({
+                'endpoint': endpoint,
+                'peticiones': totales[endpoint],
+                'errores': errores.get(endpoint, 0),
+                'muestras': len(muestras),
+                'p50Ms': round(percentil(tiempos, 50), 1),
+                'p95Ms': round(percentil(tiempos, 95), 1),
+                'p99Ms': round(percentil(tiempos, 99), 1),
+                'maxMs': round(tiempos[-1], 1),
+                'dbPromedioMs': round(sum(m[1] for m in muestras) / len(muestras), 1),
+                'consultasPromedio': round(sum(m[2] for m in muestras) / len(muestras), 1),
+                'consultasMax': max(m[2] for m in muestras),
+                'histograma': {
+                    cubeta: histograma[cubeta]
+                    for cubeta in [f'<={limite}' for limite in CUBETAS_MS] + [f'>{CUBETAS_MS[-1]}']
+                    if histograma[cubeta]
+                },
+            })
+        endpoints.sort(key=lambda e: e['p95Ms'], reverse=True)
+        return {'proceso': os.getpid(), 'endpoints': endpoints}
+
+
+estadisticas = EstadisticasEndpoints()
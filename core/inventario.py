@@ -0,0 +1,216 @@
+"""Efectos secundarios compartidos por todas las rutas que modifican productos.
+
+Las vistas y el admin capturan el estado del producto antes de modificarlo y,
+dentro de la misma transacción, llaman a ``registrar_cambios`` con el producto
+ya modificado. Así los totales del dashboard, las alertas de stock bajo
+(core/alertas.py) y las versiones del catálogo (core/sincronizacion.py) se
+mantienen sin recorrer tablas.
+
+El stock por ubicación (core/ubicaciones.py) también se mantiene desde aquí:
+la diferencia de stock de cada producto se aplica a la ubicación del cambio.
+"""
+import random
+from decimal import Decimal
+from typing import NamedTuple
+
+from django.db import transaction
+from django.db.models import Count, DecimalField, F, Q, Sum
+
+from .alertas import actualizar_alertas
+from .models import AlertaStock, Movimiento, Producto, ResumenInventario
+from .sincronizacion import marcar_productos
+from .slots import sumar_slots
+from .ubicaciones import reconstruir_ubicaciones, registrar_stock
+
+SLOTS_RESUMEN = 8
+
+CAMPOS_RESUMEN = (
+    'total_productos', 'total_stock', 'valor_inventario',
+    'productos_bajo_stock', 'total_entradas', 'total_salidas',
+)
+
+
+class EstadoProducto(NamedTuple):
+    activo: bool
+    stock: int
+    costo: Decimal
+    minimo: int
+
+
+def estado(producto):
+    """Foto de los campos de un producto que afectan los totales."""
+    return EstadoProducto(
+        producto.is_active,
+        producto.stock_actual,
+        Decimal(str(producto.costo)),
+        producto.nivel_minimo_stock,
+    )
+
+
+def es_bajo_stock(stock, minimo):
+    # Mismo criterio que el dashboard: alerta configurada y stock bajo, o stock agotado
+    return (minimo > 0 and stock <= minimo) or stock == 0
+
+
+def filtro_bajo_stock():
+    return Q(nivel_minimo_stock__gt=0, stock_actual__lte=F('nivel_minimo_stock')) | Q(stock_actual=0)
+
+
+def _contribucion(estado_producto):
+    if estado_producto is None or not estado_producto.activo:
+        return (0, 0, Decimal('0'), 0)
+    return (
+        1,
+        estado_producto.stock,
+        estado_producto.stock * estado_producto.costo,
+        int(es_bajo_stock(estado_producto.stock, estado_producto.minimo)),
+    )
+
+
+def registrar_cambios(cambios, entradas=0, salidas=0, ubicacion=None, versionados=False):
+    """Actualiza los totales a partir de pares ``(producto, estado_anterior)``.
+
+    ``estado_anterior`` es ``None`` para productos recién creados y el producto
+    ``None`` para productos borrados físicamente (antes de borrarlos se llama a
+    ``ubicaciones.quitar_productos``). La diferencia de stock se asigna a
+    ``ubicacion`` (id; por defecto la principal). Con ``versionados`` los
+    productos ya se escribieron con su versión del catálogo
+    (``sincronizacion.guardar_stock``) y no se marcan otra vez. Debe llamarse
+    dentro de la transacción que hizo el cambio.
+    """
+    deltas = [0, 0, Decimal('0'), 0]
+    alertas = []
+    por_ubicacion = []
+    for producto, anterior in cambios:
+        nuevo = estado(producto) if producto is not None else None
+        por_ubicacion.append((producto, anterior, nuevo))
+        contribucion_nueva, contribucion_anterior = _contribucion(nuevo), _contribucion(anterior)
+        for i, (despues, antes) in enumerate(zip(contribucion_nueva, contribucion_anterior)):
+            deltas[i] += despues - antes
+
+        # La alerta cambia al entrar o salir del stock bajo, o si cambia su stock o mínimo estando dentro
+        bajo_ahora, bajo_antes = contribucion_nueva[3], contribucion_anterior[3]
+        if producto is not None and (bajo_ahora != bajo_antes or (
+                bajo_ahora and (nuevo.stock, nuevo.minimo) != (anterior.stock, anterior.minimo))):
+            alertas.append((producto, bool(bajo_ahora)))
+
+    registrar_stock(por_ubicacion, ubicacion)
+    actualizar_alertas(alertas)
+    if not versionados:
+        marcar_productos([producto for producto, _ in cambios if producto is not None])
+
+    aplicar_delta(
+        total_productos=deltas[0],
+        total_stock=deltas[1],
+        valor_inventario=deltas[2],
+        productos_bajo_stock=deltas[3],
+        total_entradas=entradas,
+        total_salidas=salidas,
+        revision=1,
+    )
+
+
+def registrar_ajustes(cambios, usuario):
+    """Deja en el Kardex la diferencia de stock de las rutas que lo fijan directamente.
+
+    ``cambios`` son los mismos pares ``(producto, estado_anterior)`` de
+    ``registrar_cambios``. Cada diferencia queda como 'AjusteEntrada' o
+    'AjusteSalida' para que el stock a una fecha (core/cierres.py) pueda
+    reconstruirse desde el Kardex.
+    """
+    ajustes = []
+    for producto, anterior in cambios:
+        if producto is None or anterior is None:
+            continue
+        diferencia = producto.stock_actual - anterior.stock
+        if diferencia:
+            ajustes.append(Movimiento(
+                tipo='AjusteEntrada' if diferencia > 0 else 'AjusteSalida',
+                producto=producto, cantidad=abs(diferencia), usuario=usuario
+            ))
+    Movimiento.objects.bulk_create(ajustes)
+
+
+def tocar_revision():
+    """Para cambios que no mueven los totales pero sí lo que devuelven los listados."""
+    aplicar_delta(revision=1)
+
+
+def aplicar_delta(**deltas):
+    deltas = {campo: valor for campo, valor in deltas.items() if valor}
+    if not deltas:
+        return
+
+    fila = {campo: 0 for campo in CAMPOS_RESUMEN + ('revision',)}
+    fila.update(deltas)
+    sumar_slots(ResumenInventario, ['slot'], [{'slot': random.randrange(SLOTS_RESUMEN), **fila}])
+
+
+def leer_resumen():
+    totales = ResumenInventario.objects.aggregate(**{campo: Sum(campo) for campo in CAMPOS_RESUMEN})
+    return {campo: valor or 0 for campo, valor in totales.items()}
+
+
+def leer_revision():
+    """Revisión de los datos de los listados: crece con cada cambio confirmado."""
+    return ResumenInventario.objects.aggregate(revision=Sum('revision'))['revision'] or 0
+
+
+async def aleer_resumen():
+    totales = await ResumenInventario.objects.aaggregate(**{campo: Sum(campo) for campo in CAMPOS_RESUMEN})
+    return {campo: valor or 0 for campo, valor in totales.items()}
+
+
+def calcular_resumen():
+    """Calcula los totales recorriendo las tablas (usado para reconstruir)."""
+    activos = Producto.objects.filter(is_active=True)
+    totales = activos.aggregate(
+        total_productos=Count('id'),
+        total_stock=Sum('stock_actual'),
+        valor_inventario=Sum(F('stock_actual') * F('costo'), output_field=DecimalField()),
+        productos_bajo_stock=Count('id', filter=filtro_bajo_stock()),
+    )
+    movimientos = Movimiento.objects.aggregate(
+        total_entradas=Count('id', filter=Q(tipo='Entrada')),
+        total_salidas=Count('id', filter=Q(tipo='Salida')),
+    )
+    totales.update(movimientos)
+    return {campo: valor or 0 for campo, valor in totales.items()}
+
+
+def reconstruir_resumen():
+    with transaction.atomic():
+        # Bloqueamos los slots para que ninguna escritura concurrente se pierda
+        slots = list(ResumenInventario.objects.select_for_update())
+        totales = calcular_resumen()
+        ResumenInventario.objects.all().delete()
+        # La revisión no se recalcula: sigue creciendo para que ningún ETag anterior vuelva a valer
+        revision = sum(slot.revision for slot in slots) + 1
+        ResumenInventario.objects.create(slot=0, revision=revision, **totales)
+    # Las rutas que escriben stock sin registrar_cambios también descuadran las ubicaciones
+    reconstruir_ubicaciones()
+    return totales
+
+
+def reconstruir_alertas():
+    """Recalcula las alertas desde ``Producto``; solo toca las filas que difieren."""
+    with transaction.atomic():
+        bajos = {
+            producto.id: producto
+            for producto in Producto.objects.filter(is_active=True).filter(filtro_bajo_stock())
+            .only('id', 'stock_actual', 'nivel_minimo_stock')
+        }
+        actuales = {a.producto_id: a for a in AlertaStock.objects.all()}
+
+        cambios = []
+        for producto_id, producto in bajos.items():
+            alerta = actuales.get(producto_id)
+            if alerta is None or not alerta.activa or (alerta.stock, alerta.minimo) != (
+                    producto.stock_actual, producto.nivel_minimo_stock):
+                cambios.append((producto, True))
+        resueltas = [alerta.producto_id for alerta in actuales.values() if alerta.activa and alerta.producto_id not in bajos]
+        for producto in Producto.objects.filter(id__in=resueltas).only('id', 'stock_actual', 'nivel_minimo_stock'):
+            cambios.append((producto, False))
+
+        actualizar_alertas(cambios)
+    return len(bajos), len(cambios)
@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand
+
+from core.folios import formatear
+from core.models import BloqueFolio, Venta
+
+
+def _rangos(numeros):
+    """Compacta [1, 2, 3, 7, 8] en ['1-3', '7-8']."""
+    rangos = []
+    for numero in numeros:
+        if rangos and rangos[-1][1] == numero - 1:
+            rangos[-1][1] = numero
+        else:
+            rangos.append([numero, numero])
+    return [f"{a}-{b}" if a != b else str(a) for a, b in rangos]
+
+
+class Command(BaseCommand):
+    help = 'Reporta los folios reservados en bloques que no corresponden a ninguna venta.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--prefijo', help='Auditar solo este prefijo.')
+
+    def handle(self, *args, **options):
+        bloques = BloqueFolio.objects.all()
+        if options['prefijo']:
+            bloques = bloques.filter(prefijo=options['prefijo'])
+
+        resumen = {}
+        for bloque in bloques.iterator():
+            folios = {
+                formatear(bloque.prefijo, n): n for n in range(bloque.inicio, bloque.fin + 1)
+            }
+            usados = set(Venta.objects.filter(folio__in=folios.keys()).values_list('folio', flat=True))
+            faltantes = [n for folio, n in folios.items() if folio not in usados]
+
+            datos = resumen.setdefault(bloque.prefijo, {'reservados': 0, 'usados': 0, 'huecos': []})
+            datos['reservados'] += len(folios)
+            datos['usados'] += len(usados)
+            datos['huecos'].extend(faltantes)
+
+        if not resumen:
+            self.stdout.write('No hay bloques de folios reservados.')
+            return
+
+        for prefijo, datos in sorted(resumen.items()):
+            self.stdout.write(
+                f"{prefijo}: {datos['reservados']} reservados, {datos['usados']} usados, "
+                f"{len(datos['huecos'])} sin usar"
+            )
+            if datos['huecos']:
+                self.stdout.write('  Sin usar: ' + ', '.join(_rangos(datos['huecos'])))
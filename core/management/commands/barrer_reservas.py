@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from core.reservas import LIMITE_BARRIDO, barrer_vencidas, reconstruir_reservados
+
+
+class Command(BaseCommand):
+    help = 'Libera las reservas vencidas de carritos abiertos (pensado para ejecutarse cada minuto).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bloque', type=int, default=LIMITE_BARRIDO,
+                            help='Reservas liberadas por transacción.')
+        parser.add_argument('--reconstruir', action='store_true',
+                            help='Recalcula además el stock reservado de todos los productos.')
+
+    def handle(self, *args, **options):
+        bloque = max(options['bloque'], 1)
+        total = 0
+        while True:
+            liberadas = barrer_vencidas(bloque)
+            total += liberadas
+            if liberadas < bloque:
+                break
+        self.stdout.write(f"reservas vencidas liberadas: {total}")
+        if options['reconstruir']:
+            productos = reconstruir_reservados()
+            self.stdout.write(f"stock reservado recalculado en {productos} productos")
+        self.stdout.write(self.style.SUCCESS('Reservas al día.'))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.cierres import cerrar_periodo
+from core.filtros import parsear_fecha
+
+
+class Command(BaseCommand):
+    help = 'Guarda un cierre de stock (snapshot por producto) a una fecha de corte.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tipo', choices=['Diario', 'Mensual'], default='Diario')
+        parser.add_argument(
+            '--fecha-corte',
+            help='AAAA-MM-DD o datetime ISO. Por defecto: medianoche de hoy (o del día 1 si es mensual).'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            cierre = cerrar_periodo(options['tipo'], parsear_fecha(options['fecha_corte']))
+        except ValueError as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(
+            f"{cierre} guardado con {cierre.snapshots.count()} productos."
+        ))
@@ -0,0 +1,49 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.sinteticos import GeneradorDatos
+
+
+class Command(BaseCommand):
+    help = 'Genera un volumen configurable de datos sintéticos (catálogo, ventas y Kardex) con stock consistente.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--categorias', type=int, default=40)
+        parser.add_argument('--productos', type=int, default=20000)
+        parser.add_argument('--movimientos', type=int, default=1_000_000,
+                            help='Total aproximado de movimientos del Kardex, incluidas las salidas de las ventas.')
+        parser.add_argument('--ventas', type=int, default=200_000)
+        parser.add_argument('--cajeros', type=int, default=20)
+        parser.add_argument('--dias', type=int, default=365)
+        parser.add_argument('--semilla', type=int, default=1)
+        parser.add_argument('--prefijo', default='SIN', help='Prefijo de los SKU generados.')
+        parser.add_argument('--lote', type=int, default=5000)
+        parser.add_argument('--password', default='sintetico', help='Contraseña de los usuarios generados.')
+
+    def handle(self, *args, **options):
+        for opcion in ('productos', 'dias', 'lote'):
+            if options[opcion] < 1:
+                raise CommandError(f'--{opcion} debe ser mayor que cero.')
+        if options['ventas'] and not options['cajeros']:
+            raise CommandError('Se necesita al menos un cajero para generar ventas.')
+
+        generador = GeneradorDatos(
+            categorias=options['categorias'], productos=options['productos'],
+            movimientos=options['movimientos'], ventas=options['ventas'], cajeros=options['cajeros'],
+            dias=options['dias'], semilla=options['semilla'], prefijo=options['prefijo'],
+            lote=options['lote'], password=options['password'], progreso=self.stdout.write,
+        )
+        inicio = time.monotonic()
+        try:
+            conteo = generador.ejecutar()
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Generados en {time.monotonic() - inicio:.1f} s: {conteo['categorias']} categorías, "
+            f"{conteo['productos']} productos, {conteo['cajeros']} cajeros, {conteo['ventas']} ventas "
+            f"({conteo['detalles']} detalles) y {conteo['movimientos']} movimientos."
+        ))
+        if conteo['ventasSinStock']:
+            self.stdout.write(f"{conteo['ventasSinStock']} ventas se omitieron por falta de stock.")
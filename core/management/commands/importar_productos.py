@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.importacion import TAMANO_LOTE, Importacion, detectar_formato
+from core.models import Usuario
+
+
+class Command(BaseCommand):
+    help = 'Importa o actualiza productos por SKU desde un archivo CSV o NDJSON.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('ruta')
+        parser.add_argument('--formato', choices=['csv', 'ndjson'])
+        parser.add_argument('--usuario', help='Email del usuario al que se atribuyen los movimientos.')
+        parser.add_argument('--lote', type=int, default=TAMANO_LOTE)
+
+    def handle(self, *args, **options):
+        usuario = None
+        if options['usuario']:
+            try:
+                usuario = Usuario.objects.get(email=options['usuario'])
+            except Usuario.DoesNotExist:
+                raise CommandError(f"No existe el usuario {options['usuario']}")
+
+        formato = detectar_formato(options['ruta'], options['formato'])
+        importacion = Importacion(usuario, tamano_lote=max(options['lote'], 1))
+        try:
+            with open(options['ruta'], encoding='utf-8-sig', newline='') as archivo:
+                reporte = importacion.ejecutar(archivo, formato)
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(
+            f"Creados: {reporte['creados']}, actualizados: {reporte['actualizados']}, "
+            f"reactivados: {reporte['reactivados']}, errores: {reporte['totalErrores']}"
+        )
+        for error in reporte['errores']:
+            self.stdout.write(f"  Fila {error['fila']} ({error['SKU']}): {error['error']}")
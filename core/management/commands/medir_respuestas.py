@@ -0,0 +1,57 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.medidas_http import ENDPOINTS, MedicionRespuestas
+from core.models import Usuario
+
+
+class Command(BaseCommand):
+    help = 'Mide bytes y CPU ahorrados por el ETag (304), orjson y gzip/brotli en los listados grandes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--usuario', help='Email del usuario con el que se piden los listados '
+                                              '(por defecto el primer Superadmin).')
+        parser.add_argument('--repeticiones', type=int, default=5)
+        parser.add_argument('--endpoints', help=f"Separados por coma: {', '.join(ENDPOINTS)}")
+        parser.add_argument('--json', dest='archivo_json', help='Guarda el reporte completo en este archivo.')
+
+    def handle(self, *args, **options):
+        if options['usuario']:
+            usuario = Usuario.objects.filter(email=options['usuario']).first()
+        else:
+            usuario = Usuario.objects.filter(role='Superadmin', is_active=True).order_by('id').first()
+        if usuario is None:
+            raise CommandError('No se encontró el usuario para las peticiones.')
+
+        endpoints = None
+        if options['endpoints']:
+            endpoints = [e.strip() for e in options['endpoints'].split(',')]
+            desconocidos = [e for e in endpoints if e not in ENDPOINTS]
+            if desconocidos:
+                raise CommandError(f"Endpoints desconocidos: {', '.join(desconocidos)}")
+
+        try:
+            reporte = MedicionRespuestas(usuario, options['repeticiones'], endpoints).ejecutar()
+        except RuntimeError as e:
+            raise CommandError(str(e))
+
+        self.imprimir(reporte)
+        if options['archivo_json']:
+            with open(options['archivo_json'], 'w', encoding='utf-8') as archivo:
+                json.dump(reporte, archivo, indent=2, ensure_ascii=False)
+
+    def imprimir(self, reporte):
+        def celda(valor):
+            return '-' if valor is None else valor
+
+        self.stdout.write(f"{'endpoint':<12} {'bytes':>10} {'gzip':>9} {'brotli':>9}  "
+                          f"{'drf':>8} {'orjson':>8}  {'GET':>8} {'304':>8}")
+        for nombre, datos in reporte['endpoints'].items():
+            self.stdout.write(
+                f"{nombre:<12} {datos['bytes']:>10} {datos['bytesGzip']:>9} {celda(datos['bytesBrotli']):>9}  "
+                f"{datos['renderDrfCpuMs']:>8} {celda(datos['renderOrjsonCpuMs']):>8}  "
+                f"{datos['getMs']:>8} {datos['get304Ms']:>8}"
+            )
+        self.stdout.write('(drf/orjson: ms de CPU del render; GET/304: ms totales por petición; '
+                          f"mediana de {reporte['repeticiones']} repeticiones)")
@@ -0,0 +1,94 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.carga import MEZCLA_DEFAULT, PruebaCarga, sembrar
+
+
+def leer_mezcla(texto):
+    """``venta=50,entrada=10,...`` -> dict; las operaciones omitidas no se ejecutan."""
+    mezcla = {}
+    for parte in texto.split(','):
+        nombre, _, peso = parte.partition('=')
+        nombre = nombre.strip()
+        if nombre not in MEZCLA_DEFAULT or not peso.strip().isdigit():
+            raise CommandError(f"Mezcla inválida '{parte}'. Operaciones: {', '.join(MEZCLA_DEFAULT)}")
+        mezcla[nombre] = int(peso)
+    if not any(mezcla.values()):
+        raise CommandError('La mezcla no tiene ninguna operación con peso.')
+    return mezcla
+
+
+class Command(BaseCommand):
+    help = 'Simula cajeros concurrentes contra la API y reporta rendimiento, latencias y fallos de candados.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cajeros', type=int, default=10)
+        parser.add_argument('--duracion', type=float, default=20, help='Segundos de carga.')
+        parser.add_argument('--operaciones', type=int, help='Máximo de operaciones por cajero.')
+        parser.add_argument('--mezcla', help='Pesos por operación, p. ej. venta=50,entrada=10,salida=10,'
+                                             'productos=15,dashboard=15')
+        parser.add_argument('--sesgo', type=float, default=1.1,
+                            help='Exponente de Zipf para elegir productos (0 = uniforme).')
+        parser.add_argument('--carrito', type=float, default=4, help='Artículos promedio por venta.')
+        parser.add_argument('--url', help='Servidor a probar (p. ej. http://127.0.0.1:8000); '
+                                          'sin él se usa el cliente de Django en proceso.')
+        parser.add_argument('--sembrar', action='store_true',
+                            help='Crea en la base configurada los cajeros y productos de prueba que falten.')
+        parser.add_argument('--productos', type=int, default=2000, help='Productos a sembrar.')
+        parser.add_argument('--password', default='carga')
+        parser.add_argument('--semilla', type=int, default=1)
+        parser.add_argument('--json', dest='archivo_json', help='Guarda el reporte completo en este archivo.')
+
+    def handle(self, *args, **options):
+        if options['cajeros'] < 1:
+            raise CommandError('Se necesita al menos un cajero.')
+        mezcla = leer_mezcla(options['mezcla']) if options['mezcla'] else None
+
+        if options['sembrar']:
+            usuarios, productos = sembrar(options['cajeros'], options['productos'], options['password'])
+            self.stdout.write(f'Sembrados {usuarios} cajeros y {productos} productos.')
+
+        prueba = PruebaCarga(
+            cajeros=options['cajeros'], duracion=options['duracion'], operaciones=options['operaciones'],
+            mezcla=mezcla, sesgo=options['sesgo'], carrito_medio=options['carrito'], url=options['url'],
+            password=options['password'], semilla=options['semilla'],
+        )
+        try:
+            reporte = prueba.ejecutar()
+        except RuntimeError as e:
+            raise CommandError(str(e))
+
+        self.imprimir(reporte)
+        if options['archivo_json']:
+            with open(options['archivo_json'], 'w', encoding='utf-8') as archivo:
+                json.dump(reporte, archivo, indent=2, ensure_ascii=False)
+
+    def imprimir(self, reporte):
+        self.stdout.write(
+            f"{reporte['cajeros']} cajeros, {reporte['segundos']} s: "
+            f"{reporte['operaciones']} operaciones ({reporte['porSegundo']}/s)"
+        )
+        self.stdout.write(f"{'endpoint':<10} {'ops':>7} {'ops/s':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}  resultados")
+        for nombre, datos in reporte['endpoints'].items():
+            resultados = ', '.join(f'{clase}={n}' for clase, n in sorted(datos['resultados'].items()))
+            self.stdout.write(
+                f"{nombre:<10} {datos['operaciones']:>7} {datos['porSegundo']:>8} {datos['p50ms']:>8} "
+                f"{datos['p95ms']:>8} {datos['p99ms']:>8} {datos['maxms']:>8}  {resultados}"
+            )
+        self.stdout.write('(latencias en ms)')
+
+        fallos = {c: n for c, n in reporte['resultados'].items() if c in ('candado', 'deadlock', 'integridad')}
+        estilo = self.style.ERROR if fallos else self.style.SUCCESS
+        self.stdout.write(estilo(
+            f"Candados: {fallos.get('candado', 0)}, deadlocks: {fallos.get('deadlock', 0)}, "
+            f"integridad: {fallos.get('integridad', 0)}"
+        ))
+        if reporte.get('candados'):
+            c = reporte['candados']
+            self.stdout.write(
+                f"pg_locks: {c['esperandoPromedio']} sesiones esperando en promedio, máximo {c['esperandoMaximo']}, "
+                f"{c['fraccionConEspera']:.0%} de las muestras con espera; deadlocks del servidor: {c['deadlocksServidor']}"
+            )
+        for clase, ejemplo in reporte['ejemplosError'].items():
+            self.stdout.write(f"  ejemplo {clase}: {ejemplo}")
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.analitica import reconstruir
+from core.filtros import parsear_fecha
+
+
+class Command(BaseCommand):
+    help = 'Recalcula los rollups diarios de ventas (por producto y por cajero).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', help='AAAA-MM-DD (inclusivo). Por defecto: todo el historial.')
+        parser.add_argument('--hasta', help='AAAA-MM-DD (inclusivo).')
+
+    def handle(self, *args, **options):
+        try:
+            desde = parsear_fecha(options['desde'])
+            hasta = parsear_fecha(options['hasta'], fin_de_dia=True)
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        productos, cajeros = reconstruir(desde, hasta)
+        self.stdout.write(self.style.SUCCESS(
+            f"Rollups reconstruidos: {productos} filas por producto, {cajeros} por cajero."
+        ))
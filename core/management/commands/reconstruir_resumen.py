@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from core.inventario import reconstruir_alertas, reconstruir_resumen
+
+
+class Command(BaseCommand):
+    help = ('Recalcula desde cero los totales del dashboard (ResumenInventario y ResumenUbicacion) '
+            'y las alertas de stock bajo.')
+
+    def handle(self, *args, **options):
+        totales = reconstruir_resumen()
+        for campo, valor in totales.items():
+            self.stdout.write(f"{campo}: {valor}")
+        bajos, cambios = reconstruir_alertas()
+        self.stdout.write(f"alertas activas: {bajos} ({cambios} actualizadas)")
+        self.stdout.write(self.style.SUCCESS('Resumen reconstruido.'))
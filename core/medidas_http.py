@@ -0,0 +1,106 @@
+"""Medición de lo que ahorran el ETag, orjson y la compresión en los listados grandes.
+
+Usa el cliente de Django en proceso contra la base configurada (p. ej. después
+de ``generar_datos``), así que los tiempos incluyen toda la pila de Django pero
+no la red. Por endpoint reporta:
+
+- bytes de la respuesta JSON sin comprimir, con gzip y con brotli, y el tiempo
+  de CPU de cada compresión;
+- tiempo de CPU del render con ``JSONRenderer`` de DRF y con orjson;
+- tiempo total y de CPU de un GET completo contra uno condicional que responde 304.
+"""
+import gzip
+import logging
+import statistics
+import time
+
+from django.conf import settings
+from django.test import Client
+from rest_framework.renderers import JSONRenderer
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .middleware import brotli
+from .respuestas import JSONRendererRapido, orjson
+
+ENDPOINTS = {
+    'productos': '/api/productos/',
+    'categorias': '/api/categorias/',
+    'ventas': '/api/ventas/',
+    'movimientos': '/api/movimientos',
+}
+
+
+def _mediana_ms(funcion, repeticiones):
+    """Mediana de tiempo total y de CPU (ms) de ``funcion``; devuelve también su último resultado."""
+    totales, cpu = [], []
+    for _ in range(repeticiones):
+        inicio, inicio_cpu = time.perf_counter(), time.process_time()
+        resultado = funcion()
+        totales.append((time.perf_counter() - inicio) * 1000)
+        cpu.append((time.process_time() - inicio_cpu) * 1000)
+    return round(statistics.median(totales), 2), round(statistics.median(cpu), 2), resultado
+
+
+class MedicionRespuestas:
+    def __init__(self, usuario, repeticiones=5, endpoints=None):
+        self.repeticiones = max(repeticiones, 1)
+        self.endpoints = endpoints or list(ENDPOINTS)
+        token = str(RefreshToken.for_user(usuario).access_token)
+        self.cliente = Client(HTTP_HOST='localhost', HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def medir(self, ruta):
+        completo_ms, completo_cpu, respuesta = _mediana_ms(lambda: self.cliente.get(ruta), self.repeticiones)
+        if respuesta.status_code != 200:
+            raise RuntimeError(f'GET {ruta} respondió {respuesta.status_code}.')
+        contenido, etag = respuesta.content, respuesta['ETag']
+
+        condicional_ms, condicional_cpu, respuesta = _mediana_ms(
+            lambda: self.cliente.get(ruta, HTTP_IF_NONE_MATCH=etag), self.repeticiones
+        )
+        if respuesta.status_code != 304:
+            raise RuntimeError(f'GET condicional de {ruta} respondió {respuesta.status_code}; '
+                               '¿hay escrituras en curso?')
+
+        # Se vuelve a renderizar lo mismo que devolvió la vista
+        datos = self.cliente.get(ruta).data
+        _, drf_cpu, _ = _mediana_ms(lambda: JSONRenderer().render(datos), self.repeticiones)
+        _, orjson_cpu, _ = _mediana_ms(lambda: JSONRendererRapido().render(datos), self.repeticiones)
+
+        _, gzip_cpu, comprimido_gzip = _mediana_ms(lambda: gzip.compress(contenido), self.repeticiones)
+        reporte = {
+            'ruta': ruta,
+            'bytes': len(contenido),
+            'bytesGzip': len(comprimido_gzip),
+            'gzipCpuMs': gzip_cpu,
+            'bytesBrotli': None,
+            'brotliCpuMs': None,
+            'renderDrfCpuMs': drf_cpu,
+            'renderOrjsonCpuMs': orjson_cpu if orjson is not None else None,
+            'getMs': completo_ms,
+            'getCpuMs': completo_cpu,
+            'get304Ms': condicional_ms,
+            'get304CpuMs': condicional_cpu,
+        }
+        if brotli is not None:
+            calidad = settings.COMPRESION.get('CALIDAD_BROTLI', 5)
+            _, brotli_cpu, comprimido = _mediana_ms(
+                lambda: brotli.compress(contenido, quality=calidad), self.repeticiones
+            )
+            reporte.update(bytesBrotli=len(comprimido), brotliCpuMs=brotli_cpu)
+        return reporte
+
+    def ejecutar(self):
+        # Los listados completos superan el umbral de petición lenta; aquí ese log solo estorba
+        registro = logging.getLogger('core.rendimiento')
+        nivel = registro.level
+        registro.setLevel(logging.ERROR)
+        try:
+            endpoints = {nombre: self.medir(ENDPOINTS[nombre]) for nombre in self.endpoints}
+        finally:
+            registro.setLevel(nivel)
+        return {
+            'repeticiones': self.repeticiones,
+            'orjson': orjson is not None,
+            'brotli': brotli is not None,
+            'endpoints': endpoints,
+        }
@@ -0,0 +1,155 @@
+"""Middleware propio del proyecto."""
+import re
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from . import instrumentacion
+
+try:
+    import brotli
+except ImportError:  # brotli es opcional: sin él se comprime solo con gzip
+    brotli = None
+
+ACEPTA_BROTLI = re.compile(r'\bbr\b')
+
+
+class WhiteNoiseAsyncMiddleware(WhiteNoiseMiddleware):
+    """WhiteNoise que también funciona en una cadena de middleware async.
+
+    ``WhiteNoiseMiddleware`` solo es síncrono: bajo ASGI obliga a Django a
+    cambiar de hilo en cada petición, incluso para las vistas async de la API.
+    Aquí solo las rutas de estáticos pasan por ``sync_to_async``; el resto se
+    delega directamente al siguiente middleware.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, *args, **kwargs):
+        super().__init__(get_response, *args, **kwargs)
+        self.es_async = iscoroutinefunction(get_response)
+        if self.es_async:
+            markcoroutinefunction(self)
+
+    def _archivo(self, request):
+        if self.autorefresh:
+            return self.find_file(request.path_info)
+        return self.files.get(request.path_info)
+
+    def __call__(self, request):
+        if self.es_async:
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if request.path_info.startswith(self.static_prefix):
+            archivo = await sync_to_async(self._archivo)(request)
+            if archivo is not None:
+                return await sync_to_async(self.serve)(archivo, request)
+        elif not self.autorefresh and request.path_info in self.files:
+            # Archivos de WHITENOISE_ROOT fuera del prefijo de estáticos
+            return await sync_to_async(self.serve)(self.files[request.path_info], request)
+        return await self.get_response(request)
+
+
+class InstrumentacionMiddleware:
+    """Mide consultas, tiempo de base de datos y tiempo total de cada petición.
+
+    Agrega el encabezado ``Server-Timing``, acumula las estadísticas por endpoint
+    (``/api/rendimiento``) y registra en ``core.rendimiento`` las peticiones que
+    superan ``INSTRUMENTACION['UMBRAL_LENTO_MS']``. Debe ir primero en
+    ``MIDDLEWARE`` para que el total incluya a los demás.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        config = instrumentacion._config()
+        if not config['ACTIVA']:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.umbral = config['UMBRAL_LENTO_MS'] / 1000
+        self.es_async = iscoroutinefunction(get_response)
+        if self.es_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.es_async:
+            return self.__acall__(request)
+        medicion, token = instrumentacion.iniciar()
+        try:
+            response = self.get_response(request)
+        finally:
+            instrumentacion.terminar(token)
+        return self._registrar(request, response, medicion)
+
+    async def __acall__(self, request):
+        medicion, token = instrumentacion.iniciar()
+        try:
+            response = await self.get_response(request)
+        finally:
+            instrumentacion.terminar(token)
+        return self._registrar(request, response, medicion)
+
+    def _registrar(self, request, response, medicion):
+        # En respuestas streaming el total no incluye el envío del cuerpo
+        total = time.perf_counter() - medicion.inicio
+        endpoint = instrumentacion.nombre_endpoint(request)
+        response['Server-Timing'] = instrumentacion.server_timing(medicion, total)
+        instrumentacion.estadisticas.registrar(endpoint, response.status_code, total, medicion)
+        if total >= self.umbral:
+            instrumentacion.reportar_lenta(endpoint, response.status_code, medicion, total)
+        return response
+
+
+class CompresionMiddleware(GZipMiddleware):
+    """GZip de Django, o brotli cuando el cliente lo acepta y el paquete está instalado.
+
+    Solo comprime respuestas de al menos ``COMPRESION['MINIMO']`` bytes: por
+    debajo el ahorro no compensa, y así las respuestas chicas con secretos (el
+    login con sus tokens) no quedan expuestas a BREACH. Las exportaciones
+    streaming se comprimen con gzip por bloques. El tiempo se suma a
+    ``compresion`` en el ``Server-Timing``.
+    """
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        config = {'MINIMO': 1024, 'CALIDAD_BROTLI': 5}
+        config.update(getattr(settings, 'COMPRESION', {}))
+        self.minimo = config['MINIMO']
+        self.calidad_brotli = config['CALIDAD_BROTLI']
+
+    def process_response(self, request, response):
+        if not response.streaming and len(response.content) < self.minimo:
+            return response
+
+        inicio = time.perf_counter()
+        try:
+            acepta = request.META.get('HTTP_ACCEPT_ENCODING', '')
+            if (brotli is not None and not response.streaming and not response.has_header('Content-Encoding')
+                    and ACEPTA_BROTLI.search(acepta)):
+                return self._brotli(response)
+            return super().process_response(request, response)
+        finally:
+            medicion = instrumentacion.medicion_actual()
+            if medicion is not None:
+                medicion.compresion += time.perf_counter() - inicio
+
+    def _brotli(self, response):
+        patch_vary_headers(response, ('Accept-Encoding',))
+        comprimido = brotli.compress(response.content, quality=self.calidad_brotli)
+        if len(comprimido) >= len(response.content):
+            return response
+        response.content = comprimido
+        response.headers['Content-Length'] = str(len(comprimido))
+        # Igual que GZipMiddleware: el ETag fuerte pasa a débil
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = 'br'
+        return response
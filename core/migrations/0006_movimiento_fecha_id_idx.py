@@ -0,0 +1,17 @@
+# Generated by Django 5.2.8 on 2026-10-18 06:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_categoria_alter_producto_nivel_minimo_stock_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='movimiento',
+            index=models.Index(fields=['-fecha', '-id'], name='movimiento_fecha_id_idx'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.8 on 2026-10-18 06:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_movimiento_fecha_id_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SecuenciaFolio',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('prefijo', models.CharField(max_length=20, unique=True)),
+                ('siguiente', models.PositiveBigIntegerField(default=1)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='BloqueFolio',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('prefijo', models.CharField(max_length=20)),
+                ('inicio', models.PositiveBigIntegerField()),
+                ('fin', models.PositiveBigIntegerField()),
+                ('proceso', models.CharField(max_length=100)),
+                ('fecha', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['prefijo', 'inicio'],
+                'constraints': [models.UniqueConstraint(fields=('prefijo', 'inicio'), name='bloquefolio_prefijo_inicio_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.8 on 2026-10-18 06:23
+
+from django.db import migrations, models
+from django.db.models import Count, DecimalField, F, Q, Sum
+
+
+def calcular_resumen_inicial(apps, schema_editor):
+    Producto = apps.get_model('core', 'Producto')
+    Movimiento = apps.get_model('core', 'Movimiento')
+    ResumenInventario = apps.get_model('core', 'ResumenInventario')
+
+    bajo_stock = Q(nivel_minimo_stock__gt=0, stock_actual__lte=F('nivel_minimo_stock')) | Q(stock_actual=0)
+    totales = Producto.objects.filter(is_active=True).aggregate(
+        total_productos=Count('id'),
+        total_stock=Sum('stock_actual'),
+        valor_inventario=Sum(F('stock_actual') * F('costo'), output_field=DecimalField()),
+        productos_bajo_stock=Count('id', filter=bajo_stock),
+    )
+    totales.update(Movimiento.objects.aggregate(
+        total_entradas=Count('id', filter=Q(tipo='Entrada')),
+        total_salidas=Count('id', filter=Q(tipo='Salida')),
+    ))
+    ResumenInventario.objects.create(slot=0, **{k: v or 0 for k, v in totales.items()})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_folios'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenInventario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('slot', models.PositiveSmallIntegerField(unique=True)),
+                ('total_productos', models.IntegerField(default=0)),
+                ('total_stock', models.BigIntegerField(default=0)),
+                ('valor_inventario', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('productos_bajo_stock', models.IntegerField(default=0)),
+                ('total_entradas', models.BigIntegerField(default=0)),
+                ('total_salidas', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'Resumen de inventario',
+            },
+        ),
+        migrations.RunPython(calcular_resumen_inicial, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.8 on 2026-10-18 06:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_resumeninventario'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CierreStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('Diario', 'Diario'), ('Mensual', 'Mensual')], max_length=10)),
+                ('fecha_corte', models.DateTimeField(unique=True)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-fecha_corte'],
+            },
+        ),
+        migrations.CreateModel(
+            name='SnapshotStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stock', models.IntegerField()),
+                ('costo', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('activo', models.BooleanField(default=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='movimiento',
+            index=models.Index(fields=['producto', 'fecha'], name='movimiento_producto_fecha_idx'),
+        ),
+        migrations.AddField(
+            model_name='snapshotstock',
+            name='cierre',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='core.cierrestock'),
+        ),
+        migrations.AddField(
+            model_name='snapshotstock',
+            name='producto',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='core.producto'),
+        ),
+        migrations.AddConstraint(
+            model_name='snapshotstock',
+            constraint=models.UniqueConstraint(fields=('cierre', 'producto'), name='snapshotstock_cierre_producto_uniq'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+from django.db import migrations
+
+
+def crear_indices(apps, schema_editor):
+    # Solo PostgreSQL: en SQLite la búsqueda usa el índice de prefijos en memoria
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS producto_sku_trgm_idx '
+        'ON core_producto USING gin (UPPER(sku::text) gin_trgm_ops)'
+    )
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS producto_nombre_trgm_idx '
+        'ON core_producto USING gin (UPPER(nombre::text) gin_trgm_ops)'
+    )
+
+
+def eliminar_indices(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS producto_sku_trgm_idx')
+    schema_editor.execute('DROP INDEX IF EXISTS producto_nombre_trgm_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_rollups_ventas'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indices, eliminar_indices),
+    ]
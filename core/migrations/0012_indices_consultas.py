@@ -0,0 +1,33 @@
+# Generated by Django 5.2.8 on 2026-10-18 06:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_producto_busqueda_trigram'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='movimiento',
+            index=models.Index(fields=['usuario', '-fecha', '-id'], name='movimiento_usuario_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movimiento',
+            index=models.Index(fields=['tipo', '-fecha', '-id'], name='movimiento_tipo_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['id'], name='producto_activo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(condition=models.Q(('is_active', True), models.Q(models.Q(('nivel_minimo_stock__gt', 0), ('stock_actual__lte', models.F('nivel_minimo_stock'))), ('stock_actual', 0), _connector='OR')), fields=['id'], name='producto_bajo_stock_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='venta',
+            index=models.Index(fields=['-fecha', '-id'], name='venta_fecha_id_idx'),
+        ),
+    ]
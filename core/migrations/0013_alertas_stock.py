@@ -0,0 +1,32 @@
+# Generated by Django 5.2.8 on 2026-10-18 06:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_indices_consultas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AlertaStock',
+            fields=[
+                ('producto', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='alerta', serialize=False, to='core.producto')),
+                ('activa', models.BooleanField(default=True)),
+                ('stock', models.IntegerField()),
+                ('minimo', models.IntegerField()),
+                ('version', models.BigIntegerField(db_index=True)),
+                ('fecha', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ContadorVersion',
+            fields=[
+                ('nombre', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('valor', models.BigIntegerField(default=0)),
+            ],
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.8 on 2026-10-18 06:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_alertas_stock'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BajaCatalogo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('Producto', 'Producto'), ('Categoria', 'Categoria')], max_length=20)),
+                ('clave', models.CharField(max_length=50)),
+                ('version', models.BigIntegerField(db_index=True)),
+                ('fecha', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='categoria',
+            name='version',
+            field=models.BigIntegerField(db_index=True, default=0),
+        ),
+        migrations.AddField(
+            model_name='producto',
+            name='version',
+            field=models.BigIntegerField(db_index=True, default=0),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 06:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_sincronizacion_catalogo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resumeninventario',
+            name='revision',
+            field=models.BigIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.8 on 2026-10-18 07:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_reservas'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='producto',
+            name='fracciones',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='FraccionStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('indice', models.PositiveSmallIntegerField()),
+                ('stock', models.IntegerField(default=0)),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fracciones_stock', to='core.producto')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('producto', 'indice'), name='fraccion_stock_unica'), models.CheckConstraint(condition=models.Q(('stock__gte', 0)), name='fraccion_stock_no_negativo')],
+            },
+        ),
+    ]
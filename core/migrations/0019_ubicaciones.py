@@ -0,0 +1,91 @@
+# Generated by Django 5.2.8 on 2026-10-18 07:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import DecimalField, F, Sum
+
+
+def crear_principal(apps, schema_editor):
+    """Todo el stock existente queda en la ubicación principal."""
+    Producto = apps.get_model('core', 'Producto')
+    Ubicacion = apps.get_model('core', 'Ubicacion')
+    StockUbicacion = apps.get_model('core', 'StockUbicacion')
+    ResumenUbicacion = apps.get_model('core', 'ResumenUbicacion')
+
+    principal = Ubicacion.objects.create(nombre='Principal', tipo='Almacen', es_principal=True)
+    filas = (
+        StockUbicacion(producto_id=producto_id, ubicacion=principal, stock=max(stock, 0))
+        for producto_id, stock in Producto.objects.values_list('id', 'stock_actual').iterator()
+    )
+    StockUbicacion.objects.bulk_create(filas, batch_size=1000)
+    totales = Producto.objects.filter(is_active=True).aggregate(
+        total_stock=Sum('stock_actual'),
+        valor_inventario=Sum(F('stock_actual') * F('costo'), output_field=DecimalField()),
+    )
+    ResumenUbicacion.objects.create(ubicacion=principal, slot=0, **{k: v or 0 for k, v in totales.items()})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_stock_fraccionado'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='movimiento',
+            name='tipo',
+            field=models.CharField(choices=[('Entrada', 'Entrada'), ('Salida', 'Salida'), ('Creacion', 'Creacion'), ('Eliminacion', 'Eliminacion'), ('Transferencia', 'Transferencia')], max_length=20),
+        ),
+        migrations.CreateModel(
+            name='Ubicacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=100, unique=True)),
+                ('tipo', models.CharField(choices=[('Tienda', 'Tienda'), ('Almacen', 'Almacen')], default='Tienda', max_length=20)),
+                ('es_principal', models.BooleanField(default=False)),
+                ('is_active', models.BooleanField(default=True)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(condition=models.Q(('es_principal', True)), fields=('es_principal',), name='ubicacion_principal_unica')],
+            },
+        ),
+        migrations.AddField(
+            model_name='movimiento',
+            name='ubicacion',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='movimientos', to='core.ubicacion'),
+        ),
+        migrations.AddField(
+            model_name='movimiento',
+            name='ubicacion_destino',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='movimientos_recibidos', to='core.ubicacion'),
+        ),
+        migrations.CreateModel(
+            name='StockUbicacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stock', models.IntegerField(default=0)),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_ubicaciones', to='core.producto')),
+                ('ubicacion', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='stocks', to='core.ubicacion')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('producto', 'ubicacion'), name='stock_ubicacion_unico'), models.CheckConstraint(condition=models.Q(('stock__gte', 0)), name='stock_ubicacion_no_negativo')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ResumenUbicacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('slot', models.PositiveSmallIntegerField()),
+                ('total_stock', models.BigIntegerField(default=0)),
+                ('valor_inventario', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('ubicacion', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumenes', to='core.ubicacion')),
+            ],
+            options={
+                'verbose_name_plural': 'Resumen por ubicación',
+                'constraints': [models.UniqueConstraint(fields=('ubicacion', 'slot'), name='resumen_ubicacion_slot_unico')],
+            },
+        ),
+        migrations.RunPython(crear_principal, migrations.RunPython.noop),
+    ]
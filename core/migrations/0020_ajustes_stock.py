@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 07:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0019_ubicaciones'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='movimiento',
+            name='tipo',
+            field=models.CharField(choices=[('Entrada', 'Entrada'), ('Salida', 'Salida'), ('Creacion', 'Creacion'), ('Eliminacion', 'Eliminacion'), ('Transferencia', 'Transferencia'), ('AjusteEntrada', 'AjusteEntrada'), ('AjusteSalida', 'AjusteSalida')], max_length=20),
+        ),
+    ]
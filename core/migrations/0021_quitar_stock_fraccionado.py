@@ -0,0 +1,20 @@
+# Generated by Django 5.2.8 on 2026-10-18 07:48
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0020_ajustes_stock'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='producto',
+            name='fracciones',
+        ),
+        migrations.DeleteModel(
+            name='FraccionStock',
+        ),
+    ]
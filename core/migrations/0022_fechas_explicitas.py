@@ -0,0 +1,29 @@
+# Generated by Django 5.2.8 on 2026-10-18 07:56
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0021_quitar_stock_fraccionado'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='movimiento',
+            name='fecha',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='producto',
+            name='fecha_creacion',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='venta',
+            name='fecha',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+    ]
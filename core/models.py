@@ -1,5 +1,7 @@
 from django.db import models
+from django.db.models import F, Q
 from django.contrib.auth.models import AbstractUser
+from django.utils import timezone
 
 # 1. Modelo de Usuario Personalizado
 class Usuario(AbstractUser):
@@ -16,6 +18,8 @@ class Usuario(AbstractUser):
 class Categoria(models.Model):
     nombre = models.CharField(max_length=100, unique=True)
     descripcion = models.TextField(blank=True, null=True)
+    # Versión del último cambio, para la sincronización del catálogo (core/sincronizacion.py)
+    version = models.BigIntegerField(default=0, db_index=True)
 
     class Meta:
         verbose_name_plural = "Categorías"
@@ -40,26 +44,125 @@ class Producto(models.Model):
     
     stock_actual = models.IntegerField(default=0)
     nivel_minimo_stock = models.IntegerField(default=5)
-    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    # Como auto_now_add, pero un alta puede traer su fecha (datos sintéticos históricos)
+    fecha_creacion = models.DateTimeField(default=timezone.now, editable=False)
     is_active = models.BooleanField(default=True) # Para borrado lógico
+    # Versión del último cambio (incluido el stock), para la sincronización del catálogo
+    version = models.BigIntegerField(default=0, db_index=True)
+    # Unidades apartadas por carritos abiertos (core/reservas.py); disponible = stock - reservado
+    stock_reservado = models.IntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            # Catálogo activo paginado por id
+            models.Index(fields=['id'], condition=Q(is_active=True), name='producto_activo_idx'),
+            # Activos con stock bajo; mismo criterio que inventario.filtro_bajo_stock()
+            models.Index(
+                fields=['id'],
+                condition=Q(is_active=True) & (
+                    Q(nivel_minimo_stock__gt=0, stock_actual__lte=F('nivel_minimo_stock')) | Q(stock_actual=0)
+                ),
+                name='producto_bajo_stock_idx',
+            ),
+        ]
 
     def __str__(self):
         return f"{self.sku} - {self.nombre}"
 
+# --- UBICACIONES (TIENDAS Y ALMACENES) ---
+class Ubicacion(models.Model):
+    TIPOS = (
+        ('Tienda', 'Tienda'),
+        ('Almacen', 'Almacen'),
+    )
+
+    nombre = models.CharField(max_length=100, unique=True)
+    tipo = models.CharField(max_length=20, choices=TIPOS, default='Tienda')
+    # Recibe el stock de las rutas que no indican ubicación; hay exactamente una
+    es_principal = models.BooleanField(default=False)
+    is_active = models.BooleanField(default=True)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['es_principal'], condition=Q(es_principal=True),
+                                    name='ubicacion_principal_unica'),
+        ]
+
+    def __str__(self):
+        return self.nombre
+
+
+class StockUbicacion(models.Model):
+    # Stock de un producto en una ubicación. La suma de las filas de un producto
+    # es su stock_actual (core/ubicaciones.py la mantiene desde registrar_cambios).
+    producto = models.ForeignKey(Producto, related_name='stock_ubicaciones', on_delete=models.CASCADE)
+    ubicacion = models.ForeignKey(Ubicacion, related_name='stocks', on_delete=models.PROTECT)
+    stock = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['producto', 'ubicacion'], name='stock_ubicacion_unico'),
+            models.CheckConstraint(condition=Q(stock__gte=0), name='stock_ubicacion_no_negativo'),
+        ]
+
+    def __str__(self):
+        return f"{self.producto_id} en {self.ubicacion_id}: {self.stock}"
+
+
+class ResumenUbicacion(models.Model):
+    # Stock y valor de los productos activos por ubicación, repartidos en slots
+    # como ResumenInventario para que las ventas concurrentes no compitan por una fila
+    ubicacion = models.ForeignKey(Ubicacion, related_name='resumenes', on_delete=models.CASCADE)
+    slot = models.PositiveSmallIntegerField()
+    total_stock = models.BigIntegerField(default=0)
+    valor_inventario = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name_plural = "Resumen por ubicación"
+        constraints = [
+            models.UniqueConstraint(fields=['ubicacion', 'slot'], name='resumen_ubicacion_slot_unico'),
+        ]
+
+    def __str__(self):
+        return f"Resumen de {self.ubicacion_id} (slot {self.slot})"
+
+
 # 3. Modelo de Movimiento
 class Movimiento(models.Model):
     TIPOS = (
         ('Entrada', 'Entrada'), 
         ('Salida', 'Salida'), 
         ('Creacion', 'Creacion'), 
-        ('Eliminacion', 'Eliminacion')
+        ('Eliminacion', 'Eliminacion'),
+        ('Transferencia', 'Transferencia'),
+        # Stock fijado directamente (edición, reactivación, admin): la diferencia con su signo
+        ('AjusteEntrada', 'AjusteEntrada'),
+        ('AjusteSalida', 'AjusteSalida'),
     )
     
     tipo = models.CharField(max_length=20, choices=TIPOS)
     producto = models.ForeignKey(Producto, on_delete=models.SET_NULL, null=True)
     usuario = models.ForeignKey(Usuario, on_delete=models.SET_NULL, null=True)
     cantidad = models.PositiveIntegerField()
-    fecha = models.DateTimeField(auto_now_add=True)
+    fecha = models.DateTimeField(default=timezone.now, editable=False)
+    # Sin ubicación el movimiento es de la ubicación principal (incluidos los anteriores a las ubicaciones).
+    # Una transferencia sale de ``ubicacion`` y entra en ``ubicacion_destino``.
+    ubicacion = models.ForeignKey(Ubicacion, related_name='movimientos', on_delete=models.PROTECT,
+                                  null=True, blank=True)
+    ubicacion_destino = models.ForeignKey(Ubicacion, related_name='movimientos_recibidos',
+                                          on_delete=models.PROTECT, null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Kardex paginado por llave (fecha, id)
+            models.Index(fields=['-fecha', '-id'], name='movimiento_fecha_id_idx'),
+            # Movimientos de un producto en un rango (stock a una fecha)
+            models.Index(fields=['producto', 'fecha'], name='movimiento_producto_fecha_idx'),
+            # Kardex de un Operador y filtro por tipo, con el mismo orden de la paginación
+            models.Index(fields=['usuario', '-fecha', '-id'], name='movimiento_usuario_fecha_idx'),
+            models.Index(fields=['tipo', '-fecha', '-id'], name='movimiento_tipo_fecha_idx'),
+        ]
 
     def __str__(self):
         nom_prod = self.producto.sku if self.producto else "Producto Eliminado"
@@ -67,9 +170,17 @@ class Movimiento(models.Model):
     
 class Venta(models.Model):
     folio = models.CharField(max_length=50, unique=True) 
-    fecha = models.DateTimeField(auto_now_add=True)
+    fecha = models.DateTimeField(default=timezone.now, editable=False)
     total = models.DecimalField(max_digits=10, decimal_places=2)
     usuario = models.ForeignKey(Usuario, on_delete=models.SET_NULL, null=True)
+    # Generada por la terminal POS para que un reintento no registre la venta dos veces
+    clave_idempotencia = models.CharField(max_length=64, unique=True, null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Listado de ventas más recientes primero
+            models.Index(fields=['-fecha', '-id'], name='venta_fecha_id_idx'),
+        ]
 
     def __str__(self):
         return f"Venta {self.folio} - ${self.total}"
@@ -82,4 +193,178 @@ class DetalleVenta(models.Model):
     subtotal = models.DecimalField(max_digits=10, decimal_places=2)
 
     def __str__(self):
-        return f"{self.cantidad}x {self.producto.sku}"
\ No newline at end of file
+        return f"{self.cantidad}x {self.producto.sku}"
+
+# --- FOLIOS DE VENTA ---
+class SecuenciaFolio(models.Model):
+    prefijo = models.CharField(max_length=20, unique=True)
+    siguiente = models.PositiveBigIntegerField(default=1)
+
+    def __str__(self):
+        return f"{self.prefijo} (siguiente: {self.siguiente})"
+
+class BloqueFolio(models.Model):
+    # Registro de cada rango reservado por un proceso, para auditar huecos
+    prefijo = models.CharField(max_length=20)
+    inicio = models.PositiveBigIntegerField()
+    fin = models.PositiveBigIntegerField()
+    proceso = models.CharField(max_length=100)
+    fecha = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['prefijo', 'inicio']
+        constraints = [
+            models.UniqueConstraint(fields=['prefijo', 'inicio'], name='bloquefolio_prefijo_inicio_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.prefijo} {self.inicio}-{self.fin} ({self.proceso})"
+
+
+# --- RESUMEN DEL DASHBOARD ---
+class ResumenInventario(models.Model):
+    # Totales mantenidos de forma incremental por las rutas de escritura.
+    # Se reparten en varias filas ("slots") para que las ventas concurrentes
+    # no compitan por el mismo candado; el dashboard suma las pocas filas.
+    slot = models.PositiveSmallIntegerField(unique=True)
+    total_productos = models.IntegerField(default=0)
+    total_stock = models.BigIntegerField(default=0)
+    valor_inventario = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    productos_bajo_stock = models.IntegerField(default=0)
+    total_entradas = models.BigIntegerField(default=0)
+    total_salidas = models.BigIntegerField(default=0)
+    # Suma 1 con cada cambio que altera los listados; su total alimenta los ETag (core/respuestas.py)
+    revision = models.BigIntegerField(default=0)
+
+    class Meta:
+        verbose_name_plural = "Resumen de inventario"
+
+    def __str__(self):
+        return f"Resumen (slot {self.slot})"
+
+
+# --- CIERRES DE STOCK ---
+class CierreStock(models.Model):
+    TIPOS = (('Diario', 'Diario'), ('Mensual', 'Mensual'))
+
+    tipo = models.CharField(max_length=10, choices=TIPOS)
+    fecha_corte = models.DateTimeField(unique=True)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-fecha_corte']
+
+    def __str__(self):
+        return f"Cierre {self.tipo} {self.fecha_corte:%Y-%m-%d %H:%M}"
+
+class SnapshotStock(models.Model):
+    cierre = models.ForeignKey(CierreStock, related_name='snapshots', on_delete=models.CASCADE)
+    producto = models.ForeignKey(Producto, related_name='snapshots', on_delete=models.CASCADE)
+    stock = models.IntegerField()
+    costo = models.DecimalField(max_digits=10, decimal_places=2)
+    activo = models.BooleanField(default=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['cierre', 'producto'], name='snapshotstock_cierre_producto_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.producto_id} @ {self.cierre_id}: {self.stock}"
+
+
+# --- ANALÍTICA DE VENTAS (ROLLUPS DIARIOS) ---
+class VentaDiariaProducto(models.Model):
+    fecha = models.DateField()
+    producto = models.ForeignKey(Producto, related_name='ventas_diarias', on_delete=models.CASCADE)
+    unidades = models.BigIntegerField(default=0)
+    importe = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    lineas = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['fecha', 'producto'], name='ventadiariaproducto_fecha_producto_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.fecha} {self.producto_id}: {self.unidades}"
+
+class VentaDiariaCajero(models.Model):
+    fecha = models.DateField()
+    usuario = models.ForeignKey(Usuario, related_name='ventas_diarias', on_delete=models.SET_NULL, null=True)
+    num_ventas = models.IntegerField(default=0)
+    unidades = models.BigIntegerField(default=0)
+    importe = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['fecha', 'usuario'], name='ventadiariacajero_fecha_usuario_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.fecha} {self.usuario_id}: {self.num_ventas} ventas"
+
+
+# --- VERSIONES PARA CONSULTAS INCREMENTALES ---
+class ContadorVersion(models.Model):
+    # Versiones de la sincronización fuera de PostgreSQL (core/versiones.py) y versión
+    # de las cachés del catálogo por proceso (core/catalogo.py)
+    nombre = models.CharField(max_length=50, primary_key=True)
+    valor = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.nombre}: {self.valor}"
+
+
+# --- RESERVAS DE CARRITOS ABIERTOS ---
+class Reserva(models.Model):
+    # Unidades apartadas por un carrito del POS hasta que se cobra, se cancela o vence.
+    # Su suma por producto se mantiene en Producto.stock_reservado.
+    carrito = models.CharField(max_length=64)
+    producto = models.ForeignKey(Producto, related_name='reservas', on_delete=models.CASCADE)
+    usuario = models.ForeignKey(Usuario, on_delete=models.CASCADE)
+    cantidad = models.PositiveIntegerField()
+    expira = models.DateTimeField(db_index=True)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['usuario', 'carrito', 'producto'], name='reserva_carrito_producto_unica'),
+        ]
+
+    def __str__(self):
+        return f"{self.carrito}: {self.cantidad}x {self.producto_id} (vence {self.expira})"
+
+
+# --- BAJAS DEFINITIVAS DEL CATÁLOGO ---
+class BajaCatalogo(models.Model):
+    # Productos y categorías borrados físicamente: ya no tienen fila donde llevar
+    # su versión, así que la sincronización los informa desde aquí
+    TIPOS = (
+        ('Producto', 'Producto'),
+        ('Categoria', 'Categoria')
+    )
+
+    tipo = models.CharField(max_length=20, choices=TIPOS)
+    clave = models.CharField(max_length=50)  # SKU del producto o id de la categoría
+    version = models.BigIntegerField(db_index=True)
+    fecha = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.tipo} {self.clave} (versión {self.version})"
+
+
+# --- ALERTAS DE STOCK BAJO ---
+class AlertaStock(models.Model):
+    # Una fila por producto que ha estado en stock bajo. Al salir de la alerta la
+    # fila queda con activa=False para que los clientes que sondean se enteren.
+    producto = models.OneToOneField(Producto, primary_key=True, related_name='alerta', on_delete=models.CASCADE)
+    activa = models.BooleanField(default=True)
+    stock = models.IntegerField()
+    minimo = models.IntegerField()
+    version = models.BigIntegerField(db_index=True)
+    fecha = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        estado = 'activa' if self.activa else 'resuelta'
+        return f"{self.producto_id}: {self.stock}/{self.minimo} ({estado})"
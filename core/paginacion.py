@@ -0,0 +1,116 @@
+import base64
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.utils import timezone
+
+LIMITE_DEFAULT = 50
+LIMITE_MAXIMO = 500
+
+
+def _a_json(valor):
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    if isinstance(valor, Decimal):
+        return str(valor)
+    raise TypeError(f"Valor no serializable en cursor: {valor!r}")
+
+
+def codificar_cursor(valores):
+    crudo = json.dumps(list(valores), default=_a_json, separators=(',', ':'))
+    return base64.urlsafe_b64encode(crudo.encode()).decode().rstrip('=')
+
+
+def _leer_valor(campo, valor):
+    """Convierte un valor del cursor al tipo de ``campo``; el cursor llega del cliente."""
+    if not isinstance(valor, (str, int)) or isinstance(valor, bool):
+        raise ValueError('Cursor inválido.')
+    try:
+        valor = campo.to_python(valor)
+    except (ValidationError, TypeError, ValueError):
+        raise ValueError('Cursor inválido.')
+    if valor is None:
+        raise ValueError('Cursor inválido.')
+    if isinstance(valor, datetime) and timezone.is_naive(valor):
+        valor = timezone.make_aware(valor)
+    return valor
+
+
+def decodificar_cursor(token, campos):
+    """Valores del cursor convertidos al tipo de cada campo del orden; ``ValueError`` si no es válido."""
+    try:
+        relleno = '=' * (-len(token) % 4)
+        valores = json.loads(base64.urlsafe_b64decode(token + relleno))
+    except (ValueError, TypeError):
+        raise ValueError('Cursor inválido.')
+    if not isinstance(valores, list) or len(valores) != len(campos):
+        raise ValueError('Cursor inválido.')
+    return [_leer_valor(campo, valor) for campo, valor in zip(campos, valores)]
+
+
+def leer_limite(params, default=LIMITE_DEFAULT, maximo=LIMITE_MAXIMO):
+    try:
+        limite = int(params.get('limite', default))
+    except (TypeError, ValueError):
+        raise ValueError('El límite debe ser un número entero.')
+    if limite <= 0:
+        raise ValueError('El límite debe ser positivo.')
+    return min(limite, maximo)
+
+
+def _condicion_siguiente(orden, valores):
+    # Comparación lexicográfica (a, b) < (x, y)  =>  a < x  OR  (a = x AND b < y)
+    condicion = Q()
+    for i, campo in enumerate(orden):
+        nombre = campo.lstrip('-')
+        lookup = 'lt' if campo.startswith('-') else 'gt'
+        parcial = Q(**{f'{nombre}__{lookup}': valores[i]})
+        for previo, valor in zip(orden[:i], valores):
+            parcial &= Q(**{previo.lstrip('-'): valor})
+        condicion |= parcial
+    return condicion
+
+
+def _valor(fila, campo):
+    if isinstance(fila, dict):
+        return fila[campo]
+    return getattr(fila, campo)
+
+
+def _preparar(queryset, orden, cursor):
+    queryset = queryset.order_by(*orden)
+    if cursor:
+        campos = [queryset.model._meta.get_field(campo.lstrip('-')) for campo in orden]
+        valores = decodificar_cursor(cursor, campos)
+        queryset = queryset.filter(_condicion_siguiente(orden, valores))
+    return queryset
+
+
+def _cortar(filas, orden, limite):
+    siguiente = None
+    if len(filas) > limite:
+        filas = filas[:limite]
+        ultima = filas[-1]
+        siguiente = codificar_cursor(_valor(ultima, c.lstrip('-')) for c in orden)
+    return filas, siguiente
+
+
+def paginar_keyset(queryset, orden, cursor=None, limite=LIMITE_DEFAULT):
+    """Devuelve ``(filas, siguiente_cursor)`` usando paginación por llave (keyset).
+
+    ``orden`` es la tupla de campos que identifica de forma única cada fila,
+    por ejemplo ``('-fecha', '-id')``. Cada página cuesta lo mismo sin importar
+    qué tan atrás esté, porque se filtra por la última llave vista en vez de
+    usar OFFSET.
+    """
+    queryset = _preparar(queryset, orden, cursor)
+    return _cortar(list(queryset[:limite + 1]), orden, limite)
+
+
+async def apaginar_keyset(queryset, orden, cursor=None, limite=LIMITE_DEFAULT):
+    """Versión async de ``paginar_keyset``."""
+    queryset = _preparar(queryset, orden, cursor)
+    return _cortar([fila async for fila in queryset[:limite + 1]], orden, limite)
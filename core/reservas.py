@@ -0,0 +1,195 @@
+"""Reservas con vencimiento para los carritos abiertos del POS.
+
+Agregar un producto al carrito aparta las unidades con una ``Reserva`` que
+vence a los ``RESERVAS['MINUTOS']`` de la última modificación del carrito. El
+total apartado por producto se mantiene en ``Producto.stock_reservado`` con
+``UPDATE`` condicionales (sin ``SELECT ... FOR UPDATE`` del producto), así que
+lo disponible es ``stock_actual - stock_reservado`` sin sumar reservas por
+petición.
+
+Al cobrar, ``consumir`` convierte las reservas del carrito en salida de stock
+con un solo ``UPDATE``: el stock ya estaba garantizado y el producto no se
+vuelve a bloquear. Las reservas vencidas se liberan en bloque con
+``barrer_vencidas`` (``manage.py barrer_reservas``) y, para no esperar al
+barrido, también cuando una reserva nueva no alcanza por culpa de ellas.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Producto, Reserva
+from .sincronizacion import CONTADOR as CONTADOR_CATALOGO
+from .ventas import VentaRechazada
+from .versiones import expresion_version
+
+LARGO_CARRITO = 64
+LIMITE_BARRIDO = 1000
+
+
+class ReservaRechazada(Exception):
+    def __init__(self, mensaje, status=400):
+        super().__init__(mensaje)
+        self.status = status
+
+
+def leer_carrito(carrito):
+    if not isinstance(carrito, str) or not 0 < len(carrito) <= LARGO_CARRITO:
+        raise ReservaRechazada(f"'carrito' debe ser un texto de 1 a {LARGO_CARRITO} caracteres.")
+    return carrito
+
+
+def vencimiento():
+    return timezone.now() + timedelta(minutes=settings.RESERVAS['MINUTOS'])
+
+
+def _por_producto(cantidades):
+    """``CASE`` con la cantidad de cada producto, para ajustarlos en un solo ``UPDATE``."""
+    return Case(
+        *[When(id=prod_id, then=Value(cantidad)) for prod_id, cantidad in cantidades.items()],
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+
+
+def _apartar(producto_id, cantidad):
+    """Suma ``cantidad`` a lo reservado solo si el stock la cubre; indica si se pudo."""
+    return Producto.objects.filter(
+        id=producto_id, is_active=True, stock_actual__gte=F('stock_reservado') + cantidad
+    ).update(stock_reservado=F('stock_reservado') + cantidad) == 1
+
+
+def _barrer(reservas, limite):
+    ahora = timezone.now()
+    with transaction.atomic():
+        # Las filas que otra transacción tiene bloqueadas (un cobro en curso) se dejan para después
+        vencidas = list(
+            reservas.filter(expira__lte=ahora).select_for_update(skip_locked=True).order_by('id')
+            .values_list('id', 'producto_id', 'cantidad')[:limite]
+        )
+        if not vencidas:
+            return 0
+        liberadas = defaultdict(int)
+        for _, prod_id, cantidad in vencidas:
+            liberadas[prod_id] += cantidad
+        Producto.objects.filter(id__in=liberadas).update(
+            stock_reservado=F('stock_reservado') - _por_producto(liberadas)
+        )
+        Reserva.objects.filter(id__in=[id_reserva for id_reserva, _, _ in vencidas]).delete()
+    return len(vencidas)
+
+
+def barrer_vencidas(limite=LIMITE_BARRIDO):
+    """Libera hasta ``limite`` reservas vencidas; devuelve cuántas liberó."""
+    return _barrer(Reserva.objects.all(), limite)
+
+
+def reservar(usuario, carrito, producto_id, cantidad):
+    """Deja en ``cantidad`` lo apartado del producto en el carrito (0 lo libera).
+
+    Renueva el vencimiento de todo el carrito y devuelve la reserva, o ``None``
+    si quedó en 0. Si no hay suficiente disponible lanza ``ReservaRechazada``
+    con estado 409.
+    """
+    if not isinstance(cantidad, int) or isinstance(cantidad, bool) or cantidad < 0:
+        raise ReservaRechazada("'cantidad' debe ser un entero mayor o igual a 0.")
+    with transaction.atomic():
+        reserva = Reserva.objects.select_for_update().filter(
+            usuario=usuario, carrito=carrito, producto_id=producto_id
+        ).first()
+        delta = cantidad - (reserva.cantidad if reserva else 0)
+
+        if delta > 0 and not _apartar(producto_id, delta):
+            producto = Producto.objects.filter(id=producto_id, is_active=True).first()
+            if producto is None:
+                raise ReservaRechazada('Producto no encontrado.', status=404)
+            # Puede que lo ocupen reservas vencidas aún sin barrer (las de este carrito se renuevan)
+            otras = Reserva.objects.filter(producto_id=producto_id).exclude(usuario=usuario, carrito=carrito)
+            if not _barrer(otras, LIMITE_BARRIDO) or not _apartar(producto_id, delta):
+                producto.refresh_from_db(fields=['stock_actual', 'stock_reservado'])
+                disponible = max(producto.stock_actual - producto.stock_reservado, 0)
+                raise ReservaRechazada(f"Stock insuficiente para {producto.nombre}: disponibles {disponible}.",
+                                       status=409)
+        elif delta < 0:
+            Producto.objects.filter(id=producto_id).update(stock_reservado=F('stock_reservado') + delta)
+
+        expira = vencimiento()
+        if cantidad == 0:
+            if reserva is not None:
+                reserva.delete()
+            reserva = None
+        elif reserva is None:
+            reserva = Reserva.objects.create(usuario=usuario, carrito=carrito, producto_id=producto_id,
+                                             cantidad=cantidad, expira=expira)
+        else:
+            reserva.cantidad = cantidad
+            reserva.save(update_fields=['cantidad'])
+        Reserva.objects.filter(usuario=usuario, carrito=carrito).update(expira=expira)
+        if reserva is not None:
+            reserva.expira = expira
+    return reserva
+
+
+def liberar_carrito(usuario, carrito):
+    """Cancela todas las reservas del carrito; devuelve cuántas había."""
+    with transaction.atomic():
+        reservas = list(
+            Reserva.objects.select_for_update().filter(usuario=usuario, carrito=carrito)
+            .values_list('id', 'producto_id', 'cantidad')
+        )
+        if not reservas:
+            return 0
+        liberadas = defaultdict(int)
+        for _, prod_id, cantidad in reservas:
+            liberadas[prod_id] += cantidad
+        Producto.objects.filter(id__in=liberadas).update(
+            stock_reservado=F('stock_reservado') - _por_producto(liberadas)
+        )
+        Reserva.objects.filter(id__in=[id_reserva for id_reserva, _, _ in reservas]).delete()
+    return len(reservas)
+
+
+def consumir(usuario, carrito, requerido):
+    """Convierte las reservas del carrito en salida de stock para una venta.
+
+    ``requerido`` es ``{producto_id: cantidad}`` de la venta. De cada producto
+    reservado se descuenta del stock lo que la venta usa (hasta lo reservado) y
+    se libera toda la reserva, incluido lo que sobre. Devuelve
+    ``{producto_id: unidades cubiertas}``; el resto debe validarse como una
+    venta sin reserva. Debe llamarse dentro de la transacción de la venta.
+    """
+    reservas = list(
+        Reserva.objects.select_for_update().filter(usuario=usuario, carrito=carrito)
+        .values_list('id', 'producto_id', 'cantidad')
+    )
+    reservado = defaultdict(int)
+    for _, prod_id, cantidad in reservas:
+        reservado[prod_id] += cantidad
+    if not reservado:
+        return {}
+    cubierto = {prod_id: min(cantidad, requerido.get(prod_id, 0)) for prod_id, cantidad in reservado.items()}
+
+    # Una salida manual pudo dejar el stock por debajo de lo reservado; entonces no se cobra
+    actualizados = Producto.objects.filter(
+        id__in=reservado, stock_actual__gte=_por_producto(cubierto)
+    ).update(
+        stock_actual=F('stock_actual') - _por_producto(cubierto),
+        stock_reservado=F('stock_reservado') - _por_producto(reservado),
+        version=expresion_version(CONTADOR_CATALOGO),
+    )
+    if actualizados != len(reservado):
+        raise VentaRechazada('El stock reservado ya no está disponible; vuelve a armar el carrito.', status=409)
+    Reserva.objects.filter(id__in=[id_reserva for id_reserva, _, _ in reservas]).delete()
+    return {prod_id: cantidad for prod_id, cantidad in cubierto.items() if cantidad}
+
+
+def reconstruir_reservados():
+    """Recalcula ``stock_reservado`` de todos los productos a partir de las reservas."""
+    suma = Reserva.objects.filter(producto=OuterRef('pk')).values('producto').annotate(
+        total=Sum('cantidad')
+    ).values('total')
+    return Producto.objects.update(stock_reservado=Coalesce(Subquery(suma), 0))
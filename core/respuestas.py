@@ -0,0 +1,110 @@
+"""Respuestas HTTP más ligeras para los listados grandes.
+
+- ``RespuestaCondicionalMixin``: ETag en los GET de productos, categorías,
+  ventas y movimientos. El ETag sale de la revisión de ``ResumenInventario``
+  (una suma sobre pocas filas que crece con cada cambio confirmado), de la URL
+  y del usuario, así que se calcula antes de la vista: si coincide con
+  ``If-None-Match`` se responde 304 sin consultar ni serializar nada más.
+- ``JSONRendererRapido``: el mismo JSON que DRF pero generado con ``orjson``
+  cuando está instalado.
+
+La compresión gzip/brotli está en ``CompresionMiddleware`` (core/middleware.py)
+y ``manage.py medir_respuestas`` compara bytes y tiempos de cada opción.
+"""
+import hashlib
+
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+from .instrumentacion import JSONRendererMedido
+from .inventario import leer_revision
+
+try:
+    import orjson
+except ImportError:  # orjson es opcional (ver JSON_RAPIDO en settings.py)
+    orjson = None
+
+
+# --- GET CONDICIONAL ---
+class NoModificado(APIException):
+    status_code = status.HTTP_304_NOT_MODIFIED
+
+
+def _opaco(etag):
+    # Comparación débil: GZip y la compresión brotli convierten el ETag en W/"..."
+    return etag[2:] if etag.startswith('W/') else etag
+
+
+def calcular_etag(request):
+    """ETag de un GET: revisión de los datos, URL completa, usuario y formato de salida."""
+    usuario = request.user
+    partes = (
+        leer_revision(),
+        request.get_full_path(),
+        usuario.pk,
+        getattr(usuario, 'role', ''),
+        request.accepted_renderer.format,
+    )
+    return '"%s"' % hashlib.md5(repr(partes).encode(), usedforsecurity=False).hexdigest()
+
+
+class RespuestaCondicionalMixin:
+    """Para vistas de DRF: ETag en los GET y 304 cuando el cliente ya tiene la respuesta.
+
+    Solo debe usarse en vistas cuyos datos cambian únicamente por rutas que
+    suman a la revisión (``registrar_cambios`` o ``tocar_revision``).
+    """
+
+    def initial(self, request, *args, **kwargs):
+        self.etag = None
+        super().initial(request, *args, **kwargs)
+        if request.method not in ('GET', 'HEAD'):
+            return
+        self.etag = calcular_etag(request)
+        enviados = parse_etags(request.headers.get('If-None-Match', ''))
+        if '*' in enviados or _opaco(self.etag) in {_opaco(e) for e in enviados}:
+            raise NoModificado()
+
+    def handle_exception(self, exc):
+        if isinstance(exc, NoModificado):
+            return Response(status=status.HTTP_304_NOT_MODIFIED)
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        etag = getattr(self, 'etag', None)
+        if etag and response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+            response['ETag'] = etag
+            # El cliente puede guardar la respuesta pero debe revalidarla en cada uso
+            response['Cache-Control'] = 'private, no-cache'
+        return response
+
+
+# --- JSON CON ORJSON ---
+_codificador = JSONEncoder()
+
+
+class JSONRendererRapido(JSONRendererMedido):
+    """Mismo JSON que ``JSONRenderer`` (compacto, UTF-8, fechas UTC con ``Z``) generado con orjson.
+
+    Los tipos que orjson no conoce (``Decimal``, textos diferidos, etc.) pasan
+    por el codificador de DRF. Sin orjson, con sangría (API navegable) o ante
+    un valor que orjson no acepta se usa el renderer normal.
+    """
+    OPCIONES = (orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS) if orjson is not None else 0
+
+    def serializar(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if orjson is None or self.get_indent(accepted_media_type or '', renderer_context or {}):
+            return super().serializar(data, accepted_media_type, renderer_context)
+        try:
+            contenido = orjson.dumps(data, default=_codificador.default, option=self.OPCIONES)
+        except orjson.JSONEncodeError:
+            # Enteros de más de 64 bits, por ejemplo
+            return super().serializar(data, accepted_media_type, renderer_context)
+        # Como DRF, se escapan U+2028 y U+2029 para que el JSON también sea JavaScript válido
+        return contenido.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
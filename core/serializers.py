@@ -1,7 +1,7 @@
 from rest_framework import serializers
 from .models import Categoria, Usuario, Producto, Movimiento
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
-from .models import Venta, DetalleVenta
+from .models import Venta, DetalleVenta, CierreStock, Ubicacion
 
 class MyTokenObtainPairSerializer(TokenObtainPairSerializer):
     def validate(self, attrs):
@@ -21,7 +21,7 @@ class UsuarioSerializer(serializers.ModelSerializer):
 class CategoriaSerializer(serializers.ModelSerializer):
     class Meta:
         model = Categoria
-        fields = '__all__'
+        exclude = ('version',)
 
 class ProductoSerializer(serializers.ModelSerializer):
     Nombre_Categoria = serializers.CharField(source='categoria.nombre', read_only=True)
@@ -80,6 +80,9 @@ class MovimientoSerializer(serializers.ModelSerializer):
     Fecha = serializers.DateTimeField(source='fecha', read_only=True)
 
     Cantidad = serializers.IntegerField(source='cantidad', read_only=True)
+    # Sin ubicación el movimiento es de la ubicación principal
+    Ubicacion = serializers.IntegerField(source='ubicacion_id', read_only=True)
+    Ubicacion_Destino = serializers.IntegerField(source='ubicacion_destino_id', read_only=True)
 
     sku_input = serializers.CharField(write_only=True, required=False) 
 
@@ -87,9 +90,21 @@ class MovimientoSerializer(serializers.ModelSerializer):
         model = Movimiento
         fields = [
             'id', 'tipo', 'Cantidad', 'Fecha', 
-            'Nombre_Producto', 'Email_Usuario', 'SKU', 'sku_input'
+            'Nombre_Producto', 'Email_Usuario', 'SKU', 'Ubicacion', 'Ubicacion_Destino', 'sku_input'
         ]
         
+class UbicacionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Ubicacion
+        fields = ['id', 'nombre', 'tipo', 'es_principal', 'is_active', 'fecha_creacion']
+        # La principal la crea la migración y no se cambia desde la API
+        read_only_fields = ['es_principal', 'fecha_creacion']
+
+    def validate_is_active(self, valor):
+        if not valor and self.instance is not None and self.instance.es_principal:
+            raise serializers.ValidationError('La ubicación principal no se puede desactivar.')
+        return valor
+
 class DetalleVentaSerializer(serializers.ModelSerializer):
     Nombre_Producto = serializers.CharField(source='producto.nombre', read_only=True)
     
@@ -103,4 +118,9 @@ class VentaSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Venta
-        fields = ['id', 'folio', 'fecha', 'total', 'Usuario', 'detalles']
\ No newline at end of file
+        fields = ['id', 'folio', 'fecha', 'total', 'Usuario', 'detalles']
+
+class CierreStockSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = CierreStock
+        fields = ['id', 'tipo', 'fecha_corte', 'fecha_creacion']
@@ -0,0 +1,108 @@
+"""Sincronización incremental del catálogo para las terminales POS.
+
+Cada producto y categoría guarda en ``version`` la versión de la transacción
+que lo cambió por última vez (ver core/versiones.py). ``registrar_cambios``
+marca los productos que toca, así que entran también los cambios de stock de
+ventas y movimientos y las bajas lógicas. Las rutas de stock escriben la
+versión en el mismo ``UPDATE`` que el stock (``guardar_stock``) y se lo indican
+a ``registrar_cambios`` para que no los vuelva a marcar. Renombrar o borrar una categoría
+marca además sus productos, porque su fila incluye el nombre de la categoría.
+
+La terminal descarga el catálogo completo una vez y después pide
+``desde=<version>``: recibe los productos activos que cambiaron, los SKU dados
+de baja (lógica o física) y las categorías que cambiaron o se borraron. Un
+mismo cambio puede llegar dos veces, así que debe aplicarse como upsert por
+``ID_Producto``.
+"""
+from django.db.models import Case, IntegerField, Value, When
+
+from .catalogo import CAMPOS, fila_producto
+from .models import BajaCatalogo, Categoria, Producto
+from .versiones import expresion_version, marca_segura, version_transaccion
+
+CONTADOR = 'catalogo'
+
+
+def marcar_productos(productos):
+    """Marca con la versión de la transacción actual los productos modificados."""
+    ids = [p.id for p in productos]
+    if not ids:
+        return
+    version = version_transaccion(CONTADOR)
+    Producto.objects.filter(id__in=ids).update(version=version)
+    for producto in productos:
+        producto.version = version
+
+
+def guardar_stock(productos):
+    """Escribe ``stock_actual`` de ``productos`` y su versión en un solo ``UPDATE``."""
+    if not productos:
+        return
+    Producto.objects.filter(id__in=[p.id for p in productos]).update(
+        stock_actual=Case(*[When(id=p.id, then=Value(p.stock_actual)) for p in productos],
+                          output_field=IntegerField()),
+        version=expresion_version(CONTADOR),
+    )
+
+
+def marcar_categoria(categoria):
+    """Marca una categoría creada o editada y los productos que muestran su nombre."""
+    version = version_transaccion(CONTADOR)
+    Categoria.objects.filter(id=categoria.id).update(version=version)
+    Producto.objects.filter(categoria_id=categoria.id).update(version=version)
+    categoria.version = version
+
+
+def registrar_bajas(tipo, claves):
+    """Deja constancia de productos (por SKU) o categorías (por id) borrados físicamente.
+
+    Para categorías debe llamarse antes del borrado: sus productos quedan sin
+    categoría y se marcan para que la terminal actualice su fila.
+    """
+    claves = [str(clave) for clave in claves]
+    if not claves:
+        return
+    version = version_transaccion(CONTADOR)
+    if tipo == 'Categoria':
+        Producto.objects.filter(categoria_id__in=claves).update(version=version)
+    BajaCatalogo.objects.bulk_create([BajaCatalogo(tipo=tipo, clave=clave, version=version) for clave in claves])
+
+
+def fila_categoria(valores):
+    return {'id': valores['id'], 'nombre': valores['nombre'], 'descripcion': valores['descripcion']}
+
+
+def cambios_desde(desde=None):
+    """Catálogo activo completo o, con ``desde``, solo lo que cambió a partir de esa versión."""
+    marca = marca_segura(CONTADOR)
+    if desde is None:
+        productos = Producto.objects.filter(is_active=True)
+        categorias = Categoria.objects.all()
+        bajas = []
+    else:
+        productos = Producto.objects.filter(version__gte=desde)
+        categorias = Categoria.objects.filter(version__gte=desde)
+        bajas = list(BajaCatalogo.objects.filter(version__gte=desde).values_list('tipo', 'clave'))
+
+    filas, skus_baja = [], []
+    for valores in productos.order_by('id').values(*CAMPOS, 'is_active'):
+        if valores['is_active']:
+            filas.append(fila_producto(valores))
+        else:
+            skus_baja.append(valores['sku'])
+    filas_categorias = [fila_categoria(v) for v in categorias.order_by('id').values('id', 'nombre', 'descripcion')]
+
+    # Un SKU borrado y vuelto a crear en la misma ventana llega solo como alta
+    vigentes = {f['SKU'] for f in filas}
+    skus_baja += [clave for tipo, clave in bajas if tipo == 'Producto' and clave not in vigentes]
+    categorias_vigentes = {str(c['id']) for c in filas_categorias}
+    return {
+        'version': marca,
+        'completo': desde is None,
+        'productos': filas,
+        'bajas': sorted(set(skus_baja)),
+        'categorias': filas_categorias,
+        'categoriasBorradas': sorted({
+            int(clave) for tipo, clave in bajas if tipo == 'Categoria' and clave not in categorias_vigentes
+        }),
+    }
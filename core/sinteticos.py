@@ -0,0 +1,330 @@
+"""Generador de datos sintéticos de gran volumen para perfilar la API.
+
+Crea categorías, productos, cajeros, ventas con sus detalles y el Kardex
+completo (altas, entradas, mermas y las salidas de cada línea de venta) a lo
+largo de un periodo de días. Todo sale de un ``random.Random`` con semilla, así
+que la misma configuración produce siempre los mismos datos.
+
+La simulación avanza día por día en orden cronológico y lleva el stock de cada
+producto en memoria: una venta nunca toma más de lo disponible y el
+``stock_actual`` final es exactamente la existencia inicial de la 'Creacion' más
+las Entradas menos las Salidas, igual que si los datos hubieran llegado por la
+API. Las filas se insertan con ``bulk_create`` por lotes, de modo que la memoria
+depende del lote y de los productos, no del número de movimientos.
+
+Al terminar se reconstruyen los totales del dashboard y los rollups de ventas.
+"""
+import math
+import random
+from datetime import datetime, time, timedelta
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+
+from . import analitica
+from .catalogo import invalidar_catalogo
+from .folios import formatear, prefijo_para, reservar_bloque
+from .inventario import reconstruir_alertas, reconstruir_resumen
+from .models import Categoria, DetalleVenta, Movimiento, Producto, Usuario, Venta
+from .sincronizacion import CONTADOR as CONTADOR_CATALOGO
+from .versiones import version_transaccion
+
+DOMINIO = 'sintetico.local'
+CENTAVOS = Decimal('0.01')
+
+# Artículos por carrito y piezas por línea
+TAMANOS_CARRITO = (1, 2, 3, 4, 5, 6, 8, 10, 15)
+PESOS_CARRITO = (30, 22, 15, 10, 7, 6, 5, 3, 2)
+CANTIDADES_LINEA = (1, 2, 3, 4, 6, 12)
+PESOS_CANTIDAD = (60, 20, 8, 5, 4, 3)
+
+# Afluencia por hora de apertura (8 a 21 h) y por día de la semana (lunes = 0)
+HORAS = tuple(range(8, 22))
+PESOS_HORA = (2, 4, 6, 8, 10, 9, 7, 6, 7, 9, 10, 8, 5, 3)
+PESOS_DIA_SEMANA = (0.9, 0.9, 0.95, 1.0, 1.15, 1.3, 0.8)
+
+NOMBRES_CATEGORIA = (
+    'Abarrotes', 'Bebidas', 'Lácteos', 'Botanas', 'Limpieza', 'Higiene', 'Papelería', 'Ferretería',
+    'Farmacia', 'Panadería', 'Congelados', 'Mascotas', 'Electrónica', 'Hogar', 'Dulcería', 'Vinos',
+)
+NOMBRES_PRODUCTO = (
+    'Agua', 'Refresco', 'Leche', 'Galletas', 'Jabón', 'Cuaderno', 'Tornillo', 'Pan', 'Queso', 'Café',
+    'Arroz', 'Frijol', 'Aceite', 'Detergente', 'Cable', 'Pila', 'Cereal', 'Atún', 'Chocolate', 'Jugo',
+)
+MARCAS = ('Premium', 'Económico', 'Familiar', 'Light', 'Clásico', 'Orgánico', 'Mini', 'Max')
+
+# Partes de los movimientos manuales que son Entradas (el resto son mermas)
+FRACCION_ENTRADAS = 0.85
+# Productos que existen desde el primer día; el resto se da de alta a lo largo del periodo
+FRACCION_CATALOGO_INICIAL = 0.7
+
+
+def _media(valores, pesos):
+    return sum(v * p for v, p in zip(valores, pesos)) / sum(pesos)
+
+
+def repartir(total, pesos):
+    """Reparte ``total`` en enteros proporcionales a ``pesos`` (residuo mayor)."""
+    suma = sum(pesos)
+    exactos = [total * p / suma for p in pesos]
+    partes = [math.floor(x) for x in exactos]
+    faltan = total - sum(partes)
+    for i in sorted(range(len(pesos)), key=lambda i: exactos[i] - partes[i], reverse=True)[:faltan]:
+        partes[i] += 1
+    return partes
+
+
+class GeneradorDatos:
+    def __init__(self, categorias=40, productos=20000, movimientos=1_000_000, ventas=200_000, cajeros=20,
+                 dias=365, semilla=1, prefijo='SIN', lote=5000, password='sintetico', progreso=None):
+        self.num_categorias = categorias
+        self.num_productos = productos
+        self.num_ventas = ventas
+        self.num_cajeros = cajeros
+        self.dias = dias
+        self.prefijo = prefijo
+        self.lote = lote
+        self.password = password
+        self.progreso = progreso or (lambda mensaje: None)
+        self.rng = random.Random(semilla)
+
+        # Movimientos manuales: lo que falta para el total tras las altas y las líneas de venta
+        lineas_esperadas = round(ventas * _media(TAMANOS_CARRITO, PESOS_CARRITO))
+        self.num_manuales = max(0, movimientos - productos - lineas_esperadas)
+        self.conteo = {'categorias': 0, 'productos': 0, 'cajeros': 0, 'ventas': 0, 'detalles': 0, 'movimientos': 0}
+
+        self._ventas, self._detalles, self._movimientos = [], [], []
+
+    # --- CATÁLOGO ---
+    def _crear_categorias(self):
+        categorias = []
+        for i in range(self.num_categorias):
+            base = NOMBRES_CATEGORIA[i % len(NOMBRES_CATEGORIA)]
+            nombre = base if i < len(NOMBRES_CATEGORIA) else f'{base} {i // len(NOMBRES_CATEGORIA) + 1}'
+            categorias.append(Categoria(nombre=f'{nombre} ({self.prefijo})', descripcion='Datos sintéticos'))
+        Categoria.objects.bulk_create(categorias)
+        self.conteo['categorias'] = len(categorias)
+        return list(Categoria.objects.filter(nombre__endswith=f'({self.prefijo})').order_by('id'))
+
+    def _crear_cajeros(self):
+        hash_password = make_password(self.password)
+        cajeros = [
+            Usuario(username=f'cajero{n:03d}@{DOMINIO}', email=f'cajero{n:03d}@{DOMINIO}',
+                    password=hash_password, role='Operador')
+            for n in range(self.num_cajeros)
+        ]
+        almacen = Usuario(username=f'almacen@{DOMINIO}', email=f'almacen@{DOMINIO}',
+                          password=hash_password, role='Superadmin')
+        Usuario.objects.bulk_create(cajeros + [almacen], ignore_conflicts=True)
+        usuarios = {u.email: u.id for u in Usuario.objects.filter(email__endswith='@' + DOMINIO)}
+        self.conteo['cajeros'] = self.num_cajeros
+        return [usuarios[c.email] for c in cajeros], usuarios[almacen.email]
+
+    def _crear_productos(self, categorias, inicio):
+        rng = self.rng
+        # Pocas categorías concentran la mayor parte del catálogo
+        pesos_categoria = [1 / (i + 1) ** 0.8 for i in range(len(categorias))]
+        productos = []
+        for i in range(self.num_productos):
+            costo = Decimal(min(max(rng.lognormvariate(math.log(60), 0.9), 1), 99999)).quantize(CENTAVOS)
+            if rng.random() < FRACCION_CATALOGO_INICIAL:
+                creado = inicio + timedelta(minutes=rng.randint(0, 59))
+            else:
+                creado = self._momento(timezone.localdate(inicio) + timedelta(days=rng.randrange(self.dias)))
+            productos.append(Producto(
+                sku=f'{self.prefijo}-{i:07d}',
+                nombre=f'{rng.choice(NOMBRES_PRODUCTO)} {rng.choice(MARCAS)} {i}',
+                descripcion='',
+                costo=costo,
+                stock_actual=0,
+                nivel_minimo_stock=rng.choices((0, 2, 5, 10, 20), (30, 20, 25, 15, 10))[0],
+                categoria=rng.choices(categorias, pesos_categoria)[0] if categorias else None,
+                fecha_creacion=creado,
+            ))
+        with transaction.atomic():
+            Producto.objects.bulk_create(productos, batch_size=self.lote)
+        self.conteo['productos'] = len(productos)
+        return productos
+
+    # --- SIMULACIÓN ---
+    def _preparar_simulacion(self, productos):
+        rng = self.rng
+        n = len(productos)
+        # Popularidad tipo Zipf con un orden al azar: unos cuantos SKU concentran las ventas
+        rangos = list(range(n))
+        rng.shuffle(rangos)
+        self.popularidad = [1 / (r + 1) ** 1.05 for r in rangos]
+        self.acumulados = []
+        acumulado = 0.0
+        for peso in self.popularidad:
+            acumulado += peso
+            self.acumulados.append(acumulado)
+        total_pesos = acumulado
+
+        demanda_total = (self.num_ventas * _media(TAMANOS_CARRITO, PESOS_CARRITO)
+                         * _media(CANTIDADES_LINEA, PESOS_CANTIDAD))
+        entradas = max(1, round(self.num_manuales * FRACCION_ENTRADAS))
+        # Cada resurtido repone en promedio la demanda entre dos resurtidos del mismo producto
+        self.resurtido_medio = demanda_total / entradas if self.num_manuales else 0
+        # Sin movimientos manuales la existencia inicial debe cubrir toda la demanda
+        cobertura = (0.1, 0.3) if self.num_manuales else (1.1, 1.4)
+        self.existencia_inicial = [
+            round(demanda_total * peso / total_pesos * rng.uniform(*cobertura))
+            + p.nivel_minimo_stock * 2 + rng.randint(0, 20)
+            for p, peso in zip(productos, self.popularidad)
+        ]
+        self.stock = [0] * n
+        self.creado = [False] * n
+
+    def _elegir(self, excluir=()):
+        for _ in range(5):
+            i = self.rng.choices(range(len(self.acumulados)), cum_weights=self.acumulados)[0]
+            if self.creado[i] and self.stock[i] > 0 and i not in excluir:
+                return i
+        return None
+
+    def _mov(self, tipo, producto, cantidad, usuario_id, fecha):
+        self._movimientos.append(Movimiento(
+            tipo=tipo, producto_id=producto.id, cantidad=cantidad, usuario_id=usuario_id, fecha=fecha
+        ))
+
+    def _venta(self, productos, folio, usuario_id, fecha):
+        rng = self.rng
+        tamano = rng.choices(TAMANOS_CARRITO, PESOS_CARRITO)[0]
+        venta = Venta(folio=folio, usuario_id=usuario_id, fecha=fecha, total=0)
+        total = Decimal(0)
+        elegidos = set()
+        for _ in range(tamano):
+            i = self._elegir(elegidos)
+            if i is None:
+                continue
+            elegidos.add(i)
+            producto = productos[i]
+            cantidad = min(rng.choices(CANTIDADES_LINEA, PESOS_CANTIDAD)[0], self.stock[i])
+            self.stock[i] -= cantidad
+            precio = (producto.costo * Decimal(rng.uniform(1.2, 1.6))).quantize(CENTAVOS, ROUND_HALF_UP)
+            subtotal = precio * cantidad
+            total += subtotal
+            self._detalles.append(DetalleVenta(
+                venta=venta, producto_id=producto.id, cantidad=cantidad, precio_unitario=precio, subtotal=subtotal
+            ))
+            self._mov('Salida', producto, cantidad, usuario_id, fecha)
+        if not elegidos:
+            return False
+        venta.total = total
+        self._ventas.append(venta)
+        return True
+
+    def _manual(self, productos, usuario_id, fecha):
+        rng = self.rng
+        for _ in range(5):
+            i = rng.choices(range(len(self.acumulados)), cum_weights=self.acumulados)[0]
+            if self.creado[i]:
+                break
+        else:
+            return False
+        producto = productos[i]
+        if rng.random() < FRACCION_ENTRADAS or self.stock[i] == 0:
+            cantidad = max(1, round(self.resurtido_medio * rng.uniform(0.7, 1.5)), producto.nivel_minimo_stock * 3)
+            self.stock[i] += cantidad
+            self._mov('Entrada', producto, cantidad, usuario_id, fecha)
+        else:
+            cantidad = min(self.stock[i], rng.randint(1, 5))
+            self.stock[i] -= cantidad
+            self._mov('Salida', producto, cantidad, usuario_id, fecha)
+        return True
+
+    def _volcar(self, forzar=False):
+        if not forzar and len(self._movimientos) < self.lote:
+            return
+        with transaction.atomic():
+            Venta.objects.bulk_create(self._ventas, batch_size=self.lote)
+            DetalleVenta.objects.bulk_create(self._detalles, batch_size=self.lote)
+            Movimiento.objects.bulk_create(self._movimientos, batch_size=self.lote)
+        self.conteo['ventas'] += len(self._ventas)
+        self.conteo['detalles'] += len(self._detalles)
+        self.conteo['movimientos'] += len(self._movimientos)
+        self._ventas, self._detalles, self._movimientos = [], [], []
+
+    def _momento(self, dia):
+        hora = self.rng.choices(HORAS, PESOS_HORA)[0]
+        return timezone.make_aware(datetime.combine(dia, time(hora, self.rng.randint(0, 59), self.rng.randint(0, 59))))
+
+    def ejecutar(self):
+        if Producto.objects.filter(sku__startswith=f'{self.prefijo}-').exists():
+            raise ValueError(f"Ya existen productos con el prefijo '{self.prefijo}-'; usa otro prefijo.")
+
+        rng = self.rng
+        # El periodo termina ayer para no dejar fechas en el futuro
+        primer_dia = timezone.localdate() - timedelta(days=self.dias)
+        inicio = timezone.make_aware(datetime.combine(primer_dia, time(7)))
+
+        categorias = self._crear_categorias()
+        cajeros, almacen = self._crear_cajeros()
+        productos = self._crear_productos(categorias, inicio)
+        self.progreso(f"{len(productos)} productos en {len(categorias)} categorías.")
+        self._preparar_simulacion(productos)
+
+        # Folios reservados de la secuencia real para no chocar con ventas futuras
+        prefijo_folio = prefijo_para()
+        folio_inicio, _ = reservar_bloque(prefijo_folio, self.num_ventas) if self.num_ventas else (0, 0)
+
+        # Volumen diario según el día de la semana con una tendencia de crecimiento
+        pesos_dia = [
+            PESOS_DIA_SEMANA[(primer_dia + timedelta(days=d)).weekday()] * (1 + 0.3 * d / self.dias)
+            for d in range(self.dias)
+        ]
+        ventas_por_dia = repartir(self.num_ventas, pesos_dia)
+        manuales_por_dia = repartir(self.num_manuales, pesos_dia)
+        altas_por_dia = [[] for _ in range(self.dias)]
+        for i, producto in enumerate(productos):
+            altas_por_dia[(timezone.localdate(producto.fecha_creacion) - primer_dia).days].append(i)
+
+        numero_venta = folio_inicio
+        sin_stock = 0
+        for d in range(self.dias):
+            dia = primer_dia + timedelta(days=d)
+            eventos = [(productos[i].fecha_creacion, 0, i) for i in altas_por_dia[d]]
+            eventos += [(self._momento(dia), 1, None) for _ in range(ventas_por_dia[d])]
+            eventos += [(self._momento(dia), 2, None) for _ in range(manuales_por_dia[d])]
+            eventos.sort(key=lambda e: (e[0], e[1]))
+
+            for fecha, clase, i in eventos:
+                if clase == 0:
+                    self.creado[i] = True
+                    self.stock[i] = self.existencia_inicial[i]
+                    self._mov('Creacion', productos[i], self.stock[i], almacen, fecha)
+                elif clase == 1:
+                    folio = formatear(prefijo_folio, numero_venta)
+                    if self._venta(productos, folio, rng.choice(cajeros), fecha):
+                        numero_venta += 1
+                    else:
+                        sin_stock += 1
+                else:
+                    self._manual(productos, almacen, fecha)
+                self._volcar()
+            if (d + 1) % 30 == 0:
+                self.progreso(f"Día {d + 1}/{self.dias}: {self.conteo['movimientos']} movimientos.")
+        self._volcar(forzar=True)
+
+        # El stock final resulta de la simulación; la versión hace que las terminales POS lo sincronicen
+        with transaction.atomic():
+            version = version_transaccion(CONTADOR_CATALOGO)
+            for producto, stock in zip(productos, self.stock):
+                producto.stock_actual = stock
+                producto.version = version
+            Producto.objects.bulk_create(
+                productos, batch_size=self.lote, update_conflicts=True, unique_fields=['id'],
+                update_fields=['stock_actual', 'version']
+            )
+            Categoria.objects.filter(id__in=[c.id for c in categorias]).update(version=version)
+
+        self.progreso('Reconstruyendo totales del dashboard y rollups de ventas...')
+        reconstruir_resumen()
+        reconstruir_alertas()
+        analitica.reconstruir(inicio, None)
+        invalidar_catalogo()
+        self.conteo['ventasSinStock'] = sin_stock
+        return self.conteo
@@ -0,0 +1,38 @@
+"""Suma de deltas a los totales repartidos en slots.
+
+``ResumenInventario`` y ``ResumenUbicacion`` guardan sus totales en varias
+filas para que las escrituras concurrentes no compitan por un candado. Cada
+escritura suma su delta a un slot con un solo ``INSERT ... ON CONFLICT DO
+UPDATE`` (PostgreSQL y SQLite 3.24+): el slot que aún no existe se crea con el
+delta y el que existe lo suma, sin ``UPDATE`` previo ni savepoint.
+"""
+from django.db import connection
+
+
+def sumar_slots(modelo, llave, filas):
+    """Suma ``filas`` (diccionarios de campo a valor) a las filas de ``modelo``.
+
+    ``llave`` son los campos de la restricción única del slot; los demás campos
+    de cada fila se suman. Las filas deben tener los mismos campos y no repetir
+    llave.
+    """
+    if not filas:
+        return
+    q = connection.ops.quote_name
+    tabla = q(modelo._meta.db_table)
+    campos = [modelo._meta.get_field(nombre) for nombre in filas[0]]
+    sumados = [q(campo.column) for campo in campos if campo.name not in llave and campo.attname not in llave]
+    valores = '(' + ', '.join(['%s'] * len(campos)) + ')'
+    sql = (
+        f"INSERT INTO {tabla} ({', '.join(q(campo.column) for campo in campos)}) "
+        f"VALUES {', '.join([valores] * len(filas))} "
+        f"ON CONFLICT ({', '.join(q(modelo._meta.get_field(nombre).column) for nombre in llave)}) "
+        f"DO UPDATE SET {', '.join(f'{c} = {tabla}.{c} + EXCLUDED.{c}' for c in sumados)}"
+    )
+    parametros = [
+        campo.get_db_prep_save(fila[nombre], connection)
+        for fila in filas
+        for nombre, campo in zip(fila, campos)
+    ]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, parametros)
@@ -1,3 +1,1456 @@
-from django.test import TestCase
+import base64
+import csv
+import gzip
+import json
+import random
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.contrib import admin
+from django.test import AsyncClient, RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, URLResolver, get_resolver, resolve
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from .analitica import reconstruir as reconstruir_analitica
+from .autenticacion import CachedJWTAuthentication
+from .carga import MEZCLA_DEFAULT, ClienteLocal, PruebaCarga, clasificar, sembrar
+from .catalogo import CacheSkus, filtrar_catalogo, invalidar_catalogo
+from .cierres import cerrar_periodo, stock_en_fecha
+from .filtros import filtrar_movimientos
+from .folios import asignador, siguiente_folio
+from .instrumentacion import estadisticas
+from .inventario import SLOTS_RESUMEN, calcular_resumen, filtro_bajo_stock, leer_resumen, reconstruir_resumen
+from .models import (
+    BloqueFolio, Categoria, DetalleVenta, Movimiento, Producto, Reserva, ResumenInventario,
+    ResumenUbicacion, StockUbicacion, Ubicacion, Usuario, Venta, VentaDiariaCajero, VentaDiariaProducto
+)
+from .reservas import barrer_vencidas, reconstruir_reservados
+from .respuestas import JSONRendererRapido
+from .serializers import ProductoSerializer
+from .sinteticos import GeneradorDatos
+from .ventas import venta_por_clave
+
+
+def rutas_api(patrones=None, prefijo=''):
+    """Rutas de la API en urls.py, sin el admin ni las variantes de formato del router."""
+    rutas = set()
+    for patron in get_resolver().url_patterns if patrones is None else patrones:
+        # Igual que ResolverMatch.route: sin el '^' de los patrones anidados
+        ruta = prefijo + str(patron.pattern).lstrip('^')
+        if isinstance(patron, URLResolver):
+            if not ruta.startswith('admin/'):
+                rutas |= rutas_api(patron.url_patterns, ruta)
+        elif isinstance(patron, URLPattern) and '<format>' not in ruta and patron.name != 'api-root':
+            rutas.add(ruta)
+    return rutas
+
+
+class ApiTestCase(TestCase):
+    """Base de las pruebas de la API: ``self.client`` autenticado como ``self.usuario``.
+
+    Las subclases cambian ``email`` y ``role`` para probar con otro usuario y
+    llaman a ``super()`` si agregan datos o preparación propia.
+    """
+    email = 'admin@test.com'
+    role = 'Superadmin'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = Usuario.objects.create_user(username=cls.email, email=cls.email, password='x', role=cls.role)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuario)
+
+
+class CatalogoRapidoTests(ApiTestCase):
+    """La ruta rápida del catálogo debe producir exactamente lo mismo que ProductoSerializer."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        bebidas = Categoria.objects.create(nombre='Bebidas')
+        snacks = Categoria.objects.create(nombre='Snacks', descripcion='Botanas')
+        Producto.objects.create(sku='A-1', nombre='Agua', costo=Decimal('10.5'), stock_actual=3, categoria=bebidas)
+        Producto.objects.create(sku='B-2', nombre='Papas', descripcion='Sal', costo=Decimal('0.99'),
+                                stock_actual=0, nivel_minimo_stock=0, categoria=snacks)
+        Producto.objects.create(sku='C-3', nombre='Sin categoría', costo=Decimal('1200'), stock_actual=40)
+        Producto.objects.create(sku='D-4', nombre='Inactivo', costo=Decimal('5'), is_active=False, categoria=snacks)
+
+    def esperado(self, queryset):
+        return ProductoSerializer(queryset.order_by('id'), many=True).data
+
+    def test_listado_igual_al_serializador(self):
+        respuesta = self.client.get('/api/productos/')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.json(), self.esperado(Producto.objects.filter(is_active=True)))
+
+    def test_filtros_de_activo_y_categoria(self):
+        snacks = Categoria.objects.get(nombre='Snacks')
+        respuesta = self.client.get('/api/productos/', {'activo': 'todos', 'categoria': snacks.id})
+        self.assertEqual(respuesta.json(), self.esperado(Producto.objects.filter(categoria=snacks)))
+
+        respuesta = self.client.get('/api/productos/', {'activo': 'false'})
+        self.assertEqual(respuesta.json(), self.esperado(Producto.objects.filter(is_active=False)))
+
+    def test_paginacion_recorre_todo_sin_repetir(self):
+        vistos = []
+        params = {'limite': 2, 'activo': 'todos'}
+        while True:
+            datos = self.client.get('/api/productos/', params).json()
+            vistos.extend(datos['resultados'])
+            if not datos['siguienteCursor']:
+                break
+            params['cursor'] = datos['siguienteCursor']
+        self.assertEqual(vistos, self.esperado(Producto.objects.all()))
+
+    def test_consultas_constantes(self):
+        for i in range(20):
+            Producto.objects.create(sku=f'X-{i}', nombre=f'Extra {i}', costo=1,
+                                    categoria=Categoria.objects.first())
+        # La revisión para el ETag y el listado
+        with self.assertNumQueries(2):
+            self.client.get('/api/productos/')
+
+
+class BusquedaTests(ApiTestCase):
+    """Orden de relevancia: SKU exacto, prefijo de SKU, prefijo del nombre, prefijo de una palabra."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        bebidas = Categoria.objects.create(nombre='Bebidas')
+        for sku, nombre in (('X-3', 'Paraguas'), ('X-2', 'Botella de agua'), ('X-1', 'Agua mineral'),
+                            ('AGUA-2', 'Refresco'), ('AGUA', 'Jugo'), ('X-4', 'Agua (inactiva)')):
+            Producto.objects.create(sku=sku, nombre=nombre, costo=Decimal('1'), stock_actual=1,
+                                    categoria=bebidas if sku != 'X-1' else None, is_active=sku != 'X-4')
+        cls.bebidas = bebidas
+
+    def setUp(self):
+        super().setUp()
+        invalidar_catalogo()
+
+    def buscar(self, **params):
+        respuesta = self.client.get('/api/productos/buscar/', params)
+        self.assertEqual(respuesta.status_code, 200)
+        return [p['SKU'] for p in respuesta.json()['resultados']]
+
+    def test_orden_de_relevancia(self):
+        # Las coincidencias en medio de una palabra solo las encuentra PostgreSQL
+        parciales = ['X-3'] if connection.vendor == 'postgresql' else []
+        self.assertEqual(self.buscar(q='agua'), ['AGUA', 'AGUA-2', 'X-1', 'X-2'] + parciales)
+        self.assertEqual(self.buscar(q='AGUA', limite=2), ['AGUA', 'AGUA-2'])
+        self.assertEqual(self.buscar(q='agua', categoria=self.bebidas.id), ['AGUA', 'AGUA-2', 'X-2'] + parciales)
+        self.assertEqual(self.client.get('/api/productos/buscar/').status_code, 400)
+
+
+class InstrumentacionTests(ApiTestCase):
+    """Server-Timing por petición, estadísticas por endpoint y registro de peticiones lentas."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.cajero = Usuario.objects.create_user(
+            username='caja@test.com', email='caja@test.com', password='x', role='Operador'
+        )
+        Producto.objects.create(sku='A-1', nombre='Agua', costo=Decimal('5'), stock_actual=10)
+
+    def setUp(self):
+        super().setUp()
+        estadisticas.reiniciar()
+        self.addCleanup(estadisticas.reiniciar)
+
+    def test_server_timing_cuenta_las_consultas(self):
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.client.get('/api/productos/A-1/')
+        self.assertEqual(respuesta.status_code, 200)
+        timing = dict(parte.split(';', 1) for parte in respuesta['Server-Timing'].split(', '))
+        self.assertEqual(set(timing), {'db', 'app', 'render', 'compresion', 'total'})
+        self.assertIn(f'desc="{len(consultas)} consultas"', timing['db'])
+
+    def test_estadisticas_por_endpoint(self):
+        for _ in range(3):
+            self.client.get('/api/productos/')
+        self.client.get('/api/productos/A-1/')
+        self.client.get('/api/productos/X-9/')
+
+        endpoints = {e['endpoint']: e for e in self.client.get('/api/rendimiento').json()['endpoints']}
+        listado = endpoints['GET api/productos/']
+        self.assertEqual((listado['peticiones'], listado['muestras'], listado['errores']), (3, 3, 0))
+        self.assertEqual(sum(listado['histograma'].values()), 3)
+        self.assertLessEqual(listado['p50Ms'], listado['p95Ms'])
+        self.assertLessEqual(listado['p95Ms'], listado['maxMs'])
+        # Los valores de la URL no abren un endpoint por producto
+        detalle = [e for nombre, e in endpoints.items() if nombre.startswith('GET api/productos/<')]
+        self.assertEqual([e['peticiones'] for e in detalle], [2])
+
+        cajero = APIClient()
+        cajero.force_authenticate(self.cajero)
+        self.assertEqual(cajero.get('/api/rendimiento').status_code, 403)
+        self.assertEqual(self.client.delete('/api/rendimiento').status_code, 204)
+        endpoints = [e['endpoint'] for e in self.client.get('/api/rendimiento').json()['endpoints']]
+        self.assertEqual(endpoints, ['DELETE api/rendimiento'])
+
+    def test_peticiones_lentas_y_desactivada(self):
+        with override_settings(INSTRUMENTACION={'ACTIVA': True, 'UMBRAL_LENTO_MS': 0, 'MUESTRAS': 10}):
+            cliente = APIClient()
+            cliente.force_authenticate(self.usuario)
+            with self.assertLogs('core.rendimiento', 'WARNING') as registros:
+                cliente.get('/api/productos/')
+        self.assertIn('Petición lenta GET api/productos/ (200)', registros.output[0])
+
+        with override_settings(INSTRUMENTACION={'ACTIVA': False}):
+            cliente = APIClient()
+            cliente.force_authenticate(self.usuario)
+            self.assertNotIn('Server-Timing', cliente.get('/api/productos/'))
+
+
+class CacheSkusTests(ApiTestCase):
+    """La cache de SKU guarda solo el catálogo: una venta no la vacía y el stock siempre es el actual."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        Producto.objects.create(sku='A-1', nombre='Agua', costo=Decimal('5'), stock_actual=10)
+        Producto.objects.create(sku='B-2', nombre='Pan', costo=Decimal('2'), stock_actual=3, is_active=False)
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.cache = CacheSkus()
+
+    def obtener(self, consultas_esperadas):
+        with self.assertNumQueries(consultas_esperadas):
+            encontrados = self.cache.obtener(['A-1', 'B-2', 'X-9'])
+        return {sku: (fila['Nombre_Producto'], fila['Stock_Actual'], activo)
+                for sku, (fila, activo) in encontrados.items()}
+
+    def test_stock_fresco_y_catalogo_en_cache(self):
+        # Versión, catálogo de los SKU que faltan y stock
+        self.assertEqual(self.obtener(3), {'A-1': ('Agua', 10, True), 'B-2': ('Pan', 3, False)})
+        self.client.post('/api/movimientos/salida', {'SKU': 'A-1', 'Cantidad': 4}, format='json')
+        self.assertEqual(self.obtener(2)['A-1'], ('Agua', 6, True))
+
+        # La versión está en la base: la ve un worker con otra cache de Django
+        self.client.patch('/api/productos/A-1/', {'Nombre_Producto': 'Agua mineral'}, format='json')
+        cache.clear()
+        self.assertEqual(self.obtener(3)['A-1'], ('Agua mineral', 6, True))
+
+        with override_settings(CATALOGO_CACHE_SKUS=True):
+            respuesta = self.client.post('/api/productos/resolver/', {'skus': ['A-1', 'B-2', 'X-9']}, format='json')
+        self.assertEqual(respuesta.json()['productos'][0]['Stock_Actual'], 6)
+        self.assertEqual((respuesta.json()['inactivos'], respuesta.json()['noEncontrados']), (['B-2'], ['X-9']))
+
+
+class VistasAsyncTests(TestCase):
+    """Las lecturas de /api/async/ (servidas por el handler ASGI) deben coincidir con las de DRF."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = Usuario.objects.create_user(
+            username='admin@test.com', email='admin@test.com', password='x', role='Superadmin'
+        )
+        cls.operador = Usuario.objects.create_user(
+            username='op@test.com', email='op@test.com', password='x', role='Operador'
+        )
+        bebidas = Categoria.objects.create(nombre='Bebidas')
+        agua = Producto.objects.create(sku='A-1', nombre='Agua', costo=Decimal('10.5'), stock_actual=3,
+                                       categoria=bebidas)
+        Producto.objects.create(sku='C-3', nombre='Sin categoría', costo=Decimal('1200'), stock_actual=40)
+        Movimiento.objects.create(tipo='Entrada', producto=agua, usuario=cls.admin, cantidad=5)
+        Movimiento.objects.create(tipo='Salida', producto=agua, usuario=cls.operador, cantidad=2)
+        Movimiento.objects.create(tipo='Eliminacion', producto=None, usuario=cls.admin, cantidad=1)
+        venta = Venta.objects.create(folio='V-00000001', total=Decimal('21'), usuario=cls.operador)
+        DetalleVenta.objects.create(venta=venta, producto=agua, cantidad=2, precio_unitario=Decimal('10.5'),
+                                    subtotal=Decimal('21'))
+        Venta.objects.create(folio='V-00000002', total=Decimal('0'), usuario=None)
+
+    def comparar(self, usuario, sincrona, asincrona, params=None):
+        cliente = APIClient()
+        cliente.force_authenticate(usuario)
+        esperado = cliente.get(sincrona, params)
+
+        token = str(RefreshToken.for_user(usuario).access_token)
+        respuesta = async_to_sync(AsyncClient().get)(asincrona, params, headers={'Authorization': f'Bearer {token}'})
+        self.assertEqual(respuesta.status_code, esperado.status_code)
+        self.assertEqual(respuesta.json(), esperado.json())
+        return respuesta.json()
+
+    def test_dashboard(self):
+        self.comparar(self.admin, '/api/dashboard/metrics', '/api/async/dashboard/metrics')
+
+    def test_productos(self):
+        self.comparar(self.admin, '/api/productos/', '/api/async/productos')
+        self.comparar(self.admin, '/api/productos/', '/api/async/productos', {'limite': 1})
+        self.comparar(self.admin, '/api/productos/A-1/', '/api/async/productos/A-1')
+        self.comparar(self.admin, '/api/productos/NO-EXISTE/', '/api/async/productos/NO-EXISTE')
+
+    def test_movimientos_por_rol(self):
+        datos = self.comparar(self.admin, '/api/movimientos', '/api/async/movimientos')
+        self.assertEqual(len(datos), 3)
+        datos = self.comparar(self.operador, '/api/movimientos', '/api/async/movimientos')
+        self.assertEqual(len(datos), 1)
+        self.comparar(self.admin, '/api/movimientos', '/api/async/movimientos', {'tipo': 'Entrada', 'limite': 1})
+
+    def test_ventas(self):
+        venta = Venta.objects.create(folio='V-00000003', total=Decimal('1'), usuario=self.admin)
+        # El listado síncrono ordena solo por fecha; se separan para que el orden no dependa de empates
+        Venta.objects.filter(id=venta.id).update(fecha=venta.fecha.replace(year=venta.fecha.year + 1))
+        Venta.objects.filter(folio='V-00000002').update(fecha=venta.fecha.replace(year=venta.fecha.year - 1))
+        self.comparar(self.admin, '/api/ventas/', '/api/async/ventas')
+
+    def test_sin_token(self):
+        respuesta = async_to_sync(AsyncClient().get)('/api/async/productos')
+        self.assertEqual(respuesta.status_code, 401)
+
+
+class AutenticacionCacheTests(ApiTestCase):
+    """El usuario del JWT sale de la cache hasta que un cambio de rol o una baja la invalidan."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.operador = Usuario.objects.create_user(
+            username='op@test.com', email='op@test.com', password='x', role='Operador'
+        )
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.token = str(AccessToken.for_user(self.operador))
+
+    def pedir(self, ruta='/api/productos/'):
+        """Petición del operador con su token; devuelve el estado y las consultas a la tabla de usuarios."""
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = APIClient(HTTP_AUTHORIZATION=f'Bearer {self.token}').get(ruta)
+        return respuesta.status_code, sum('core_usuario' in q['sql'] for q in consultas.captured_queries)
+
+    def test_cache_e_invalidacion(self):
+        self.assertEqual(self.pedir(), (200, 1))
+        self.assertEqual(self.pedir(), (200, 0))
+        self.assertEqual(self.pedir('/api/usuarios/')[0], 403)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(f'/api/usuarios/{self.operador.id}/', {'role': 'Superadmin'}, format='json')
+        self.assertEqual(self.pedir('/api/usuarios/')[0], 200)
+
+        # Desactivado desde el admin
+        peticion = RequestFactory().post('/admin/')
+        peticion.user = self.usuario
+        self.operador.role = 'Operador'
+        self.operador.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            admin.site._registry[Usuario].save_model(peticion, self.operador, None, change=True)
+        self.assertEqual(self.pedir()[0], 401)
+
+    def test_usuario_de_la_cache_es_de_solo_lectura(self):
+        usuario = CachedJWTAuthentication().get_user(AccessToken.for_user(self.operador))
+        self.assertEqual((usuario.pk, usuario.role, usuario.password), (self.operador.pk, 'Operador', ''))
+        with self.assertRaises(TypeError):
+            usuario.save()
+        with self.assertRaises(TypeError):
+            usuario.delete()
+
+    def test_revocacion_usa_el_usuario_de_la_base(self):
+        self.assertEqual(self.pedir(), (200, 1))
+        with mock.patch.object(jwt_settings, 'CHECK_REVOKE_TOKEN', True):
+            token = AccessToken.for_user(self.operador)
+            usuario = CachedJWTAuthentication().get_user(token)
+            self.assertEqual(usuario.password, self.operador.password)
+            # Cambiar la contraseña revoca el token aunque el usuario estuviera en cache
+            self.operador.set_password('y')
+            self.operador.save()
+            with self.assertRaises(AuthenticationFailed):
+                CachedJWTAuthentication().get_user(token)
+
+
+class PaginacionKeysetTests(ApiTestCase):
+    """Las páginas por cursor recorren todo sin repetir ni saltar filas, incluso con fechas empatadas."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        producto = Producto.objects.create(sku='A-1', nombre='Agua', costo=Decimal('5'), stock_actual=10)
+        Movimiento.objects.bulk_create([
+            Movimiento(tipo='Entrada', producto=producto, usuario=cls.usuario, cantidad=i + 1) for i in range(7)
+        ])
+        # Cinco movimientos con la misma fecha: el id desempata
+        fecha = timezone.now() - timedelta(days=1)
+        ids = list(Movimiento.objects.order_by('id').values_list('id', flat=True))
+        Movimiento.objects.filter(id__in=ids[1:6]).update(fecha=fecha)
+        Movimiento.objects.filter(id=ids[0]).update(fecha=fecha - timedelta(hours=1))
+
+    def paginas(self, ruta, limite):
+        paginas, params = [], {'limite': limite}
+        while True:
+            datos = self.client.get(ruta, params).json()
+            paginas.append([fila.get('id', fila.get('ID_Producto')) for fila in datos['resultados']])
+            if datos['siguienteCursor'] is None:
+                return paginas
+            params['cursor'] = datos['siguienteCursor']
+
+    def test_movimientos_por_fecha_e_id(self):
+        esperado = list(Movimiento.objects.order_by('-fecha', '-id').values_list('id', flat=True))
+        for limite in (1, 2, 3, 7, 50):
+            with self.subTest(limite=limite):
+                paginas = self.paginas('/api/movimientos', limite)
+                self.assertEqual(sum(paginas, []), esperado)
+                self.assertTrue(all(len(pagina) == limite for pagina in paginas[:-1]))
+        # Un total múltiplo del límite no deja una página vacía al final
+        self.assertEqual([len(p) for p in self.paginas('/api/movimientos', 7)], [7])
+
+    def test_productos_por_id(self):
+        for i in range(4):
+            Producto.objects.create(sku=f'P-{i}', nombre=f'P {i}', costo=Decimal('1'))
+        esperado = list(Producto.objects.filter(is_active=True).order_by('id').values_list('id', flat=True))
+        self.assertEqual(sum(self.paginas('/api/productos/', 2), []), esperado)
+
+    def test_cursor_invalido(self):
+        def cursor(valores):
+            return base64.urlsafe_b64encode(json.dumps(valores).encode()).decode()
+
+        for invalido in ('no-es-base64!', cursor(['abc', 1]), cursor([timezone.now().isoformat(), 'x']),
+                         cursor([timezone.now().isoformat()]), cursor({'a': 1}),
+                         cursor([timezone.now().isoformat(), True]), cursor([[1], 2])):
+            with self.subTest(cursor=invalido):
+                respuesta = self.client.get('/api/movimientos', {'limite': 2, 'cursor': invalido})
+                self.assertEqual(respuesta.status_code, 400)
+        self.assertEqual(self.client.get('/api/productos/', {'cursor': cursor(['x'])}).status_code, 400)
+
+
+class ConsultasPorRutaTests(TestCase):
+    """Cada ruta de la API hace las mismas consultas sin importar cuántas filas haya.
+
+    Las peticiones se ejecutan con los datos en dos tamaños; cada una dentro de
+    una transacción que se revierte para que todas vean el mismo estado.
+    """
+    TAMANOS = (2, 10)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = Usuario.objects.create_user(
+            username='admin@test.com', email='admin@test.com', password='x', role='Superadmin'
+        )
+        cls.operador = Usuario.objects.create_user(
+            username='op@test.com', email='op@test.com', password='x', role='Operador'
+        )
+        cls.tienda = Ubicacion.objects.create(nombre='Tienda Centro')
+        # Todos los slots del resumen existen para que el conteo no dependa del slot elegido
+        for slot in range(SLOTS_RESUMEN):
+            ResumenInventario.objects.get_or_create(slot=slot)
+            for ubicacion in Ubicacion.objects.all():
+                ResumenUbicacion.objects.get_or_create(ubicacion=ubicacion, slot=slot)
+        cls.categoria = Categoria.objects.create(nombre='Base')
+        for sku in ('BASE-1', 'BASE-2'):
+            Producto.objects.create(sku=sku, nombre=f'Base {sku}', costo=Decimal('10'), stock_actual=1000,
+                                    categoria=cls.categoria)
+        cerrar_periodo('Diario', timezone.now() - timedelta(days=2))
+
+    def crecer(self, n):
+        """Agrega ``n`` filas de cada tabla que listan los endpoints."""
+        base = Producto.objects.count()
+        categorias = Categoria.objects.bulk_create([Categoria(nombre=f'Cat {base + i}') for i in range(n)])
+        productos = Producto.objects.bulk_create([
+            Producto(sku=f'P-{base + i}', nombre=f'Producto {base + i}', costo=Decimal('2.5'), stock_actual=i,
+                     categoria=categorias[i])
+            for i in range(n)
+        ])
+        usuarios = Usuario.objects.bulk_create([
+            Usuario(username=f'u{base + i}@test.com', email=f'u{base + i}@test.com', role='Operador')
+            for i in range(n)
+        ])
+        Movimiento.objects.bulk_create([
+            Movimiento(tipo=tipo, producto=p, usuario=u, cantidad=1)
+            for p in productos for u in (self.admin, self.operador) for tipo in ('Entrada', 'Salida')
+        ])
+        for i, producto in enumerate(productos):
+            venta = Venta.objects.create(folio=f'T-{base + i}', total=Decimal('5'), usuario=usuarios[i])
+            DetalleVenta.objects.bulk_create([
+                DetalleVenta(venta=venta, producto=producto, cantidad=1, precio_unitario=Decimal('2.5'),
+                             subtotal=Decimal('2.5')),
+                DetalleVenta(venta=venta, producto=producto, cantidad=1, precio_unitario=Decimal('2.5'),
+                             subtotal=Decimal('2.5')),
+            ])
+            VentaDiariaProducto.objects.create(fecha=timezone.localdate(), producto=producto, unidades=2,
+                                               importe=Decimal('5'), lineas=2)
+            VentaDiariaCajero.objects.create(fecha=timezone.localdate(), usuario=usuarios[i], num_ventas=1,
+                                             unidades=2, importe=Decimal('5'))
+
+    def peticiones(self):
+        """``(metodo, ruta, datos)`` con al menos una petición por cada ruta de urls.py."""
+        ahora = timezone.now().isoformat()
+        csv = 'SKU,Nombre_Producto,Costo,Stock_Actual\nBASE-1,Base,10,1\nNUEVO-1,Nuevo,3,4\n'
+        return [
+            ('post', '/api/login', {'email': 'op@test.com', 'password': 'x'}),
+            ('post', '/api/register', {'email': 'nuevo@test.com', 'password': 'x'}),
+            ('get', '/api/dashboard/metrics', None),
+            ('get', '/api/movimientos', None),
+            ('get', '/api/movimientos', {'limite': 5, 'tipo': 'Entrada'}),
+            ('post', '/api/movimientos/entrada', {'SKU': 'BASE-1', 'Cantidad': 2}),
+            ('post', '/api/movimientos/salida', {'SKU': 'BASE-1', 'Cantidad': 1}),
+            ('get', '/api/movimientos/exportar', None),
+            ('post', '/api/movimientos/lote', {'tipo': 'Entrada', 'items': [
+                {'SKU': 'BASE-1', 'Cantidad': 1}, {'SKU': 'BASE-2', 'Cantidad': 3}]}),
+            ('post', '/api/movimientos/transferencia', {'destino': self.tienda.id, 'items': [
+                {'SKU': 'BASE-1', 'Cantidad': 2}, {'SKU': 'BASE-2', 'Cantidad': 1}]}),
+            ('get', '/api/movimientos', {'ubicacion': self.tienda.id}),
+            ('get', '/api/stock/cierres', None),
+            ('post', '/api/stock/cierres', {'tipo': 'Diario', 'fecha_corte': (timezone.now() - timedelta(hours=1)).isoformat()}),
+            ('get', '/api/stock/fecha', {'fecha': ahora}),
+            ('get', '/api/stock/fecha', {'fecha': ahora, 'sku': 'BASE-1'}),
+            ('get', '/api/stock/alertas', None),
+            ('get', '/api/stock/alertas', {'desde': 0}),
+            ('get', '/api/reservas', {'carrito': 'c1'}),
+            ('post', '/api/reservas', {'carrito': 'c1', 'id_producto': Producto.objects.get(sku='BASE-1').id,
+                                       'cantidad': 2}),
+            ('delete', '/api/reservas?carrito=c1', None),
+            ('get', '/api/analitica/ventas', {'agrupacion': 'mes'}),
+            ('get', '/api/analitica/top-productos', None),
+            ('get', '/api/rendimiento', None),
+            ('get', '/api/async/dashboard/metrics', None),
+            ('get', '/api/async/productos', None),
+            ('get', '/api/async/productos/BASE-1', None),
+            ('get', '/api/async/movimientos', None),
+            ('get', '/api/async/ventas', None),
+            ('get', '/api/usuarios/', None),
+            ('get', f'/api/usuarios/{self.operador.id}/', None),
+            ('patch', f'/api/usuarios/{self.operador.id}/', {'username': 'cambiado'}),
+            ('delete', f'/api/usuarios/{self.operador.id}/', None),
+            ('get', '/api/productos/', None),
+            ('get', '/api/productos/', {'limite': 5, 'activo': 'todos'}),
+            ('get', '/api/productos/', {'ubicaciones': 'true'}),
+            ('post', '/api/productos/', {'SKU': 'NUEVO-2', 'Nombre_Producto': 'Nuevo', 'Costo': '1.00'}),
+            ('get', '/api/productos/BASE-1/', None),
+            ('patch', '/api/productos/BASE-1/', {'Nombre_Producto': 'Renombrado'}),
+            ('delete', '/api/productos/BASE-2/', None),
+            ('get', '/api/productos/buscar/', {'q': 'Base'}),
+            ('post', '/api/productos/resolver/', {'skus': ['BASE-1', 'BASE-2', 'NO-EXISTE']}),
+            ('get', '/api/productos/sincronizar/', None),
+            ('get', '/api/productos/sincronizar/', {'desde': 0}),
+            ('post', '/api/productos/importar/', {'archivo': SimpleUploadedFile('catalogo.csv', csv.encode())}),
+            ('get', '/api/categorias/', None),
+            ('post', '/api/categorias/', {'nombre': 'Nueva'}),
+            ('get', f'/api/categorias/{self.categoria.id}/', None),
+            ('patch', f'/api/categorias/{self.categoria.id}/', {'descripcion': 'x'}),
+            ('delete', f'/api/categorias/{self.categoria.id}/', None),
+            ('get', '/api/ubicaciones/', None),
+            ('post', '/api/ubicaciones/', {'nombre': 'Bodega Norte', 'tipo': 'Almacen'}),
+            ('get', f'/api/ubicaciones/{self.tienda.id}/', None),
+            ('patch', f'/api/ubicaciones/{self.tienda.id}/', {'tipo': 'Tienda'}),
+            ('get', '/api/ventas/', None),
+            ('get', f'/api/ventas/{Venta.objects.order_by("id").values_list("id", flat=True).first()}/', None),
+            ('get', '/api/ventas/exportar/', None),
+            ('post', '/api/ventas/registrar/', {'total': 30, 'items': [
+                {'id_producto': Producto.objects.get(sku='BASE-1').id, 'cantidad': 2, 'precio': 10},
+                {'id_producto': Producto.objects.get(sku='BASE-2').id, 'cantidad': 1, 'precio': 10}]}),
+            ('post', '/api/ventas/lote/', {'ventas': [
+                {'clave_idempotencia': f'k-{i}', 'total': 10, 'items': [
+                    {'id_producto': Producto.objects.get(sku='BASE-1').id, 'cantidad': 1, 'precio': 10}]}
+                for i in range(3)]}),
+        ]
+
+    def contar(self, metodo, ruta, datos):
+        """Consultas de una petición, revirtiendo sus cambios al terminar."""
+        cache.clear()
+        # Cada petición arranca con el índice de búsqueda y la cache de SKUs por reconstruir
+        invalidar_catalogo()
+        asignador.reiniciar()
+        token = str(RefreshToken.for_user(self.admin).access_token)
+        cliente = APIClient(HTTP_AUTHORIZATION=f'Bearer {token}')
+        formato = 'multipart' if ruta.endswith('importar/') else 'json'
+        with transaction.atomic():
+            with CaptureQueriesContext(connection) as consultas:
+                if ruta.startswith('/api/async/'):
+                    respuesta = async_to_sync(AsyncClient().get)(
+                        ruta, datos, headers={'Authorization': f'Bearer {token}'}
+                    )
+                elif metodo == 'get':
+                    respuesta = cliente.get(ruta, datos)
+                else:
+                    respuesta = getattr(cliente, metodo)(ruta, datos, format=formato)
+                if respuesta.streaming:
+                    b''.join(respuesta.streaming_content)
+            transaction.set_rollback(True)
+        self.assertLess(respuesta.status_code, 300, f'{metodo.upper()} {ruta}: {respuesta.status_code}')
+        return len(consultas), resolve(ruta.partition('?')[0]).route
+
+    def test_consultas_no_crecen_con_los_datos(self):
+        conteos = []
+        for tamano in self.TAMANOS:
+            self.crecer(tamano)
+            conteos.append([(m, r, self.contar(m, r, d)) for m, r, d in self.peticiones()])
+
+        for (metodo, ruta, (consultas, _)), (_, _, (consultas_despues, _)) in zip(*conteos):
+            with self.subTest(peticion=f'{metodo.upper()} {ruta}'):
+                self.assertEqual(consultas, consultas_despues)
+
+        # Una ruta nueva en urls.py debe agregarse a peticiones()
+        cubiertas = {patron for _, _, (_, patron) in conteos[0]}
+        self.assertEqual(rutas_api() - cubiertas, set())
+
+
+class ResumenIncrementalTests(ApiTestCase):
+    """Los totales que mantiene ``registrar_cambios`` coinciden con recorrer las tablas."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.agua = Producto.objects.create(sku='A-1', nombre='Agua', costo=Decimal('5.50'), stock_actual=10,
+                                           nivel_minimo_stock=4)
+        Producto.objects.create(sku='B-2', nombre='Pan', costo=Decimal('2'), stock_actual=0)
+        reconstruir_resumen()
+
+    def assertCuadra(self):
+        self.assertEqual(leer_resumen(), calcular_resumen())
+
+    def test_cada_ruta_mantiene_los_totales(self):
+        respuesta = self.client.post('/api/productos/', {'SKU': 'C-3', 'Nombre_Producto': 'Café', 'Costo': '40',
+                                                         'Stock_Actual': 3, 'Nivel_Minimo_Stock': 5}, format='json')
+        self.assertEqual(respuesta.status_code, 201)
+        self.assertCuadra()
+        respuesta = self.client.patch('/api/productos/A-1/', {'Stock_Actual': 4, 'Costo': '6'}, format='json')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertCuadra()
+        self.client.delete('/api/productos/B-2/')
+        self.assertCuadra()
+        venta = {'total': 30, 'items': [{'id_producto': self.agua.id, 'cantidad': 3, 'precio': 10}]}
+        self.assertEqual(self.client.post('/api/ventas/registrar/', venta, format='json').status_code, 201)
+        self.assertCuadra()
+        self.client.post('/api/movimientos/entrada', {'SKU': 'C-3', 'Cantidad': 7}, format='json')
+        self.client.post('/api/movimientos/salida', {'SKU': 'A-1', 'Cantidad': 1}, format='json')
+        self.assertCuadra()
+
+        # El admin pasa por los mismos ganchos
+        productos = admin.site._registry[Producto]
+        peticion = RequestFactory().post('/admin/')
+        peticion.user = self.usuario
+        cafe = Producto.objects.get(sku='C-3')
+        cafe.stock_actual = 2
+        productos.save_model(peticion, cafe, None, change=True)
+        self.assertCuadra()
+        productos.delete_model(peticion, cafe)
+        self.assertCuadra()
+        productos.delete_queryset(peticion, Producto.objects.filter(sku='B-2'))
+        self.assertCuadra()
+        self.assertEqual(leer_resumen()['total_productos'], 1)
+
+
+class AlertasStockTests(ApiTestCase):
+    """Las escrituras mantienen las alertas y el sondeo con ``desde`` trae solo lo que cambió."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        Producto.objects.create(sku='A-1', nombre='Agua', costo=Decimal('1'), stock_actual=12, nivel_minimo_stock=10)
+        Producto.objects.create(sku='B-2', nombre='Pan', costo=Decimal('1'), stock_actual=50, nivel_minimo_stock=10)
+
+    def alertas(self, **params):
+        respuesta = self.client.get('/api/stock/alertas', params)
+        self.assertEqual(respuesta.status_code, 200)
+        datos = respuesta.json()
+        return datos['version'], [(a['SKU'], a['Stock_Actual'], a['activa']) for a in datos['alertas']]
+
+    def test_entrar_y_salir_del_stock_bajo(self):
+        version, alertas = self.alertas()
+        self.assertEqual(alertas, [])
+
+        self.client.post('/api/movimientos/salida', {'SKU': 'A-1', 'Cantidad': 3}, format='json')
+        self.client.post('/api/movimientos/salida', {'SKU': 'B-2', 'Cantidad': 1}, format='json')
+        version, alertas = self.alertas(desde=version)
+        self.assertEqual(alertas, [('A-1', 9, True)])
+
+        # Sin cambios no llega nada; al resurtir llega la alerta resuelta
+        self.assertEqual(self.alertas(desde=version)[1], [])
+        self.client.post('/api/movimientos/entrada', {'SKU': 'A-1', 'Cantidad': 5}, format='json')
+        self.assertEqual(self.alertas(desde=version)[1], [('A-1', 14, False)])
+        self.assertEqual(self.alertas()[1], [])
+
+    def test_desde_invalido(self):
+        self.assertEqual(self.client.get('/api/stock/alertas', {'desde': 'x'}).status_code, 400)
+
+
+class SincronizacionCatalogoTests(ApiTestCase):
+    """La sincronización con ``desde`` trae los cambios de catálogo, stock, bajas y categorías."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.bebidas = Categoria.objects.create(nombre='Bebidas')
+        for sku in ('A-1', 'B-2', 'C-3'):
+            Producto.objects.create(sku=sku, nombre=sku, costo=Decimal('1'), stock_actual=20, categoria=cls.bebidas)
+
+    def sincronizar(self, **params):
+        respuesta = self.client.get('/api/productos/sincronizar/', params)
+        self.assertEqual(respuesta.status_code, 200)
+        return respuesta.json()
+
+    def test_solo_llega_lo_que_cambio(self):
+        completo = self.sincronizar()
+        self.assertEqual([p['SKU'] for p in completo['productos']], ['A-1', 'B-2', 'C-3'])
+        self.assertEqual(self.sincronizar(desde=completo['version'])['productos'], [])
+
+        self.client.post('/api/movimientos/salida', {'SKU': 'A-1', 'Cantidad': 3}, format='json')
+        self.client.delete('/api/productos/B-2/')
+        cambios = self.sincronizar(desde=completo['version'])
+        self.assertEqual([(p['SKU'], p['Stock_Actual']) for p in cambios['productos']], [('A-1', 17)])
+        self.assertEqual(cambios['bajas'], ['B-2'])
+
+        self.client.patch(f'/api/categorias/{self.bebidas.id}/', {'nombre': 'Refrescos'}, format='json')
+        cambios = self.sincronizar(desde=cambios['version'])
+        self.assertEqual([c['nombre'] for c in cambios['categorias']], ['Refrescos'])
+        self.assertEqual({(p['SKU'], p['Nombre_Categoria']) for p in cambios['productos']},
+                         {('A-1', 'Refrescos'), ('C-3', 'Refrescos')})
+
+        self.client.delete(f'/api/categorias/{self.bebidas.id}/')
+        cambios = self.sincronizar(desde=cambios['version'])
+        self.assertEqual(cambios['categoriasBorradas'], [self.bebidas.id])
+        self.assertTrue(all('Nombre_Categoria' not in p for p in cambios['productos']))
+
+    def test_ventas_y_lotes_llevan_su_version(self):
+        c3 = Producto.objects.get(sku='C-3')
+        self.client.post('/api/reservas', {'carrito': 'c1', 'id_producto': c3.id, 'cantidad': 2}, format='json')
+        version = self.sincronizar()['version']
+        self.client.post('/api/movimientos/lote', {'tipo': 'Entrada', 'items': [
+            {'SKU': 'A-1', 'Cantidad': 5}]}, format='json')
+        # C-3 se cobra solo con su reserva: no pasa por el bloqueo de la venta
+        self.client.post('/api/ventas/registrar/', {'total': 4, 'carrito': 'c1', 'items': [
+            {'id_producto': c3.id, 'cantidad': 2, 'precio': 2}]}, format='json')
+        cambios = self.sincronizar(desde=version)
+        self.assertEqual([(p['SKU'], p['Stock_Actual']) for p in cambios['productos']], [('A-1', 25), ('C-3', 18)])
+
+    def test_importacion_sincroniza_categorias_nuevas(self):
+        version = self.sincronizar()['version']
+        archivo = SimpleUploadedFile('catalogo.csv',
+                                     b'SKU,Nombre_Producto,Costo,Nombre_Categoria\nD-4,Pan,2,Panaderia\n')
+        self.client.post('/api/productos/importar/', {'archivo': archivo}, format='multipart')
+        cambios = self.sincronizar(desde=version)
+        self.assertEqual([c['nombre'] for c in cambios['categorias']], ['Panaderia'])
+        self.assertEqual([(p['SKU'], p['Nombre_Categoria']) for p in cambios['productos']], [('D-4', 'Panaderia')])
+
+
+class RespuestasHttpTests(ApiTestCase):
+    """ETag/304 en los listados, JSON con orjson igual al de DRF y compresión de respuestas grandes."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        for i in range(60):
+            Producto.objects.create(sku=f'P-{i}', nombre=f'Producto número {i}', costo=Decimal('9.90'),
+                                    stock_actual=50)
+
+    def test_no_modificado_hasta_que_cambian_los_datos(self):
+        respuesta = self.client.get('/api/productos/')
+        etag = respuesta['ETag']
+        with self.assertNumQueries(1):
+            respuesta = self.client.get('/api/productos/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 304)
+        self.assertEqual(respuesta.content, b'')
+
+        # Otra URL u otro cambio confirmado producen otro ETag
+        self.assertEqual(self.client.get('/api/productos/P-1/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        self.client.post('/api/movimientos/salida', {'SKU': 'P-1', 'Cantidad': 1}, format='json')
+        respuesta = self.client.get('/api/productos/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertNotEqual(respuesta['ETag'], etag)
+        self.assertEqual(self.client.get('/api/movimientos', HTTP_IF_NONE_MATCH=respuesta['ETag']).status_code, 200)
+
+    @skipUnless(JSONRendererRapido.OPCIONES, 'orjson no está instalado')
+    def test_orjson_igual_que_drf(self):
+        datos = {
+            'texto': 'Añejo\u2028"x"', 'importe': Decimal('10.50'), 'fecha': timezone.now(), 'dia': timezone.localdate(),
+            'lista': [1, 2.5, None, True], 1: 'llave numérica', 'anidado': {'a': [{'b': Decimal('0.10')}]},
+        }
+        self.assertEqual(JSONRendererRapido().render(datos), JSONRenderer().render(datos))
+
+    def test_compresion_de_respuestas_grandes(self):
+        respuesta = self.client.get('/api/productos/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(respuesta['Content-Encoding'], 'gzip')
+        self.assertTrue(respuesta['ETag'].startswith('W/'))
+        self.assertEqual(json.loads(gzip.decompress(respuesta.content)), self.client.get('/api/productos/').json())
+        self.assertEqual(
+            self.client.get('/api/productos/', HTTP_IF_NONE_MATCH=respuesta['ETag']).status_code, 304
+        )
+
+        # Las respuestas chicas no se comprimen
+        respuesta = self.client.get('/api/productos/P-1/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(respuesta.has_header('Content-Encoding'))
+
+
+class RegistrarVentaTests(ApiTestCase):
+    """Una venta descuenta todas sus líneas o ninguna."""
+    email = 'caja@test.com'
+    role = 'Operador'
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.agua = Producto.objects.create(sku='A-1', nombre='Agua', costo=Decimal('5'), stock_actual=10)
+        cls.pan = Producto.objects.create(sku='B-2', nombre='Pan', costo=Decimal('2'), stock_actual=5)
+        reconstruir_resumen()
+
+    def registrar(self, *lineas):
+        items = [{'id_producto': producto_id, 'cantidad': cantidad, 'precio': precio}
+                 for producto_id, cantidad, precio in lineas]
+        total = sum(cantidad * precio for _, cantidad, precio in lineas)
+        return self.client.post('/api/ventas/registrar/', {'total': total, 'items': items}, format='json')
+
+    def stocks(self):
+        return dict(Producto.objects.values_list('sku', 'stock_actual'))
+
+    def assertSinCambios(self):
+        self.assertEqual(self.stocks(), {'A-1': 10, 'B-2': 5})
+        self.assertFalse(Venta.objects.exists())
+        self.assertFalse(Movimiento.objects.exists())
+        self.assertEqual(leer_resumen(), calcular_resumen())
+
+    def test_carrito_con_producto_repetido(self):
+        respuesta = self.registrar((self.agua.id, 2, 10), (self.pan.id, 1, 3), (self.agua.id, 1, 10))
+        self.assertEqual(respuesta.status_code, 201)
+        ticket = respuesta.json()['ticket']
+        self.assertEqual([(i['producto'], i['cantidad']) for i in ticket['items']],
+                         [('Agua', 2), ('Pan', 1), ('Agua', 1)])
+        self.assertEqual((ticket['cajero'], Decimal(str(ticket['total']))), ('caja@test.com', Decimal('33')))
+        self.assertEqual(self.stocks(), {'A-1': 7, 'B-2': 4})
+        self.assertEqual(DetalleVenta.objects.filter(venta__folio=ticket['folio']).count(), 3)
+        self.assertEqual(Movimiento.objects.filter(tipo='Salida').count(), 3)
+        self.assertEqual(leer_resumen(), calcular_resumen())
+
+    def test_stock_insuficiente_revierte_toda_la_venta(self):
+        respuesta = self.registrar((self.agua.id, 2, 10), (self.pan.id, 6, 3))
+        self.assertEqual((respuesta.status_code, respuesta.json()['error']), (400, 'Stock insuficiente para Pan'))
+        # Cada línea alcanza, pero no la suma del producto repetido
+        respuesta = self.registrar((self.pan.id, 3, 3), (self.pan.id, 3, 3))
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertSinCambios()
+
+    def test_producto_inexistente(self):
+        respuesta = self.registrar((self.agua.id, 1, 10), (self.pan.id + 1000, 1, 3))
+        self.assertEqual(respuesta.status_code, 404)
+        self.assertSinCambios()
+
+
+class AnaliticaVentasTests(ApiTestCase):
+    """Los rollups que suma cada venta coinciden con reconstruirlos y los endpoints filtran por día."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.cajero = Usuario.objects.create_user(
+            username='caja@test.com', email='caja@test.com', password='x', role='Operador'
+        )
+        cls.agua = Producto.objects.create(sku='A-1', nombre='Agua', costo=Decimal('5'), stock_actual=100)
+        cls.pan = Producto.objects.create(sku='B-2', nombre='Pan', costo=Decimal('2'), stock_actual=100)
+
+    def vender(self, usuario, *lineas):
+        cliente = APIClient()
+        cliente.force_authenticate(usuario)
+        items = [{'id_producto': p.id, 'cantidad': cantidad, 'precio': precio} for p, cantidad, precio in lineas]
+        total = sum(cantidad * precio for _, cantidad, precio in lineas)
+        respuesta = cliente.post('/api/ventas/registrar/', {'total': total, 'items': items}, format='json')
+        self.assertEqual(respuesta.status_code, 201)
+        return Venta.objects.get(folio=respuesta.json()['ticket']['folio'])
+
+    def rollups(self):
+        return (
+            sorted(VentaDiariaProducto.objects.values_list('fecha', 'producto_id', 'unidades', 'importe', 'lineas')),
+            sorted(VentaDiariaCajero.objects.values_list('fecha', 'usuario_id', 'num_ventas', 'unidades', 'importe')),
+        )
+
+    def consultar(self, ruta, **params):
+        respuesta = self.client.get(ruta, params)
+        self.assertEqual(respuesta.status_code, 200)
+        return respuesta.json()['resultados']
+
+    def test_incremental_igual_a_reconstruir(self):
+        self.vender(self.cajero, (self.agua, 2, 10), (self.pan, 1, 2.5), (self.agua, 1, 10))
+        self.vender(self.cajero, (self.pan, 3, 2.5))
+        self.vender(self.usuario, (self.agua, 4, 9.99))
+        incrementales = self.rollups()
+        self.assertEqual(len(incrementales[0]), 2)
+        self.assertEqual(reconstruir_analitica(), (2, 2))
+        self.assertEqual(self.rollups(), incrementales)
+
+    def test_filtros_por_fecha(self):
+        antigua = self.vender(self.cajero, (self.pan, 5, 1.5))
+        self.vender(self.cajero, (self.agua, 1, 10))
+        hace_diez = timezone.localdate() - timedelta(days=10)
+        Venta.objects.filter(id=antigua.id).update(fecha=antigua.fecha - timedelta(days=10))
+        call_command('reconstruir_analitica', stdout=StringIO())
+
+        hoy = timezone.localdate().isoformat()
+        ventas = self.consultar('/api/analitica/ventas', fecha_hasta=hace_diez.isoformat())
+        self.assertEqual([(v['periodo'], v['ventas'], v['unidades']) for v in ventas],
+                         [(hace_diez.isoformat(), 1, 5)])
+        ventas = self.consultar('/api/analitica/ventas', fecha_desde=hoy)
+        self.assertEqual([(v['periodo'], v['ventas']) for v in ventas], [(hoy, 1)])
+        self.assertEqual(len(self.consultar('/api/analitica/ventas')), 2)
+
+        top = self.consultar('/api/analitica/top-productos', fecha_desde=hoy)
+        self.assertEqual([p['SKU'] for p in top], ['A-1'])
+        top = self.consultar('/api/analitica/top-productos')
+        self.assertEqual([p['SKU'] for p in top], ['B-2', 'A-1'])
+        top = self.consultar('/api/analitica/top-productos', orden='importe')
+        self.assertEqual([p['SKU'] for p in top], ['A-1', 'B-2'])
+        respuesta = self.client.get('/api/analitica/top-productos', {'categoria': 'abc'})
+        self.assertEqual(respuesta.status_code, 400)
+
+    def test_operador_solo_ve_sus_ventas(self):
+        self.vender(self.cajero, (self.pan, 1, 2))
+        self.vender(self.usuario, (self.agua, 3, 10))
+        self.assertEqual(self.consultar('/api/analitica/ventas', usuario='caja@test.com')[0]['unidades'], 1)
+
+        cliente = APIClient()
+        cliente.force_authenticate(self.cajero)
+        for params in ({}, {'usuario': self.usuario.email}):
+            ventas = cliente.get('/api/analitica/ventas', params).json()['resultados']
+            self.assertEqual([v['unidades'] for v in ventas], [1])
+
+
+class VentasIdempotentesTests(ApiTestCase):
+    """Reintentar una venta o un lote con las mismas claves no descuenta el stock dos veces."""
+    email = 'caja@test.com'
+    role = 'Operador'
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.agua = Producto.objects.create(sku='A-1', nombre='Agua', costo=Decimal('5'), stock_actual=10)
+        cls.pan = Producto.objects.create(sku='B-2', nombre='Pan', costo=Decimal('2'), stock_actual=1)
+
+    def venta(self, clave, producto, cantidad):
+        return {'clave_idempotencia': clave, 'total': 10 * cantidad,
+                'items': [{'id_producto': producto.id, 'cantidad': cantidad, 'precio': 10}]}
+
+    def test_reintento_de_una_venta(self):
+        datos = self.venta('uuid-1', self.agua, 2)
+        primera = self.client.post('/api/ventas/registrar/', datos, format='json')
+        segunda = self.client.post('/api/ventas/registrar/', datos, format='json')
+        self.assertEqual((primera.status_code, segunda.status_code), (201, 200))
+        self.assertEqual(primera.json()['ticket']['folio'], segunda.json()['ticket']['folio'])
+        self.assertEqual(segunda.json()['ticket']['items'][0]['cantidad'], 2)
+        self.agua.refresh_from_db()
+        self.assertEqual(self.agua.stock_actual, 8)
+
+    def test_lote_con_resultados_por_venta(self):
+        lote = {'ventas': [
+            self.venta('a', self.agua, 3),
+            self.venta('b', self.pan, 5),
+            self.venta('a', self.agua, 3),
+            {'total': 1, 'items': []},
+            self.venta('c', self.pan, 1),
+        ], 'bloque': 2}
+        respuesta = self.client.post('/api/ventas/lote/', lote, format='json')
+        self.assertEqual(respuesta.status_code, 207)
+        resultados = respuesta.json()['resultados']
+        self.assertEqual([r['estado'] for r in resultados],
+                         ['registrada', 'rechazada', 'duplicada', 'rechazada', 'registrada'])
+        self.assertEqual(resultados[0]['folio'], resultados[2]['folio'])
+
+        # Reenviar el lote completo no cambia nada
+        respuesta = self.client.post('/api/ventas/lote/', lote, format='json')
+        self.assertEqual([r['estado'] for r in respuesta.json()['resultados']],
+                         ['duplicada', 'rechazada', 'duplicada', 'rechazada', 'duplicada'])
+        self.assertEqual(Venta.objects.count(), 2)
+        self.assertEqual(Producto.objects.get(sku='A-1').stock_actual, 7)
+        self.assertEqual(Producto.objects.get(sku='B-2').stock_actual, 0)
+        self.assertEqual(Movimiento.objects.filter(tipo='Salida').count(), 2)
+
+    def test_linea_invalida_rechaza_solo_su_venta(self):
+        invalida = self.venta('d', self.agua, 1)
+        invalida['items'][0]['cantidad'] = -1
+        sin_precio = self.venta('e', self.agua, 1)
+        sin_precio['items'][0]['precio'] = 'NaN'
+        lote = {'ventas': [self.venta('a', self.agua, 1), invalida, self.venta('b', self.agua, 1), sin_precio,
+                           self.venta('c', self.agua, 1)]}
+        respuesta = self.client.post('/api/ventas/lote/', lote, format='json')
+        self.assertEqual((respuesta.json()['registradas'], respuesta.json()['rechazadas']), (3, 2))
+        self.assertEqual([r['estado'] for r in respuesta.json()['resultados']],
+                         ['registrada', 'rechazada', 'registrada', 'rechazada', 'registrada'])
+        self.assertEqual(Producto.objects.get(sku='A-1').stock_actual, 7)
+
+    def test_clave_confirmada_por_otra_peticion(self):
+        datos = self.venta('uuid-2', self.agua, 2)
+        original = self.client.post('/api/ventas/registrar/', datos, format='json').json()['ticket']
+        # La búsqueda previa no la ve (la otra petición aún no confirmaba): el índice único decide
+        with mock.patch('core.views.venta_por_clave', side_effect=[None, venta_por_clave('uuid-2')]):
+            respuesta = self.client.post('/api/ventas/registrar/', datos, format='json')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.json()['ticket']['folio'], original['folio'])
+        self.agua.refresh_from_db()
+        self.assertEqual(self.agua.stock_actual, 8)
+
+
+class LoteMovimientosTests(ApiTestCase):
+    """Los lotes de entradas y salidas validan cada línea y se aplican todo o nada salvo con ``atomico``."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        Producto.objects.create(sku='A-1', nombre='Agua', costo=Decimal('5'), stock_actual=10)
+        Producto.objects.create(sku='B-2', nombre='Pan', costo=Decimal('2'), stock_actual=3)
+
+    def lote(self, tipo, items, **extra):
+        return self.client.post('/api/movimientos/lote', {'tipo': tipo, 'items': items, **extra}, format='json')
+
+    def stock(self, sku):
+        return Producto.objects.get(sku=sku).stock_actual
+
+    def test_entrada_y_salida(self):
+        resumen = leer_resumen()
+        respuesta = self.lote('Entrada', [{'SKU': 'A-1', 'Cantidad': 2}, {'SKU': 'B-2', 'Cantidad': 1}])
+        self.assertEqual(respuesta.status_code, 201)
+        # Un SKU repetido acumula: la segunda línea ya no alcanza
+        respuesta = self.lote('Salida', [{'SKU': 'B-2', 'Cantidad': 3}, {'SKU': 'B-2', 'Cantidad': 2}])
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertEqual(respuesta.json()['errores'][0]['stockDisponible'], 1)
+        self.assertEqual(self.stock('B-2'), 4)
+
+        respuesta = self.lote('Salida', [{'SKU': 'B-2', 'Cantidad': 3}, {'SKU': 'B-2', 'Cantidad': 1}])
+        self.assertEqual(respuesta.status_code, 201)
+        self.assertEqual((self.stock('A-1'), self.stock('B-2')), (12, 0))
+        despues = leer_resumen()
+        self.assertEqual(despues['total_stock'], resumen['total_stock'] - 1)
+        self.assertEqual(despues['total_entradas'] - resumen['total_entradas'], 2)
+        self.assertEqual(despues['total_salidas'] - resumen['total_salidas'], 2)
+
+    def test_lineas_invalidas(self):
+        items = [5, {'SKU': ['a'], 'Cantidad': 1}, {'SKU': 'A-1', 'Cantidad': 0}, {'SKU': 'X', 'Cantidad': 1},
+                 {'SKU': 'A-1', 'Cantidad': 4}]
+        respuesta = self.lote('Salida', items)
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertEqual([e['linea'] for e in respuesta.json()['errores']], [1, 2, 3])
+        self.assertEqual(self.stock('A-1'), 10)
+
+        # Sin atomico se aplican las válidas y se reportan las demás
+        respuesta = self.lote('Salida', items, atomico=False)
+        self.assertEqual(respuesta.status_code, 207)
+        self.assertEqual([e['linea'] for e in respuesta.json()['errores']], [1, 2, 3, 4])
+        self.assertEqual(self.stock('A-1'), 6)
+        self.assertEqual(self.lote('Entrada', {'SKU': 'A-1'}).status_code, 400)
+        self.assertEqual(self.lote('Ajuste', [{'SKU': 'A-1', 'Cantidad': 1}]).status_code, 400)
+
+
+class ExportacionTests(ApiTestCase):
+    """Las exportaciones en streaming respetan los filtros del listado y ambos formatos."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.cajero = Usuario.objects.create_user(
+            username='caja@test.com', email='caja@test.com', password='x', role='Operador'
+        )
+        cls.agua = Producto.objects.create(sku='A-1', nombre='Agua, 1 L', costo=Decimal('5'), stock_actual=10)
+        cls.pan = Producto.objects.create(sku='B-2', nombre='Pan', costo=Decimal('2'), stock_actual=10)
+
+    def cliente(self, usuario):
+        cliente = APIClient()
+        cliente.force_authenticate(usuario)
+        return cliente
+
+    def exportar(self, usuario, ruta, **params):
+        respuesta = self.cliente(usuario).get(ruta, params)
+        self.assertEqual(respuesta.status_code, 200)
+        texto = b''.join(respuesta.streaming_content).decode()
+        if params.get('formato') == 'ndjson':
+            self.assertEqual(respuesta['Content-Type'], 'application/x-ndjson')
+            return [json.loads(linea) for linea in texto.splitlines()]
+        self.assertIn('.csv', respuesta['Content-Disposition'])
+        return list(csv.reader(texto.splitlines()))
+
+    def test_movimientos(self):
+        admin, cajero = self.cliente(self.usuario), self.cliente(self.cajero)
+        admin.post('/api/movimientos/entrada', {'SKU': 'A-1', 'Cantidad': 5}, format='json')
+        cajero.post('/api/movimientos/salida', {'SKU': 'B-2', 'Cantidad': 2}, format='json')
+        admin.post('/api/movimientos/salida', {'SKU': 'A-1', 'Cantidad': 1}, format='json')
+
+        filas = self.exportar(self.usuario, '/api/movimientos/exportar')
+        self.assertEqual(filas[0][:6], ['id', 'fecha', 'tipo', 'SKU', 'Nombre_Producto', 'Cantidad'])
+        self.assertEqual([(f[2], f[3], f[4], f[5]) for f in filas[1:]],
+                         [('Entrada', 'A-1', 'Agua, 1 L', '5'), ('Salida', 'B-2', 'Pan', '2'),
+                          ('Salida', 'A-1', 'Agua, 1 L', '1')])
+        filas = self.exportar(self.usuario, '/api/movimientos/exportar', tipo='Salida', sku='A-1', formato='ndjson')
+        self.assertEqual([(f['tipo'], f['SKU'], f['Cantidad'], f['Email_Usuario']) for f in filas],
+                         [('Salida', 'A-1', 1, 'admin@test.com')])
+        # Un Operador solo exporta sus movimientos
+        filas = self.exportar(self.cajero, '/api/movimientos/exportar', formato='ndjson')
+        self.assertEqual([f['SKU'] for f in filas], ['B-2'])
+        self.assertEqual(self.cliente(self.usuario).get('/api/movimientos/exportar', {'formato': 'xml'}).status_code,
+                         400)
+
+    def test_ventas(self):
+        venta = {'total': 23, 'items': [{'id_producto': self.agua.id, 'cantidad': 2, 'precio': 10},
+                                        {'id_producto': self.pan.id, 'cantidad': 1, 'precio': 3}]}
+        folio = self.cliente(self.cajero).post('/api/ventas/registrar/', venta, format='json').json()['ticket']['folio']
+
+        filas = self.exportar(self.usuario, '/api/ventas/exportar/', formato='ndjson')
+        self.assertEqual(
+            [(f['folio'], f['Usuario'], f['total'], f['SKU'], f['cantidad'], f['subtotal']) for f in filas],
+            [(folio, 'caja@test.com', '23.00', 'A-1', 2, '20.00'), (folio, 'caja@test.com', '23.00', 'B-2', 1, '3.00')]
+        )
+        manana = (timezone.localdate() + timedelta(days=1)).isoformat()
+        self.assertEqual(len(self.exportar(self.usuario, '/api/ventas/exportar/', fecha_desde=manana)), 1)
+        self.assertEqual(len(self.exportar(self.usuario, '/api/ventas/exportar/', fecha_hasta=manana)), 3)
+        respuesta = self.cliente(self.usuario).get('/api/ventas/exportar/', {'fecha_desde': 'ayer'})
+        self.assertEqual(respuesta.status_code, 400)
+
+
+class ImportacionTests(ApiTestCase):
+    """La importación crea, actualiza o reactiva por SKU y reporta las filas inválidas sin abortar."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        Producto.objects.create(sku='A-1', nombre='Agua', costo=Decimal('5'), stock_actual=10)
+        Producto.objects.create(sku='B-2', nombre='Pan', costo=Decimal('2'), stock_actual=3, is_active=False)
+
+    def importar(self, texto, nombre='catalogo.csv'):
+        archivo = SimpleUploadedFile(nombre, texto.encode())
+        return self.client.post('/api/productos/importar/', {'archivo': archivo}, format='multipart')
+
+    def test_alta_actualizacion_y_reactivacion(self):
+        stock_antes = leer_resumen()['total_stock']
+        respuesta = self.importar(
+            'SKU,Nombre_Producto,Costo,Stock_Actual,Nombre_Categoria\n'
+            'A-1,Agua grande,6.5,99,Bebidas\n'
+            'B-2,Pan dulce,2,7,\n'
+            'C-3,Café,40,4,Bebidas\n'
+        )
+        self.assertEqual(respuesta.status_code, 200)
+        reporte = respuesta.json()
+        self.assertEqual((reporte['creados'], reporte['actualizados'], reporte['reactivados']), (1, 1, 1))
+
+        agua, pan, cafe = (Producto.objects.get(sku=sku) for sku in ('A-1', 'B-2', 'C-3'))
+        # Un producto activo solo actualiza su catálogo; el stock cambia al crear o reactivar
+        self.assertEqual((agua.nombre, agua.costo, agua.stock_actual), ('Agua grande', Decimal('6.50'), 10))
+        self.assertEqual((pan.is_active, pan.stock_actual), (True, 7))
+        self.assertEqual(cafe.categoria, agua.categoria)
+        self.assertEqual(Movimiento.objects.filter(tipo='Creacion').count(), 2)
+        self.assertEqual(leer_resumen()['total_stock'], stock_antes + 7 + 4)
+
+    def test_filas_invalidas(self):
+        respuesta = self.importar(
+            '{"SKU": "D-4", "Nombre_Producto": "Leche", "Costo": "NaN"}\n'
+            '{"SKU": "E-5", "Nombre_Producto": "Jugo", "Costo": "Infinity"}\n'
+            '{"SKU": "F-6", "Costo": "3"}\n'
+            'no es json\n'
+            '{"SKU": "G-7", "Nombre_Producto": "Té", "Costo": "3", "Stock_Actual": -1}\n'
+            '{"SKU": "H-8", "Nombre_Producto": "Miel", "Costo": "3"}\n',
+            nombre='catalogo.ndjson'
+        )
+        self.assertEqual(respuesta.status_code, 200)
+        reporte = respuesta.json()
+        self.assertEqual((reporte['creados'], reporte['totalErrores']), (1, 5))
+        self.assertEqual([e['fila'] for e in reporte['errores']], [1, 2, 3, 4, 5])
+        self.assertEqual(reporte['errores'][0], {'fila': 1, 'SKU': 'D-4', 'error': 'Costo inválido.'})
+        self.assertTrue(Producto.objects.filter(sku='H-8').exists())
+
+
+class StockEnFechaTests(ApiTestCase):
+    """El stock a una fecha se reconstruye del Kardex, incluidos los ajustes de stock fijado a mano."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.agua = Producto.objects.create(sku='A-1', nombre='Agua', costo=Decimal('5'), stock_actual=10)
+
+    def stock(self, fecha):
+        return stock_en_fecha(fecha, [self.agua.id])[0][self.agua.id][0]
+
+    def test_hacia_atras_y_hacia_adelante(self):
+        inicio = timezone.now()
+        self.client.post('/api/movimientos/entrada', {'SKU': 'A-1', 'Cantidad': 5}, format='json')
+        self.client.patch('/api/productos/A-1/', {'Stock_Actual': 12}, format='json')
+        editado = timezone.now()
+        self.client.delete('/api/productos/A-1/')
+        self.client.post('/api/productos/', {'SKU': 'A-1', 'Stock_Actual': 20}, format='json')
+        self.assertEqual(
+            list(Movimiento.objects.order_by('id').values_list('tipo', 'cantidad')),
+            [('Entrada', 5), ('AjusteSalida', 3), ('Eliminacion', 12), ('Creacion', 20), ('AjusteEntrada', 8)]
+        )
+
+        # Sin cierres: hacia atrás desde el stock actual
+        self.assertEqual([self.stock(inicio), self.stock(editado), self.stock(timezone.now())], [10, 12, 20])
+        # Con un cierre al inicio: hacia adelante desde él
+        cierre = cerrar_periodo('Diario', inicio)
+        self.assertEqual(cierre.snapshots.get(producto=self.agua).stock, 10)
+        self.assertEqual([self.stock(editado), self.stock(timezone.now())], [12, 20])
+
+
+@override_settings(FOLIOS={'PREFIJO': 'V', 'TAMANO_BLOQUE': 2, 'PREFIJOS_CAJA': {'caja-1': 'A'}})
+class FoliosTests(ApiTestCase):
+    """Los folios salen de bloques por prefijo y la auditoría reporta los números sin venta."""
+
+    def setUp(self):
+        super().setUp()
+        asignador.reiniciar()
+        self.addCleanup(asignador.reiniciar)
+
+    def test_bloques_por_caja(self):
+        self.assertEqual([siguiente_folio() for _ in range(3)], ['V-00000001', 'V-00000002', 'V-00000003'])
+        self.assertEqual(siguiente_folio('caja-1'), 'A-00000001')
+        with self.assertRaises(ValueError):
+            siguiente_folio('caja-9')
+        # Un proceso nuevo no reutiliza el resto del bloque de otro
+        asignador.reiniciar()
+        self.assertEqual(siguiente_folio(), 'V-00000005')
+        self.assertEqual(
+            list(BloqueFolio.objects.order_by('id').values_list('prefijo', 'inicio', 'fin')),
+            [('V', 1, 2), ('V', 3, 4), ('A', 1, 2), ('V', 5, 6)]
+        )
+
+        agua = Producto.objects.create(sku='A-1', nombre='Agua', costo=Decimal('5'), stock_actual=10)
+        venta = {'total': 10, 'caja': 'caja-9', 'items': [{'id_producto': agua.id, 'cantidad': 1, 'precio': 10}]}
+        respuesta = self.client.post('/api/ventas/registrar/', venta, format='json')
+        self.assertEqual((respuesta.status_code, respuesta.json()['error']), (400, 'Caja no registrada: caja-9'))
+        self.assertFalse(Venta.objects.exists())
+
+    def test_auditoria_reporta_folios_sin_venta(self):
+        for _ in range(5):
+            Venta.objects.create(folio=siguiente_folio(), total=Decimal('1'), usuario=self.usuario)
+        Venta.objects.filter(folio__in=['V-00000002', 'V-00000003']).delete()
+        Venta.objects.create(folio=siguiente_folio('caja-1'), total=Decimal('1'), usuario=self.usuario)
+
+        salida = StringIO()
+        call_command('auditar_folios', stdout=salida)
+        self.assertEqual(salida.getvalue().splitlines(), [
+            'A: 2 reservados, 1 usados, 1 sin usar',
+            '  Sin usar: 2',
+            'V: 6 reservados, 3 usados, 3 sin usar',
+            '  Sin usar: 2-3, 6',
+        ])
+        salida = StringIO()
+        call_command('auditar_folios', prefijo='A', stdout=salida)
+        self.assertTrue(salida.getvalue().startswith('A: '))
+
+
+class ReservasTests(ApiTestCase):
+    """Las reservas apartan stock para su carrito hasta cobrarse, cancelarse o vencer."""
+    email = 'caja@test.com'
+    role = 'Operador'
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.agua = Producto.objects.create(sku='A-1', nombre='Agua', costo=Decimal('5'), stock_actual=5)
+
+    def reservar(self, carrito, cantidad):
+        return self.client.post('/api/reservas', {'carrito': carrito, 'id_producto': self.agua.id,
+                                                  'cantidad': cantidad}, format='json')
+
+    def test_reserva_aparta_stock_de_otros_carritos(self):
+        respuesta = self.reservar('c1', 4)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.json()['Stock_Disponible'], 1)
+        self.assertEqual(self.reservar('c2', 2).status_code, 409)
+        venta = {'total': 20, 'items': [{'id_producto': self.agua.id, 'cantidad': 2, 'precio': 10}]}
+        self.assertEqual(self.client.post('/api/ventas/registrar/', venta, format='json').status_code, 400)
+
+        # Bajar la reserva devuelve lo apartado
+        self.assertEqual(self.reservar('c1', 1).json()['Stock_Disponible'], 4)
+        self.assertEqual(self.reservar('c2', 4).status_code, 200)
+        self.assertEqual(self.client.delete('/api/reservas?carrito=c2').json()['liberadas'], 1)
+        self.agua.refresh_from_db()
+        self.assertEqual((self.agua.stock_actual, self.agua.stock_reservado), (5, 1))
+
+    def test_venta_convierte_la_reserva(self):
+        self.reservar('c1', 3)
+        stock_antes = leer_resumen()['total_stock']
+        venta = {'total': 40, 'carrito': 'c1',
+                 'items': [{'id_producto': self.agua.id, 'cantidad': 4, 'precio': 10}]}
+        respuesta = self.client.post('/api/ventas/registrar/', venta, format='json')
+        self.assertEqual(respuesta.status_code, 201)
+        self.agua.refresh_from_db()
+        self.assertEqual((self.agua.stock_actual, self.agua.stock_reservado), (1, 0))
+        self.assertFalse(Reserva.objects.exists())
+        self.assertEqual(leer_resumen()['total_stock'], stock_antes - 4)
+        self.assertEqual(Movimiento.objects.get(tipo='Salida').cantidad, 4)
+
+    def test_barrido_libera_reservas_vencidas(self):
+        self.reservar('c1', 5)
+        Reserva.objects.update(expira=timezone.now() - timedelta(minutes=1))
+        self.assertEqual(barrer_vencidas(), 1)
+        self.agua.refresh_from_db()
+        self.assertEqual(self.agua.stock_reservado, 0)
+
+        # Una reserva nueva también libera las vencidas que le estorban
+        self.reservar('c1', 5)
+        Reserva.objects.update(expira=timezone.now() - timedelta(minutes=1))
+        self.assertEqual(self.reservar('c2', 5).status_code, 200)
+        self.assertEqual(list(Reserva.objects.values_list('carrito', flat=True)), ['c2'])
+
+    def test_reconstruir_reservados(self):
+        self.reservar('c1', 2)
+        Producto.objects.update(stock_reservado=0)
+        reconstruir_reservados()
+        self.agua.refresh_from_db()
+        self.assertEqual(self.agua.stock_reservado, 2)
+
+
+class UbicacionesTests(ApiTestCase):
+    """El stock por ubicación suma el global y sus totales se mantienen con cada escritura."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.principal = Ubicacion.objects.get(es_principal=True)
+        cls.tienda = Ubicacion.objects.create(nombre='Tienda Centro')
+        cls.agua = Producto.objects.create(sku='A-1', nombre='Agua', costo=Decimal('5'), stock_actual=10)
+        # El producto se creó sin pasar por registrar_cambios
+        reconstruir_resumen()
+
+    def transferir(self, cantidad):
+        return self.client.post('/api/movimientos/transferencia', {
+            'destino': self.tienda.id, 'items': [{'SKU': 'A-1', 'Cantidad': cantidad}]
+        }, format='json')
+
+    def stocks(self):
+        return dict(StockUbicacion.objects.filter(producto=self.agua).values_list('ubicacion_id', 'stock'))
+
+    def test_movimientos_y_transferencias_por_ubicacion(self):
+        respuesta = self.transferir(4)
+        self.assertEqual(respuesta.status_code, 201)
+        self.assertEqual(respuesta.json()['productos'][0]['Stock_Destino'], 4)
+        salida = {'SKU': 'A-1', 'Cantidad': 5, 'ubicacion': self.tienda.id}
+        respuesta = self.client.post('/api/movimientos/salida', salida, format='json')
+        self.assertEqual((respuesta.status_code, respuesta.json()['stockDisponible']), (400, 4))
+        salida['Cantidad'] = 3
+        respuesta = self.client.post('/api/movimientos/salida', salida, format='json')
+        self.assertEqual(respuesta.json()['stockUbicacion'], 1)
+        self.client.post('/api/movimientos/entrada', {'SKU': 'A-1', 'Cantidad': 2}, format='json')
+
+        self.agua.refresh_from_db()
+        self.assertEqual(self.agua.stock_actual, 9)
+        self.assertEqual(self.stocks(), {self.principal.id: 8, self.tienda.id: 1})
+        dashboard = self.client.get('/api/dashboard/metrics').json()
+        self.assertEqual(dashboard['totalStock'], 9)
+        self.assertEqual(
+            {u['id']: (u['stock'], u['valor']) for u in dashboard['stockPorUbicacion']},
+            {self.principal.id: (8, 40.0), self.tienda.id: (1, 5.0)}
+        )
+        kardex = self.client.get('/api/movimientos', {'ubicacion': self.tienda.id}).json()
+        self.assertEqual([m['tipo'] for m in kardex], ['Salida', 'Transferencia'])
+
+    def test_transferencia_con_lineas_invalidas(self):
+        for item in (5, {'SKU': ['a'], 'Cantidad': 1}, {'SKU': 'A-1', 'Cantidad': '2'}):
+            respuesta = self.client.post('/api/movimientos/transferencia', {
+                'destino': self.tienda.id, 'items': [{'SKU': 'A-1', 'Cantidad': 1}, item]
+            }, format='json')
+            self.assertEqual(respuesta.status_code, 400)
+            self.assertTrue(respuesta.json()['error'].startswith('Línea 2:'))
+        self.assertFalse(Movimiento.objects.filter(tipo='Transferencia').exists())
+
+    def test_venta_valida_el_stock_de_su_ubicacion(self):
+        venta = {'total': 20, 'ubicacion': self.tienda.id,
+                 'items': [{'id_producto': self.agua.id, 'cantidad': 2, 'precio': 10}]}
+        self.assertEqual(self.client.post('/api/ventas/registrar/', venta, format='json').status_code, 400)
+        self.transferir(2)
+        self.assertEqual(self.client.post('/api/ventas/registrar/', venta, format='json').status_code, 201)
+
+        productos = self.client.get('/api/productos/', {'ubicaciones': 'true'}).json()
+        self.assertEqual(productos[0]['Stock_Ubicaciones'],
+                         {str(self.principal.id): 8, str(self.tienda.id): 0})
+        respuesta = self.client.patch(f'/api/ubicaciones/{self.tienda.id}/', {'is_active': False}, format='json')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(ResumenUbicacion.objects.filter(ubicacion=self.tienda).aggregate(
+            total=Sum('total_stock'))['total'], 0)
+
+
+class PruebaCargaTests(TestCase):
+    """Humo de la prueba de carga: siembra idempotente y cada operación contra el cliente en proceso."""
+
+    def setUp(self):
+        # El login guarda a los cajeros en la cache de autenticación y otra clase reutiliza sus ids
+        self.addCleanup(cache.clear)
+
+    def test_siembra_y_operaciones(self):
+        self.assertEqual(sembrar(cajeros=2, productos=5, password='carga'), (2, 5))
+        self.assertEqual(sembrar(cajeros=3, productos=5, password='carga'), (1, 0))
+        self.assertEqual(leer_resumen(), calcular_resumen())
+
+        # Sin hilos: los demás abrirían conexiones que no ven la transacción de la prueba
+        prueba = PruebaCarga(cajeros=1, operaciones=1)
+        cliente = ClienteLocal()
+        token = prueba._login(cliente, 0)
+        prueba.productos = prueba._cargar_productos(cliente, token)
+        self.assertEqual(len(prueba.productos), 5)
+        rng = random.Random(1)
+        acumulados = prueba._pesos_acumulados()
+        for tipo in MEZCLA_DEFAULT:
+            status, texto = prueba._operacion(cliente, token, rng, tipo, acumulados)
+            self.assertEqual(clasificar(status, texto), 'ok', texto)
+            prueba.resultados.agregar(tipo, 0.01, 'ok', texto)
+
+        reporte = prueba.reporte(1.0)
+        self.assertEqual((reporte['operaciones'], reporte['resultados']), (5, {'ok': 5}))
+        self.assertEqual(clasificar(500, 'OperationalError: database is locked'), 'candado')
+        self.assertEqual(clasificar(400, '{"error": "Stock insuficiente para X"}'), 'sin_stock')
+
+
+class DatosSinteticosTests(TestCase):
+    """El generador inserta cada fila con su fecha histórica y deja los totales cuadrados."""
+
+    def test_fechas_historicas_y_stock_consistente(self):
+        conteo = GeneradorDatos(categorias=2, productos=8, movimientos=60, ventas=12, cajeros=2, dias=5,
+                                lote=7).ejecutar()
+        self.assertEqual(conteo['ventas'], Venta.objects.count())
+        hoy = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+        for modelo, campo in ((Producto, 'fecha_creacion'), (Venta, 'fecha'), (Movimiento, 'fecha')):
+            self.assertFalse(modelo.objects.filter(**{f'{campo}__gte': hoy}).exists(), modelo.__name__)
+        self.assertEqual(leer_resumen(), calcular_resumen())
+
+
+@skipUnless(connection.vendor == 'postgresql', 'EXPLAIN solo se revisa en PostgreSQL')
+class PlanesConsultaTests(TestCase):
+    """Los listados y el dashboard deben poder resolverse con índices.
+
+    Con ``enable_seqscan`` apagado el planificador solo recurre a un Seq Scan si
+    ningún índice sirve para la consulta, así que el plan no depende del tamaño
+    de los datos de prueba.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = Usuario.objects.create_user(
+            username='admin@test.com', email='admin@test.com', password='x', role='Superadmin'
+        )
+        cls.operador = Usuario.objects.create_user(
+            username='op@test.com', email='op@test.com', password='x', role='Operador'
+        )
+
+    def assertUsaIndice(self, queryset, tabla):
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        plan = queryset.explain()
+        self.assertNotIn(f'Seq Scan on {tabla}', plan, plan)
+
+    def test_kardex(self):
+        movimientos = Movimiento.objects.all()
+        orden = ('-fecha', '-id')
+        self.assertUsaIndice(
+            filtrar_movimientos(movimientos, {}, self.admin).order_by(*orden)[:51], 'core_movimiento')
+        self.assertUsaIndice(
+            filtrar_movimientos(movimientos, {}, self.operador).order_by(*orden)[:51], 'core_movimiento')
+        self.assertUsaIndice(
+            filtrar_movimientos(movimientos, {'tipo': 'Entrada'}, self.admin).order_by(*orden)[:51], 'core_movimiento')
+
+    def test_ventas(self):
+        self.assertUsaIndice(Venta.objects.order_by('-fecha', '-id')[:51], 'core_venta')
+
+    def test_catalogo_y_bajo_stock(self):
+        self.assertUsaIndice(filtrar_catalogo({}).order_by('id')[:51], 'core_producto')
+        self.assertUsaIndice(
+            Producto.objects.filter(is_active=True).filter(filtro_bajo_stock()).order_by('id'), 'core_producto')
@@ -0,0 +1,89 @@
+"""Transferencias de stock entre ubicaciones.
+
+Una transferencia mueve unidades de una ubicación a otra sin cambiar el stock
+global de los productos: bloquea los productos una sola vez (en orden de id,
+como las demás rutas de escritura), valida el stock del origen y ajusta las
+dos filas de ``StockUbicacion`` y los totales por ubicación con
+``ubicaciones.mover``. Cada línea deja un ``Movimiento`` de tipo
+``Transferencia``, que no cuenta como entrada ni como salida.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+
+from .inventario import estado, tocar_revision
+from .models import Movimiento, Producto
+from .ubicaciones import mover, stocks
+
+
+class TransferenciaRechazada(Exception):
+    def __init__(self, mensaje, status=400, errores=None):
+        super().__init__(mensaje)
+        self.status = status
+        self.errores = errores or []
+
+
+def leer_items(items):
+    """``[{SKU, Cantidad}]`` a ``{sku: cantidad}``, sumando los SKU repetidos."""
+    if not isinstance(items, list) or not items:
+        raise TransferenciaRechazada("Envía una lista no vacía en 'items'.")
+    cantidades = defaultdict(int)
+    for numero, item in enumerate(items, start=1):
+        if not isinstance(item, dict) or not isinstance(item.get('SKU'), str):
+            raise TransferenciaRechazada(f'Línea {numero}: SKU debe ser un texto.')
+        cantidad = item.get('Cantidad')
+        if not isinstance(cantidad, int) or isinstance(cantidad, bool) or cantidad <= 0:
+            raise TransferenciaRechazada(f'Línea {numero}: Cantidad debe ser un entero positivo.')
+        cantidades[item['SKU']] += cantidad
+    return cantidades
+
+
+def transferir(usuario, origen, destino, cantidades):
+    """Mueve ``{sku: cantidad}`` de ``origen`` a ``destino`` (ids de ubicaciones activas).
+
+    Todo o nada: si falta algún producto o stock en el origen lanza
+    ``TransferenciaRechazada`` con el detalle por SKU.
+    """
+    if origen == destino:
+        raise TransferenciaRechazada('El origen y el destino deben ser distintos.')
+
+    with transaction.atomic():
+        productos = {
+            p.sku: p for p in Producto.objects.select_for_update().filter(
+                sku__in=cantidades, is_active=True).order_by('id')
+        }
+        faltantes = [sku for sku in cantidades if sku not in productos]
+        if faltantes:
+            raise TransferenciaRechazada('Producto no encontrado.', status=404,
+                                         errores=[{'SKU': sku} for sku in faltantes])
+
+        en_origen = stocks(productos.values(), origen)
+        en_destino = stocks(productos.values(), destino)
+        sin_stock = [
+            {'SKU': sku, 'stockDisponible': en_origen[p.id]}
+            for sku, p in productos.items() if en_origen[p.id] < cantidades[sku]
+        ]
+        if sin_stock:
+            raise TransferenciaRechazada('Stock insuficiente en el origen.', status=409, errores=sin_stock)
+
+        # El estado del producto no cambia: solo se reparte distinto entre ubicaciones
+        mover([
+            (p, estado(p), estado(p), {origen: -cantidades[sku], destino: cantidades[sku]})
+            for sku, p in productos.items()
+        ])
+        Movimiento.objects.bulk_create([
+            Movimiento(tipo='Transferencia', producto=p, cantidad=cantidades[sku], usuario=usuario,
+                       ubicacion_id=origen, ubicacion_destino_id=destino)
+            for sku, p in productos.items()
+        ])
+        tocar_revision()
+
+    return [
+        {
+            'SKU': sku,
+            'Cantidad': cantidades[sku],
+            'Stock_Origen': en_origen[p.id] - cantidades[sku],
+            'Stock_Destino': en_destino[p.id] + cantidades[sku],
+        }
+        for sku, p in productos.items()
+    ]
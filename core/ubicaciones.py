@@ -0,0 +1,349 @@
+"""Stock por ubicación (tiendas y almacenes).
+
+Cada producto tiene una fila de ``StockUbicacion`` por ubicación donde tiene o
+tuvo stock y la suma de sus filas es ``Producto.stock_actual``, que sigue
+siendo el total global con el que validan y cuentan las demás rutas. Un
+producto sin filas (anterior a las ubicaciones o escrito por una ruta que no
+pasa por ``registrar_cambios``) tiene todo su stock en la ubicación principal;
+su fila se crea con el primer cambio.
+
+``inventario.registrar_cambios`` llama a ``registrar_stock`` con la ubicación
+del cambio (la principal si la ruta no indica otra): la diferencia de stock se
+aplica a esa fila con un ``UPDATE`` que no la deja negativa y se suma a
+``ResumenUbicacion`` (stock y valor de los productos activos por ubicación,
+repartido en slots como ``ResumenInventario``). Así el dashboard y los
+listados leen los totales por ubicación sin sumar filas de stock.
+
+Las transferencias (core/transferencias.py) mueven stock entre filas sin
+cambiar el total.
+"""
+import random
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, DecimalField, Exists, F, IntegerField, Q, Sum, Value, When
+from django.db.models.functions import Coalesce
+
+from .models import Producto, ResumenUbicacion, StockUbicacion, Ubicacion
+from .slots import sumar_slots
+
+SLOTS_RESUMEN = 8
+NOMBRE_PRINCIPAL = 'Principal'
+
+
+class StockUbicacionInsuficiente(Exception):
+    status = 409
+
+    def __init__(self, producto, ubicacion_id, disponible):
+        super().__init__(f"Stock insuficiente para {producto.nombre} en la ubicación {ubicacion_id}: "
+                         f"disponibles {disponible}.")
+        self.producto = producto
+        self.disponible = disponible
+
+
+_principal = None
+
+
+def id_principal():
+    """Id de la ubicación principal; se consulta una vez por proceso.
+
+    No se puede borrar ni dejar de ser la principal (el admin y la API no lo
+    permiten), así que el id no cambia mientras el proceso vive.
+    """
+    global _principal
+    if _principal is None:
+        ubicacion_id = Ubicacion.objects.filter(es_principal=True).values_list('id', flat=True).first()
+        if ubicacion_id is None:
+            # La crea la migración; solo falta si se borró a mano. No se guarda:
+            # si la transacción se revierte, el id no existiría
+            return Ubicacion.objects.create(nombre=NOMBRE_PRINCIPAL, tipo='Almacen', es_principal=True).id
+        _principal = ubicacion_id
+    return _principal
+
+
+def leer_ubicacion(valor):
+    """Id de la ubicación activa indicada en la petición; sin valor, la principal."""
+    if valor in (None, ''):
+        return id_principal()
+    if isinstance(valor, bool):
+        raise ValueError("'ubicacion' debe ser el id de una ubicación.")
+    try:
+        ubicacion_id = int(valor)
+    except (TypeError, ValueError):
+        raise ValueError("'ubicacion' debe ser el id de una ubicación.")
+    if not Ubicacion.objects.filter(id=ubicacion_id, is_active=True).exists():
+        raise ValueError('Ubicación no encontrada o inactiva.')
+    return ubicacion_id
+
+
+def _filas(producto_ids):
+    """``{producto_id: {ubicacion_id: (id_fila, stock)}}``."""
+    filas = defaultdict(dict)
+    for fila_id, prod_id, ubicacion_id, stock in StockUbicacion.objects.filter(
+            producto_id__in=producto_ids).values_list('id', 'producto_id', 'ubicacion_id', 'stock'):
+        filas[prod_id][ubicacion_id] = (fila_id, stock)
+    return filas
+
+
+def stocks(productos, ubicacion_id, totales=None):
+    """``{producto_id: stock en la ubicación}`` de productos ya cargados.
+
+    ``totales`` (``{producto_id: stock}``) reemplaza a ``stock_actual`` como
+    stock global de los productos sin filas, p. ej. si ya se descontó algo
+    que aún no llega a las ubicaciones.
+    """
+    filas = dict(StockUbicacion.objects.filter(
+        producto__in=productos, ubicacion_id=ubicacion_id).values_list('producto_id', 'stock'))
+    principal = ubicacion_id == id_principal()
+    totales = totales or {}
+    # Sin fila en la principal el producto no tiene filas: todo su stock está ahí
+    return {
+        p.id: filas.get(p.id, totales.get(p.id, p.stock_actual) if principal else 0)
+        for p in productos
+    }
+
+
+def _contribucion(estado_producto, stock):
+    if estado_producto is None or not estado_producto.activo:
+        return 0, Decimal('0')
+    return stock, stock * estado_producto.costo
+
+
+def _por_fila(valores):
+    return Case(
+        *[When(id=fila_id, then=Value(valor)) for fila_id, valor in valores.items()],
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+
+
+def _escribir(productos, ajustes, nuevas):
+    """Suma ``{id_fila: delta}`` a las filas existentes y crea las filas ``nuevas``.
+
+    Ninguna fila baja de 0: si otra transacción se adelantó lanza
+    ``StockUbicacionInsuficiente``.
+    """
+    StockUbicacion.objects.bulk_create(nuevas)
+    ajustes = {fila_id: delta for fila_id, delta in ajustes.items() if delta}
+    if not ajustes:
+        return
+    necesario = {fila_id: -delta for fila_id, delta in ajustes.items() if delta < 0}
+    actualizadas = StockUbicacion.objects.filter(id__in=ajustes, stock__gte=_por_fila(necesario)).update(
+        stock=F('stock') + _por_fila(ajustes)
+    )
+    if actualizadas != len(ajustes):
+        prod_id, ubicacion_id, stock = StockUbicacion.objects.filter(
+            id__in=necesario, stock__lt=_por_fila(necesario)
+        ).values_list('producto_id', 'ubicacion_id', 'stock')[0]
+        raise StockUbicacionInsuficiente(productos[prod_id], ubicacion_id, stock)
+
+
+def aplicar_resumen(deltas):
+    """Suma ``{ubicacion_id: (stock, valor)}`` a un slot al azar de cada ubicación."""
+    slot = random.randrange(SLOTS_RESUMEN)
+    # En orden de ubicación para que dos escrituras no tomen los slots en orden cruzado
+    sumar_slots(ResumenUbicacion, ['ubicacion_id', 'slot'], [
+        {'ubicacion_id': ubicacion_id, 'slot': slot, 'total_stock': stock, 'valor_inventario': valor}
+        for ubicacion_id, (stock, valor) in sorted(deltas.items())
+        if stock or valor
+    ])
+
+
+def mover(cambios):
+    """Aplica movimientos de stock entre ubicaciones y sus totales.
+
+    ``cambios`` son tuplas ``(producto, anterior, nuevo, {ubicacion_id: delta})``
+    con los estados de ``inventario.estado`` antes y después (``None`` si el
+    producto no existía). Debe llamarse dentro de la transacción del cambio.
+    """
+    if not cambios:
+        return
+    principal = id_principal()
+    filas = _filas([producto.id for producto, _, _, _ in cambios])
+    ajustes = {}
+    nuevas = []
+    resumen = defaultdict(lambda: [0, Decimal('0')])
+    for producto, anterior, nuevo, deltas in cambios:
+        propias = {ubicacion_id: stock for ubicacion_id, (_, stock) in filas[producto.id].items()}
+        antes = dict(propias)
+        if principal not in antes:
+            antes[principal] = max((anterior.stock if anterior else 0) - sum(antes.values()), 0)
+        despues = dict(antes)
+        for ubicacion_id, delta in deltas.items():
+            despues[ubicacion_id] = despues.get(ubicacion_id, 0) + delta
+            if despues[ubicacion_id] < 0:
+                raise StockUbicacionInsuficiente(producto, ubicacion_id, antes.get(ubicacion_id, 0))
+
+        for ubicacion_id, stock in despues.items():
+            if ubicacion_id in propias:
+                ajustes[filas[producto.id][ubicacion_id][0]] = stock - propias[ubicacion_id]
+            else:
+                nuevas.append(StockUbicacion(producto=producto, ubicacion_id=ubicacion_id, stock=stock))
+            stock_antes, valor_antes = _contribucion(anterior, antes.get(ubicacion_id, 0))
+            stock_despues, valor_despues = _contribucion(nuevo, stock)
+            resumen[ubicacion_id][0] += stock_despues - stock_antes
+            resumen[ubicacion_id][1] += valor_despues - valor_antes
+
+    _escribir({producto.id: producto for producto, _, _, _ in cambios}, ajustes, nuevas)
+    aplicar_resumen(resumen)
+
+
+def registrar_stock(cambios, ubicacion_id=None):
+    """``cambios`` son ``(producto, anterior, nuevo)``: la diferencia de stock va a ``ubicacion_id``."""
+    ubicacion_id = ubicacion_id or id_principal()
+    mover([
+        (producto, anterior, nuevo, {ubicacion_id: nuevo.stock - (anterior.stock if anterior else 0)})
+        for producto, anterior, nuevo in cambios
+        # Los cambios de mínimo o de datos no mueven el stock ni el valor por ubicación
+        if producto is not None and (anterior is None or anterior._replace(minimo=0) != nuevo._replace(minimo=0))
+    ])
+
+
+def quitar_productos(productos):
+    """Descuenta de los totales por ubicación productos que se van a borrar físicamente."""
+    filas = _filas([p.id for p in productos])
+    resumen = defaultdict(lambda: [0, Decimal('0')])
+    principal = id_principal()
+    for producto in productos:
+        if not producto.is_active:
+            continue
+        propias = {ubicacion_id: stock for ubicacion_id, (_, stock) in filas[producto.id].items()} or {
+            principal: producto.stock_actual}
+        costo = Decimal(str(producto.costo))
+        for ubicacion_id, stock in propias.items():
+            resumen[ubicacion_id][0] -= stock
+            resumen[ubicacion_id][1] -= stock * costo
+    aplicar_resumen(resumen)
+
+
+def _filas_stock(filas):
+    return StockUbicacion.objects.filter(
+        producto_id__in=[fila['ID_Producto'] for fila in filas]
+    ).order_by('ubicacion_id').values_list('producto_id', 'ubicacion_id', 'stock')
+
+
+def _con_ubicaciones(filas, stocks_filas, principal):
+    por_producto = defaultdict(dict)
+    for prod_id, ubicacion_id, stock in stocks_filas:
+        # Llaves de texto: son llaves de un objeto JSON
+        por_producto[prod_id][str(ubicacion_id)] = stock
+    for fila in filas:
+        fila['Stock_Ubicaciones'] = por_producto.get(fila['ID_Producto']) or {str(principal): fila['Stock_Actual']}
+    return filas
+
+
+def agregar_stock_ubicaciones(filas):
+    """Agrega ``Stock_Ubicaciones`` (``{id_ubicacion: stock}``) a filas del catálogo, en una consulta."""
+    return _con_ubicaciones(filas, list(_filas_stock(filas)), id_principal())
+
+
+async def aagregar_stock_ubicaciones(filas):
+    principal = _principal or await Ubicacion.objects.filter(es_principal=True).values_list('id', flat=True).afirst()
+    return _con_ubicaciones(filas, [fila async for fila in _filas_stock(filas)], principal)
+
+
+def _totales():
+    return Ubicacion.objects.filter(is_active=True).order_by('id').annotate(
+        stock=Coalesce(Sum('resumenes__total_stock'), 0),
+        valor=Coalesce(Sum('resumenes__valor_inventario'), Value(Decimal('0')),
+                       output_field=DecimalField(max_digits=18, decimal_places=2)),
+    ).values('id', 'nombre', 'tipo', 'stock', 'valor')
+
+
+def _fila_total(ubicacion):
+    return {
+        'id': ubicacion['id'],
+        'nombre': ubicacion['nombre'],
+        'tipo': ubicacion['tipo'],
+        'stock': ubicacion['stock'],
+        'valor': ubicacion['valor'],
+    }
+
+
+def leer_stock_ubicaciones():
+    """Stock y valor de los productos activos en cada ubicación activa."""
+    return [_fila_total(ubicacion) for ubicacion in _totales()]
+
+
+async def aleer_stock_ubicaciones():
+    return [_fila_total(ubicacion) async for ubicacion in _totales()]
+
+
+def calcular_ubicaciones():
+    """``{ubicacion_id: (stock, valor)}`` de los productos activos recorriendo las filas."""
+    principal = id_principal()
+    totales = defaultdict(lambda: [0, Decimal('0')])
+    for ubicacion_id, stock, valor in StockUbicacion.objects.filter(producto__is_active=True).values(
+            'ubicacion_id').annotate(
+            total=Sum('stock'),
+            valor=Sum(F('stock') * F('producto__costo'), output_field=DecimalField())
+    ).values_list('ubicacion_id', 'total', 'valor'):
+        totales[ubicacion_id] = [stock or 0, valor or Decimal('0')]
+    # Los productos sin filas cuentan en la principal
+    sin_filas = Producto.objects.filter(is_active=True, stock_ubicaciones__isnull=True).aggregate(
+        stock=Sum('stock_actual'),
+        valor=Sum(F('stock_actual') * F('costo'), output_field=DecimalField()),
+    )
+    totales[principal][0] += sin_filas['stock'] or 0
+    totales[principal][1] += sin_filas['valor'] or Decimal('0')
+    return totales
+
+
+def reconstruir_ubicaciones():
+    """Cuadra las filas con ``stock_actual`` y recalcula ``ResumenUbicacion``.
+
+    La diferencia de un producto cuyas filas no suman su ``stock_actual`` (p. ej.
+    escrito con ``bulk_update`` fuera de ``registrar_cambios``) se lleva a la
+    ubicación principal; si no alcanza, se descuenta de las demás. Devuelve
+    cuántos productos se corrigieron.
+    """
+    with transaction.atomic():
+        principal = id_principal()
+        list(ResumenUbicacion.objects.select_for_update())
+        sumas = Producto.objects.filter(stock_ubicaciones__isnull=False).annotate(
+            suma=Sum('stock_ubicaciones__stock')
+        ).exclude(suma=F('stock_actual')).values_list('id', 'stock_actual', 'suma')
+        descuadrados = {prod_id: (stock, suma) for prod_id, stock, suma in sumas}
+        filas = _filas(descuadrados)
+        cambiadas = []
+        nuevas = []
+        for prod_id, (stock, suma) in descuadrados.items():
+            propias = filas[prod_id]
+            diferencia = stock - suma
+            orden = [principal] + [u for u in propias if u != principal]
+            for ubicacion_id in orden:
+                if not diferencia:
+                    break
+                fila_id, actual = propias.get(ubicacion_id, (None, 0))
+                nuevo = max(actual + diferencia, 0)
+                diferencia -= nuevo - actual
+                if fila_id is None:
+                    nuevas.append(StockUbicacion(producto_id=prod_id, ubicacion_id=ubicacion_id, stock=nuevo))
+                else:
+                    cambiadas.append(StockUbicacion(id=fila_id, stock=nuevo))
+        StockUbicacion.objects.bulk_create(nuevas)
+        StockUbicacion.objects.bulk_update(cambiadas, ['stock'])
+
+        totales = calcular_ubicaciones()
+        ResumenUbicacion.objects.all().delete()
+        ResumenUbicacion.objects.bulk_create([
+            ResumenUbicacion(ubicacion_id=ubicacion_id, slot=0, total_stock=stock, valor_inventario=valor)
+            for ubicacion_id, (stock, valor) in totales.items()
+        ])
+    return len(descuadrados)
+
+
+def filtro_ubicacion(valor):
+    """Movimientos de una ubicación, como origen o destino.
+
+    Los que no indican ubicación son de la principal. No consulta la base al
+    armarse, así que sirve también en las vistas async.
+    """
+    try:
+        ubicacion_id = int(valor)
+    except (TypeError, ValueError):
+        raise ValueError("'ubicacion' debe ser el id de una ubicación.")
+    es_principal = Exists(Ubicacion.objects.filter(id=ubicacion_id, es_principal=True))
+    return (Q(ubicacion_id=ubicacion_id) | Q(ubicacion_destino_id=ubicacion_id)
+            | (Q(ubicacion__isnull=True) & Q(es_principal)))
@@ -0,0 +1,345 @@
+"""Registro de ventas del POS, una a la vez o en lotes desde terminales sin conexión.
+
+``aplicar_ventas`` aplica varias ventas dentro de la transacción del llamador:
+bloquea de una vez todos los productos involucrados (en orden de id para no
+provocar deadlocks), valida el stock en memoria venta por venta y escribe todo
+con sentencias masivas. Una venta sin stock o con productos inexistentes se
+rechaza sin afectar a las demás.
+
+Las ventas pueden traer una ``clave_idempotencia`` generada por la terminal.
+Es única en la base, así que un reintento tras un timeout se reconoce con una
+búsqueda por índice y devuelve la venta original en lugar de descontar el stock
+otra vez. Si dos peticiones con la misma clave llegan a la vez, el índice único
+hace fallar a la segunda, que repite la búsqueda y la reporta como duplicada.
+
+Las ventas en línea no pueden tomar unidades reservadas por otros carritos
+(ver core/reservas.py); las de su propio carrito llegan ya descontadas.
+
+Cada venta descuenta de una ubicación (core/ubicaciones.py; por defecto la
+principal) y también debe caber en su stock ahí.
+"""
+import math
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from django.db import DatabaseError, IntegrityError, transaction
+from django.utils import timezone
+
+from .analitica import registrar_ventas as registrar_ventas_analitica
+from .folios import siguiente_folio
+from .inventario import estado, registrar_cambios
+from .models import DetalleVenta, Movimiento, Producto, Venta
+from .sincronizacion import guardar_stock
+from .ubicaciones import id_principal, stocks as stocks_ubicacion
+
+TAMANO_BLOQUE = 50
+MAX_VENTAS_LOTE = 1000
+LARGO_CLAVE = 64
+
+
+class VentaRechazada(Exception):
+    def __init__(self, mensaje, status=400):
+        super().__init__(mensaje)
+        self.status = status
+
+
+def leer_lineas(items):
+    """``[{id_producto, cantidad, precio}]`` del carrito -> líneas validadas.
+
+    Una línea inválida rechaza solo su venta: no debe llegar a los ``CHECK`` de
+    la base, que harían fallar todo el bloque de un lote.
+    """
+    if not items:
+        raise VentaRechazada('El carrito está vacío.')
+    lineas = []
+    for numero, item in enumerate(items, start=1):
+        try:
+            linea = {
+                'id': int(item.get('id_producto')),
+                'cantidad': int(item.get('cantidad')),
+                'precio': float(item.get('precio')),
+            }
+        except (AttributeError, TypeError, ValueError) as e:
+            raise VentaRechazada(f'Línea {numero}: {e}')
+        if linea['cantidad'] < 1:
+            raise VentaRechazada(f'Línea {numero}: la cantidad debe ser al menos 1.')
+        if not math.isfinite(linea['precio']) or linea['precio'] < 0:
+            raise VentaRechazada(f'Línea {numero}: el precio debe ser un número mayor o igual a 0.')
+        lineas.append(linea)
+    return lineas
+
+
+def leer_total(total):
+    try:
+        valor = Decimal(str(total))
+    except (InvalidOperation, ValueError):
+        valor = None
+    if valor is None or not valor.is_finite():
+        raise VentaRechazada('El total debe ser un número.')
+    return valor
+
+
+def leer_clave(clave):
+    if clave is None:
+        return None
+    if not isinstance(clave, str) or not 0 < len(clave) <= LARGO_CLAVE:
+        raise VentaRechazada(f'La clave de idempotencia debe ser un texto de 1 a {LARGO_CLAVE} caracteres.')
+    return clave
+
+
+def venta_por_clave(clave):
+    """La venta ya registrada con ``clave``, o ``None``."""
+    return Venta.objects.select_related('usuario').filter(clave_idempotencia=clave).first()
+
+
+def requerido_por_producto(lineas):
+    """Unidades por producto; un producto puede repetirse en el carrito."""
+    requerido = defaultdict(int)
+    for linea in lineas:
+        requerido[linea['id']] += linea['cantidad']
+    return requerido
+
+
+def aplicar_ventas(usuario, pedidos, respetar_reservas=True, ubicacion=None):
+    """Aplica ``pedidos`` (``{folio, total, lineas, clave}``) y devuelve un resultado por pedido.
+
+    Cada resultado es ``(venta, items_ticket)`` o una ``VentaRechazada``. Debe
+    llamarse dentro de una transacción; el folio se reserva antes de abrirla.
+
+    Un pedido puede traer ``cubierto`` (``{producto_id: unidades}``) con lo que
+    ``reservas.consumir`` ya descontó del stock: esos productos no se bloquean
+    si la venta no necesita más de ellos. Con ``respetar_reservas`` lo que
+    falta se valida contra lo disponible (stock menos reservas de otros
+    carritos); las ventas sin conexión ya ocurrieron y solo miran el stock.
+    """
+    ubicacion = ubicacion or id_principal()
+    faltante = defaultdict(int)
+    cubierto_total = defaultdict(int)
+    for pedido in pedidos:
+        cubierto = pedido.get('cubierto', {})
+        for prod_id, cantidad in requerido_por_producto(pedido['lineas']).items():
+            faltante[prod_id] += cantidad - cubierto.get(prod_id, 0)
+        for prod_id, cantidad in cubierto.items():
+            cubierto_total[prod_id] += cantidad
+
+    bloquear = sorted(prod_id for prod_id, cantidad in faltante.items() if cantidad > 0)
+    productos = {p.id: p for p in Producto.objects.select_for_update().filter(id__in=bloquear).order_by('id')}
+    productos.update(Producto.objects.in_bulk([i for i in faltante if i not in productos]))
+    # Estado anterior a la venta, incluido lo que ya descontó consumir()
+    antes = {
+        prod_id: estado(p)._replace(stock=p.stock_actual + cubierto_total[prod_id])
+        for prod_id, p in productos.items()
+    }
+
+    def disponible(producto):
+        if respetar_reservas:
+            return producto.stock_actual - producto.stock_reservado
+        return producto.stock_actual
+
+    # Lo que hay en la ubicación, incluido lo reservado (las reservas son globales) y lo
+    # que consumir() ya descontó de stock_actual pero aún no de la ubicación
+    en_ubicacion = stocks_ubicacion(productos.values(), ubicacion,
+                                    {prod_id: estado_anterior.stock for prod_id, estado_anterior in antes.items()})
+
+    resultados = []
+    aplicados = []
+    for pedido in pedidos:
+        cubierto = pedido.get('cubierto', {})
+        requerido = requerido_por_producto(pedido['lineas'])
+        if any(prod_id not in productos for prod_id in requerido):
+            resultados.append(VentaRechazada('Uno de los productos no existe.', status=404))
+            continue
+        restante = {i: c - cubierto.get(i, 0) for i, c in requerido.items() if c > cubierto.get(i, 0)}
+        sin_stock = next((productos[i] for i, c in restante.items() if disponible(productos[i]) < c), None)
+        if sin_stock is None:
+            sin_stock = next((productos[i] for i, c in requerido.items() if en_ubicacion[i] < c), None)
+        if sin_stock is not None:
+            resultados.append(VentaRechazada(f"Stock insuficiente para {sin_stock.nombre}"))
+            continue
+        for prod_id, cantidad in restante.items():
+            productos[prod_id].stock_actual -= cantidad
+        for prod_id, cantidad in requerido.items():
+            en_ubicacion[prod_id] -= cantidad
+
+        venta = Venta(folio=pedido['folio'], total=pedido['total'], usuario=usuario,
+                      clave_idempotencia=pedido.get('clave'))
+        items_ticket = []
+        aplicados.append((venta, pedido['lineas'], items_ticket))
+        resultados.append((venta, items_ticket))
+
+    if not aplicados:
+        return resultados
+
+    tocados = sorted({linea['id'] for _, lineas, _ in aplicados for linea in lineas})
+    # Los productos cubiertos por completo con reservas ya se descontaron (y versionaron) en la base
+    guardar_stock([productos[i] for i in tocados if i in bloquear])
+    Venta.objects.bulk_create([venta for venta, _, _ in aplicados])
+
+    detalles = []
+    movimientos = []
+    for venta, lineas, items_ticket in aplicados:
+        for linea in lineas:
+            producto = productos[linea['id']]
+            subtotal = linea['precio'] * linea['cantidad']
+            detalles.append(DetalleVenta(
+                venta=venta, producto=producto, cantidad=linea['cantidad'],
+                precio_unitario=linea['precio'], subtotal=subtotal
+            ))
+            movimientos.append(Movimiento(tipo='Salida', producto=producto, cantidad=linea['cantidad'],
+                                          usuario=usuario, ubicacion_id=ubicacion))
+            items_ticket.append({
+                "producto": producto.nombre,
+                "cantidad": linea['cantidad'],
+                "precio_unit": linea['precio'],
+                "subtotal": subtotal
+            })
+
+    DetalleVenta.objects.bulk_create(detalles)
+    Movimiento.objects.bulk_create(movimientos)
+    registrar_ventas_analitica([venta for venta, _, _ in aplicados], detalles)
+    registrar_cambios([(productos[i], antes[i]) for i in tocados], salidas=len(movimientos), ubicacion=ubicacion,
+                      versionados=True)
+    return resultados
+
+
+def ticket(venta, items, usuario):
+    return {
+        'folio': venta.folio,
+        'fecha': datetime.now().strftime("%d/%m/%Y %H:%M"),
+        'cajero': usuario.email,
+        'items': items,
+        'total': venta.total
+    }
+
+
+def ticket_registrado(venta):
+    """Ticket de una venta ya guardada, para responder a un reintento."""
+    items = [
+        {
+            "producto": d.producto.nombre,
+            "cantidad": d.cantidad,
+            "precio_unit": float(d.precio_unitario),
+            "subtotal": float(d.subtotal)
+        }
+        for d in venta.detalles.select_related('producto').order_by('id')
+    ]
+    return {
+        'folio': venta.folio,
+        'fecha': timezone.localtime(venta.fecha).strftime("%d/%m/%Y %H:%M"),
+        'cajero': venta.usuario.email if venta.usuario else None,
+        'items': items,
+        'total': venta.total
+    }
+
+
+# --- LOTES DE VENTAS SIN CONEXIÓN ---
+class LoteVentas:
+    """Ventas encoladas por una terminal, en bloques de una transacción cada uno.
+
+    Devuelve un resultado por venta, en el orden recibido, con ``estado``:
+    ``registrada``, ``duplicada`` (la clave ya existía; trae el folio original),
+    ``rechazada`` (datos inválidos, producto inexistente o sin stock; no debe
+    reintentarse tal cual) o ``error`` (falla de la base; puede reintentarse).
+    """
+
+    def __init__(self, usuario, caja=None, tamano_bloque=TAMANO_BLOQUE, ubicacion=None):
+        self.usuario = usuario
+        self.caja = caja
+        self.ubicacion = ubicacion
+        self.tamano_bloque = max(tamano_bloque, 1)
+        self.resultados = []
+
+    def ejecutar(self, ventas):
+        pendientes = []
+        primeras = {}
+        for indice, datos in enumerate(ventas):
+            resultado = {'indice': indice}
+            self.resultados.append(resultado)
+            try:
+                if not isinstance(datos, dict):
+                    raise VentaRechazada('Cada venta debe ser un objeto.')
+                resultado['clave'] = datos.get('clave_idempotencia')
+                clave = leer_clave(resultado['clave'])
+                if clave is None:
+                    raise VentaRechazada("Falta 'clave_idempotencia'.")
+                lineas = leer_lineas(datos.get('items', []))
+                total = leer_total(datos.get('total'))
+            except VentaRechazada as e:
+                resultado.update(estado='rechazada', error=str(e))
+                continue
+            if clave in primeras:
+                # La misma venta dos veces en el lote: se resuelve con la primera
+                resultado['repite'] = primeras[clave]
+                continue
+            primeras[clave] = indice
+            pendientes.append((resultado, {'clave': clave, 'total': total, 'lineas': lineas}))
+
+        for inicio in range(0, len(pendientes), self.tamano_bloque):
+            self._bloque(pendientes[inicio:inicio + self.tamano_bloque])
+
+        for resultado in self.resultados:
+            if 'repite' in resultado:
+                primera = self.resultados[resultado.pop('repite')]
+                if primera['estado'] in ('registrada', 'duplicada'):
+                    resultado.update(estado='duplicada', folio=primera['folio'])
+                else:
+                    resultado.update(estado=primera['estado'], error=primera['error'])
+        return self.reporte()
+
+    def _duplicadas(self, bloque):
+        claves = [pedido['clave'] for _, pedido in bloque]
+        existentes = dict(
+            Venta.objects.filter(clave_idempotencia__in=claves).values_list('clave_idempotencia', 'folio')
+        )
+        nuevos = []
+        for resultado, pedido in bloque:
+            if pedido['clave'] in existentes:
+                resultado.update(estado='duplicada', folio=existentes[pedido['clave']])
+            else:
+                nuevos.append((resultado, pedido))
+        return nuevos
+
+    def _bloque(self, bloque):
+        bloque = self._duplicadas(bloque)
+        try:
+            # Folios antes de la transacción (ver core/folios.py); uno rechazado deja un hueco
+            for _, pedido in bloque:
+                pedido['folio'] = siguiente_folio(self.caja)
+        except ValueError as e:
+            for resultado, _ in bloque:
+                resultado.update(estado='rechazada', error=str(e))
+            return
+
+        for intento in range(2):
+            try:
+                with transaction.atomic():
+                    aplicadas = aplicar_ventas(self.usuario, [pedido for _, pedido in bloque],
+                                               respetar_reservas=False, ubicacion=self.ubicacion)
+                break
+            except DatabaseError as e:
+                # Con IntegrityError otra petición registró a la vez alguna de estas claves
+                if isinstance(e, IntegrityError) and not intento:
+                    bloque = self._duplicadas(bloque)
+                    continue
+                for resultado, _ in bloque:
+                    resultado.update(estado='error', error=f"Error al guardar el bloque: {e}")
+                return
+
+        for (resultado, _), aplicada in zip(bloque, aplicadas):
+            if isinstance(aplicada, VentaRechazada):
+                resultado.update(estado='rechazada', error=str(aplicada))
+            else:
+                resultado.update(estado='registrada', folio=aplicada[0].folio)
+
+    def reporte(self):
+        conteo = defaultdict(int)
+        for resultado in self.resultados:
+            conteo[resultado['estado']] += 1
+        return {
+            'registradas': conteo['registrada'],
+            'duplicadas': conteo['duplicada'],
+            'rechazadas': conteo['rechazada'],
+            'errores': conteo['error'],
+            'resultados': self.resultados,
+        }
@@ -0,0 +1,69 @@
+"""Versiones para consultas incrementales del tipo "lo que cambió desde v".
+
+Cada escritura marca sus filas con ``version_transaccion()`` y el lector
+devuelve, junto con los cambios, una ``marca_segura()`` para la siguiente
+consulta. La dificultad es que una transacción puede tomar su versión y
+confirmar después que otra con versión mayor: si el cliente avanzara hasta la
+versión más alta que vio, perdería la fila que confirma tarde.
+
+- PostgreSQL (13+): la versión es el id de la transacción que escribe y la marca
+  segura es el ``xmin`` de la foto actual, el menor id de transacción todavía
+  en curso. Todo lo que tenga una versión menor ya terminó, así que pedir
+  ``version >= marca`` la próxima vez no pierde nada; lo que se confirme en
+  medio puede llegar dos veces, por lo que el cliente debe aplicar los cambios
+  de forma idempotente. No hay contador compartido ni candados.
+- SQLite: solo hay un escritor a la vez, así que un contador en
+  ``ContadorVersion`` avanza en el mismo orden en que se confirma.
+
+Las rutas de stock no piden la versión aparte: ``expresion_version()`` va
+dentro del ``UPDATE`` que ya escribe la fila. En PostgreSQL es
+``pg_current_xact_id()`` en la misma sentencia; en SQLite el contador avanza y
+se lee en un solo ``UPDATE ... RETURNING``.
+"""
+from django.db import connection
+from django.db.models import Value
+from django.db.models.expressions import RawSQL
+
+from .models import ContadorVersion
+
+
+def _valor_postgres(sql):
+    with connection.cursor() as cursor:
+        cursor.execute(sql)
+        return int(cursor.fetchone()[0])
+
+
+def version_transaccion(nombre):
+    """Versión para las filas que escribe la transacción actual."""
+    if connection.vendor == 'postgresql':
+        return _valor_postgres('SELECT pg_current_xact_id()::text::bigint')
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"UPDATE {connection.ops.quote_name(ContadorVersion._meta.db_table)} "
+            "SET valor = valor + 1 WHERE nombre = %s RETURNING valor",
+            [nombre],
+        )
+        fila = cursor.fetchone()
+    if fila is None:
+        return ContadorVersion.objects.create(nombre=nombre, valor=1).valor
+    return fila[0]
+
+
+def expresion_version(nombre):
+    """Versión de la transacción actual como expresión para ``update()``."""
+    if connection.vendor == 'postgresql':
+        return RawSQL('pg_current_xact_id()::text::bigint', ())
+    return Value(version_transaccion(nombre))
+
+
+def marca_segura(nombre):
+    """Versión desde la que debe pedirse la siguiente consulta.
+
+    Se lee antes de consultar los cambios.
+    """
+    if connection.vendor == 'postgresql':
+        return _valor_postgres('SELECT pg_snapshot_xmin(pg_current_snapshot())::text::bigint')
+
+    valor = ContadorVersion.objects.filter(nombre=nombre).values_list('valor', flat=True).first()
+    return (valor or 0) + 1
@@ -2,15 +2,19 @@ from rest_framework import viewsets, status, permissions
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework_simplejwt.views import TokenObtainPairView
 from django.db.models import Sum, F
-from django.db import transaction
-import time
-from datetime import datetime # Importante para la fecha del ticket
-from django.db.models import Sum, F, Q
+from django.db import IntegrityError, transaction
+import io
+from django.db.models import Sum, F, Prefetch, Q
+from django.db.models.functions import TruncMonth, TruncWeek
 
 # Importamos los modelos
-from .models import Categoria, Usuario, Producto, Movimiento, Venta, DetalleVenta
+from .models import (
+    Categoria, Usuario, Producto, Movimiento, Venta, DetalleVenta, CierreStock,
+    VentaDiariaCajero, VentaDiariaProducto, Reserva, StockUbicacion, Ubicacion
+)
 # Importamos los serializadores
 from .serializers import (
     CategoriaSerializer,
@@ -18,7 +22,36 @@ from .serializers import (
     ProductoSerializer, 
     MovimientoSerializer, 
     MyTokenObtainPairSerializer,
-    VentaSerializer
+    VentaSerializer,
+    CierreStockSerializer,
+    UbicacionSerializer
+)
+from .folios import prefijo_para, siguiente_folio
+from .importacion import TAMANO_LOTE, Importacion, detectar_formato
+from .inventario import estado, leer_resumen, registrar_ajustes, registrar_cambios, tocar_revision
+from .alertas import listar_alertas
+from .autenticacion import invalidar_usuario
+from .busqueda import buscar_productos
+from .catalogo import (
+    CAMPOS as CAMPOS_CATALOGO, con_ubicaciones, fila_producto, filas_productos, filtrar_catalogo,
+    invalidar_catalogo, resolver_skus
+)
+from .cierres import cerrar_periodo, stock_en_fecha
+from .exportacion import respuesta_exportacion
+from .filtros import filtrar_movimientos, filtrar_rango_fechas, parsear_fecha
+from .instrumentacion import estadisticas as estadisticas_rendimiento
+from .paginacion import leer_limite, paginar_keyset
+from .reservas import ReservaRechazada, consumir, leer_carrito, liberar_carrito, reservar
+from .respuestas import RespuestaCondicionalMixin
+from .sincronizacion import cambios_desde, guardar_stock, marcar_categoria, registrar_bajas
+from .transferencias import TransferenciaRechazada, leer_items as leer_items_transferencia, transferir
+from .ubicaciones import (
+    StockUbicacionInsuficiente, agregar_stock_ubicaciones, id_principal, leer_stock_ubicaciones, leer_ubicacion,
+    stocks as stocks_ubicacion
+)
+from .ventas import (
+    MAX_VENTAS_LOTE, TAMANO_BLOQUE as TAMANO_BLOQUE_VENTAS, LoteVentas, VentaRechazada, aplicar_ventas, leer_clave,
+    leer_lineas, requerido_por_producto, ticket, ticket_registrado, venta_por_clave
 )
 
 # --- PERMISOS ---
@@ -55,7 +88,22 @@ class UsuarioViewSet(viewsets.ModelViewSet):
             return [permissions.IsAuthenticated(), IsSuperadmin()]
         return [permissions.IsAuthenticated()]
 
-class CategoriaViewSet(viewsets.ModelViewSet):
+    # Cambios de rol o bajas deben verse en la siguiente petición del usuario;
+    # el email aparece en ventas y movimientos, así que también cambia la revisión
+    @transaction.atomic
+    def perform_update(self, serializer):
+        usuario = serializer.save()
+        tocar_revision()
+        invalidar_usuario(usuario.id)
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        usuario_id = instance.id
+        super().perform_destroy(instance)
+        tocar_revision()
+        invalidar_usuario(usuario_id)
+
+class CategoriaViewSet(RespuestaCondicionalMixin, viewsets.ModelViewSet):
     queryset = Categoria.objects.all()
     serializer_class = CategoriaSerializer
     
@@ -63,37 +111,96 @@ class CategoriaViewSet(viewsets.ModelViewSet):
         if self.action in ['create', 'update', 'destroy']:
             return [permissions.IsAuthenticated(), IsSuperadmin()]
         return [permissions.IsAuthenticated()]
+
+    @transaction.atomic
+    def perform_create(self, serializer):
+        marcar_categoria(serializer.save())
+        tocar_revision()
+        invalidar_catalogo()
+
+    @transaction.atomic
+    def perform_update(self, serializer):
+        marcar_categoria(serializer.save())
+        tocar_revision()
+        invalidar_catalogo()
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        # Los productos quedan sin categoría (SET_NULL)
+        registrar_bajas('Categoria', [instance.id])
+        super().perform_destroy(instance)
+        tocar_revision()
+        invalidar_catalogo()
+
 # --- PRODUCTOS ---
-class ProductoViewSet(viewsets.ModelViewSet):
-    queryset = Producto.objects.filter(is_active=True)
+class ProductoViewSet(RespuestaCondicionalMixin, viewsets.ModelViewSet):
+    queryset = Producto.objects.filter(is_active=True).select_related('categoria')
     serializer_class = ProductoSerializer
     lookup_field = 'sku'
     
     def get_permissions(self):
-        if self.action == 'destroy':
+        if self.action in ['destroy', 'importar']:
             return [permissions.IsAuthenticated(), IsSuperadmin()]
         return [permissions.IsAuthenticated()]
 
+    def list(self, request, *args, **kwargs):
+        # Ruta rápida: filas armadas desde un values() con la categoría unida
+        params = request.query_params
+        try:
+            queryset = filtrar_catalogo(params)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=400)
+
+        if 'cursor' in params or 'limite' in params:
+            try:
+                productos, siguiente = paginar_keyset(
+                    queryset.values(*CAMPOS_CATALOGO), ('id',), params.get('cursor'), leer_limite(params)
+                )
+            except ValueError as e:
+                return Response({'error': str(e)}, status=400)
+            filas = [fila_producto(p) for p in productos]
+            if con_ubicaciones(params):
+                agregar_stock_ubicaciones(filas)
+            return Response({
+                'resultados': filas,
+                'siguienteCursor': siguiente
+            })
+
+        filas = filas_productos(queryset.order_by('id'))
+        if con_ubicaciones(params):
+            # Una consulta para las filas de stock de toda la lista
+            agregar_stock_ubicaciones(filas)
+        return Response(filas)
+
     def create(self, request, *args, **kwargs):
         sku = request.data.get('SKU')
         producto_inactivo = Producto.objects.filter(sku=sku, is_active=False).first()
 
         if producto_inactivo:
+            antes = estado(producto_inactivo)
             producto_inactivo.is_active = True
             serializer = self.get_serializer(producto_inactivo, data=request.data, partial=True)
             serializer.is_valid(raise_exception=True)
-            self.perform_update(serializer)
 
-            Movimiento.objects.create(
-                tipo='Creacion',
-                producto=producto_inactivo,
-                cantidad=producto_inactivo.stock_actual,
-                usuario=request.user
-            )
+            try:
+                with transaction.atomic():
+                    serializer.save()
+                    Movimiento.objects.create(
+                        tipo='Creacion',
+                        producto=producto_inactivo,
+                        cantidad=producto_inactivo.stock_actual,
+                        usuario=request.user
+                    )
+                    registrar_ajustes([(producto_inactivo, antes)], request.user)
+                    registrar_cambios([(producto_inactivo, antes)])
+                    invalidar_catalogo()
+            except StockUbicacionInsuficiente as e:
+                return Response({'error': str(e)}, status=e.status)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
 
         return super().create(request, *args, **kwargs)
 
+    @transaction.atomic
     def perform_create(self, serializer):
         producto_nuevo = serializer.save()
         Movimiento.objects.create(
@@ -102,8 +209,24 @@ class ProductoViewSet(viewsets.ModelViewSet):
             cantidad=producto_nuevo.stock_actual,
             usuario=self.request.user
         )
+        registrar_cambios([(producto_nuevo, None)])
+        invalidar_catalogo()
+
+    @transaction.atomic
+    def perform_update(self, serializer):
+        antes = estado(serializer.instance)
+        producto = serializer.save()
+        registrar_ajustes([(producto, antes)], self.request.user)
+        # Un stock fijado a mano ajusta la ubicación principal; no puede quitarle más de lo que tiene
+        try:
+            registrar_cambios([(producto, antes)])
+        except StockUbicacionInsuficiente as e:
+            raise ValidationError({'Stock_Actual': str(e)})
+        invalidar_catalogo()
 
+    @transaction.atomic
     def perform_destroy(self, instance):
+        antes = estado(instance)
         instance.is_active = False
         instance.save()
         Movimiento.objects.create(
@@ -112,20 +235,137 @@ class ProductoViewSet(viewsets.ModelViewSet):
             cantidad=instance.stock_actual,
             usuario=self.request.user
         )
+        registrar_cambios([(instance, antes)])
+        invalidar_catalogo()
+
+    @action(detail=False, methods=['get'])
+    def buscar(self, request):
+        """Búsqueda por SKU o nombre (parcial) para autocompletar en el POS."""
+        params = request.query_params
+        texto = params.get('q', '').strip()
+        if not texto:
+            return Response({'error': "El parámetro 'q' es obligatorio."}, status=400)
+        try:
+            limite = leer_limite(params, default=20, maximo=100)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=400)
+        categoria = params.get('categoria')
+        if categoria and not categoria.isdigit():
+            return Response({'error': 'La categoría debe ser un id numérico.'}, status=400)
+
+        ids = buscar_productos(texto, limite, int(categoria) if categoria else None)
+        filas = {f['ID_Producto']: f for f in filas_productos(Producto.objects.filter(id__in=ids))}
+        return Response({'resultados': [filas[i] for i in ids if i in filas]})
+
+    @action(detail=False, methods=['post'])
+    def resolver(self, request):
+        """Resuelve muchos SKU escaneados en una sola petición."""
+        skus = request.data.get('skus', [])
+        if not isinstance(skus, list) or not skus:
+            return Response({'error': "Envía una lista no vacía en 'skus'."}, status=400)
+        if len(skus) > 500:
+            return Response({'error': 'Máximo 500 SKU por petición.'}, status=400)
+
+        skus = list(dict.fromkeys(str(sku) for sku in skus))
+        encontrados = resolver_skus(skus)
+
+        productos, inactivos, no_encontrados = [], [], []
+        for sku in skus:
+            if sku not in encontrados:
+                no_encontrados.append(sku)
+                continue
+            fila, activo = encontrados[sku]
+            if activo:
+                productos.append(fila)
+            else:
+                inactivos.append(sku)
+
+        return Response({
+            'productos': productos,
+            'inactivos': inactivos,
+            'noEncontrados': no_encontrados
+        })
+
+    @action(detail=False, methods=['get'])
+    def sincronizar(self, request):
+        """Catálogo para el POS: completo, o con ``desde=<version>`` solo lo que cambió."""
+        desde = request.query_params.get('desde')
+        if desde is not None:
+            try:
+                desde = int(desde)
+            except ValueError:
+                return Response({'error': "El parámetro 'desde' debe ser un número entero."}, status=400)
+        return Response(cambios_desde(desde))
+
+    @action(detail=False, methods=['post'])
+    def importar(self, request):
+        """Carga masiva de catálogo (CSV o NDJSON) con alta, actualización o reactivación por SKU."""
+        archivo = request.FILES.get('archivo')
+        if archivo is None:
+            return Response({'error': "Adjunta el archivo en el campo 'archivo'."}, status=400)
+
+        formato = detectar_formato(archivo.name, request.data.get('formato'))
+        try:
+            lote = int(request.data.get('lote', TAMANO_LOTE))
+            texto = io.TextIOWrapper(archivo.file, encoding='utf-8-sig', newline='')
+            reporte = Importacion(request.user, tamano_lote=max(lote, 1)).ejecutar(texto, formato)
+        except (ValueError, UnicodeDecodeError) as e:
+            return Response({'error': str(e)}, status=400)
+
+        return Response(reporte)
 
 # --- MOVIMIENTOS ---
-class MovimientoViewSet(viewsets.ViewSet):
+class MovimientoViewSet(RespuestaCondicionalMixin, viewsets.ViewSet):
     permission_classes = [permissions.IsAuthenticated]
 
+    def _filtrar(self, request, queryset):
+        return filtrar_movimientos(queryset, request.query_params, request.user)
+
     def list(self, request):
-        user = request.user
-        if user.role == 'Superadmin':
-            queryset = Movimiento.objects.all().order_by('-fecha')
-        else:
-            queryset = Movimiento.objects.filter(usuario=user).order_by('-fecha')
-        serializer = MovimientoSerializer(queryset, many=True)
+        params = request.query_params
+        try:
+            queryset = self._filtrar(request, Movimiento.objects.select_related('producto', 'usuario'))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=400)
+
+        # Modo paginado por llave (fecha, id): cada página cuesta lo mismo
+        if 'cursor' in params or 'limite' in params:
+            try:
+                limite = leer_limite(params)
+                movimientos, siguiente = paginar_keyset(
+                    queryset, ('-fecha', '-id'), params.get('cursor'), limite
+                )
+            except ValueError as e:
+                return Response({'error': str(e)}, status=400)
+
+            return Response({
+                'resultados': MovimientoSerializer(movimientos, many=True).data,
+                'siguienteCursor': siguiente
+            })
+
+        serializer = MovimientoSerializer(queryset.order_by('-fecha', '-id'), many=True)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['get'])
+    def exportar(self, request):
+        encabezados = [
+            'id', 'fecha', 'tipo', 'SKU', 'Nombre_Producto', 'Cantidad', 'Email_Usuario', 'Ubicacion',
+            'Ubicacion_Destino'
+        ]
+        try:
+            queryset = self._filtrar(request, Movimiento.objects.all()).order_by('fecha', 'id')
+            return respuesta_exportacion(
+                'movimientos',
+                encabezados,
+                queryset.values_list(
+                    'id', 'fecha', 'tipo', 'producto__sku', 'producto__nombre', 'cantidad', 'usuario__email',
+                    'ubicacion__nombre', 'ubicacion_destino__nombre'
+                ),
+                request.query_params.get('formato', 'csv')
+            )
+        except ValueError as e:
+            return Response({'error': str(e)}, status=400)
+
     @action(detail=False, methods=['post'])
     def entrada(self, request):
         return self._registrar_movimiento(request, 'Entrada')
@@ -134,31 +374,176 @@ class MovimientoViewSet(viewsets.ViewSet):
     def salida(self, request):
         return self._registrar_movimiento(request, 'Salida')
 
+    @action(detail=False, methods=['post'])
+    def transferencia(self, request):
+        """Mueve líneas {SKU, Cantidad} de la ubicación ``origen`` (por defecto la principal) a ``destino``."""
+        destino = request.data.get('destino')
+        if destino in (None, ''):
+            return Response({'error': "Indica la ubicación 'destino'."}, status=400)
+        try:
+            origen = leer_ubicacion(request.data.get('origen'))
+            destino = leer_ubicacion(destino)
+            cantidades = leer_items_transferencia(request.data.get('items'))
+            productos = transferir(request.user, origen, destino, cantidades)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=400)
+        except TransferenciaRechazada as e:
+            return Response({'error': str(e), 'errores': e.errores}, status=e.status)
+        return Response({
+            'message': f'{len(productos)} productos transferidos.',
+            'origen': origen,
+            'destino': destino,
+            'productos': productos
+        }, status=201)
+
+    @action(detail=False, methods=['post'])
+    def lote(self, request):
+        """Aplica muchas líneas {SKU, Cantidad} de un mismo tipo en una sola transacción.
+
+        Con ``atomico`` (por defecto) cualquier línea inválida cancela todo el lote;
+        sin él se aplican las líneas válidas y se reportan las demás. Todas las
+        líneas son de la misma ``ubicacion`` (por defecto la principal).
+        """
+        tipo = request.data.get('tipo')
+        items = request.data.get('items', [])
+        atomico = request.data.get('atomico', True) not in (False, 'false', 'False', 0, '0')
+
+        if tipo not in ('Entrada', 'Salida'):
+            return Response({'error': "El tipo debe ser 'Entrada' o 'Salida'."}, status=400)
+        if not isinstance(items, list) or not items:
+            return Response({'error': 'El lote está vacío.'}, status=400)
+        try:
+            ubicacion = leer_ubicacion(request.data.get('ubicacion'))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=400)
+
+        lineas = []
+        errores = []
+        for numero, item in enumerate(items, start=1):
+            if not isinstance(item, dict):
+                errores.append({'linea': numero, 'SKU': None, 'error': 'Cada línea debe ser un objeto.'})
+                continue
+            sku = item.get('SKU')
+            if not isinstance(sku, str):
+                errores.append({'linea': numero, 'SKU': None, 'error': 'SKU debe ser un texto.'})
+                continue
+            try:
+                cantidad = int(item.get('Cantidad', 0))
+            except (TypeError, ValueError):
+                cantidad = 0
+            if cantidad <= 0:
+                errores.append({'linea': numero, 'SKU': sku, 'error': 'Cantidad debe ser positiva.'})
+                continue
+            lineas.append((numero, sku, cantidad))
+
+        if errores and atomico:
+            return Response({'error': 'El lote contiene líneas inválidas.', 'errores': errores}, status=400)
+
+        with transaction.atomic():
+            # Un solo SELECT ... FOR UPDATE, en orden de id para evitar deadlocks
+            skus = {sku for _, sku, _ in lineas}
+            productos = {
+                p.sku: p for p in Producto.objects.select_for_update().filter(sku__in=skus).order_by('id')
+            }
+            antes = {sku: estado(p) for sku, p in productos.items()}
+            en_ubicacion = stocks_ubicacion(productos.values(), ubicacion)
+
+            movimientos = []
+            tocados = {}
+            for numero, sku, cantidad in lineas:
+                producto = productos.get(sku)
+                if producto is None:
+                    errores.append({'linea': numero, 'SKU': sku, 'error': 'Producto no encontrado.'})
+                    continue
+                if tipo == 'Salida':
+                    if en_ubicacion[producto.id] < cantidad:
+                        errores.append({
+                            'linea': numero, 'SKU': sku, 'error': 'Stock insuficiente.',
+                            'stockDisponible': en_ubicacion[producto.id]
+                        })
+                        continue
+                    producto.stock_actual -= cantidad
+                    en_ubicacion[producto.id] -= cantidad
+                else:
+                    producto.stock_actual += cantidad
+                    en_ubicacion[producto.id] += cantidad
+
+                tocados[sku] = producto
+                movimientos.append(Movimiento(
+                    tipo=tipo, producto=producto, cantidad=cantidad, usuario=request.user, ubicacion_id=ubicacion
+                ))
+
+            errores.sort(key=lambda e: e['linea'])
+            if errores and (atomico or not movimientos):
+                # Nada se ha escrito todavía: basta con no aplicar el lote
+                return Response({'error': 'No se aplicó el lote.', 'errores': errores}, status=400)
+
+            guardar_stock(list(tocados.values()))
+            Movimiento.objects.bulk_create(movimientos)
+            registrar_cambios(
+                [(p, antes[sku]) for sku, p in tocados.items()],
+                entradas=len(movimientos) if tipo == 'Entrada' else 0,
+                salidas=len(movimientos) if tipo == 'Salida' else 0,
+                ubicacion=ubicacion,
+                versionados=True
+            )
+
+        return Response({
+            'message': f'{len(movimientos)} líneas de {tipo} registradas.',
+            'aplicadas': len(movimientos),
+            'errores': errores,
+            'ubicacion': ubicacion,
+            'productos': [
+                {
+                    'SKU': p.sku,
+                    'Stock_Actual': p.stock_actual,
+                    'Stock_Ubicacion': en_ubicacion[p.id],
+                    'bajoStock': p.nivel_minimo_stock > 0 and p.stock_actual <= p.nivel_minimo_stock
+                }
+                for p in tocados.values()
+            ]
+        }, status=207 if errores else 201)
+
     def _registrar_movimiento(self, request, tipo):
         sku = request.data.get('SKU')
         cantidad = int(request.data.get('Cantidad', 0))
         
         if cantidad <= 0:
             return Response({'error': 'Cantidad debe ser positiva.'}, status=400)
+        try:
+            ubicacion = leer_ubicacion(request.data.get('ubicacion'))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=400)
 
         try:
             with transaction.atomic():
                 producto = Producto.objects.select_for_update().get(sku=sku)
-                
+                antes = estado(producto)
+                en_ubicacion = stocks_ubicacion([producto], ubicacion)[producto.id]
+
                 if tipo == 'Salida':
-                    if producto.stock_actual < cantidad:
+                    if en_ubicacion < cantidad:
                         return Response({
                             'error': 'Stock insuficiente.',
-                            'stockDisponible': producto.stock_actual
+                            'stockDisponible': en_ubicacion
                         }, status=400)
                     producto.stock_actual -= cantidad
+                    en_ubicacion -= cantidad
                 else:
                     producto.stock_actual += cantidad
+                    en_ubicacion += cantidad
                 
-                producto.save()
+                guardar_stock([producto])
                 
                 Movimiento.objects.create(
-                    tipo=tipo, producto=producto, cantidad=cantidad, usuario=request.user
+                    tipo=tipo, producto=producto, cantidad=cantidad, usuario=request.user, ubicacion_id=ubicacion
+                )
+                registrar_cambios(
+                    [(producto, antes)],
+                    entradas=int(tipo == 'Entrada'),
+                    salidas=int(tipo == 'Salida'),
+                    ubicacion=ubicacion,
+                    versionados=True
                 )
                 
                 bajo_stock = False
@@ -168,6 +553,8 @@ class MovimientoViewSet(viewsets.ViewSet):
                 return Response({
                     'message': f'{tipo} registrada exitosamente.',
                     'productoActualizado': ProductoSerializer(producto).data,
+                    'ubicacion': ubicacion,
+                    'stockUbicacion': en_ubicacion,
                     'bajoStock': bajo_stock
                 }, status=201)
 
@@ -175,124 +562,387 @@ class MovimientoViewSet(viewsets.ViewSet):
             return Response({'error': 'Producto no encontrado.'}, status=404)
 
 # --- VENTAS (POS) - AQUÍ ESTÁ LA CORRECCIÓN PRINCIPAL ---
-class VentaViewSet(viewsets.ReadOnlyModelViewSet):
-    queryset = Venta.objects.all().order_by('-fecha')
+class VentaViewSet(RespuestaCondicionalMixin, viewsets.ReadOnlyModelViewSet):
+    # Usuario y detalles con su producto en consultas fijas, no una por venta
+    queryset = Venta.objects.select_related('usuario').prefetch_related(
+        Prefetch('detalles', queryset=DetalleVenta.objects.select_related('producto').order_by('id'))
+    ).order_by('-fecha', '-id')
     serializer_class = VentaSerializer
     permission_classes = [permissions.IsAuthenticated]
 
+    @action(detail=False, methods=['get'])
+    def exportar(self, request):
+        """Una fila por detalle de venta, con los datos de la venta repetidos."""
+        encabezados = [
+            'folio', 'fecha', 'Usuario', 'total', 'SKU', 'Nombre_Producto',
+            'cantidad', 'precio_unitario', 'subtotal'
+        ]
+        try:
+            queryset = filtrar_rango_fechas(DetalleVenta.objects.all(), request.query_params, 'venta__fecha')
+            return respuesta_exportacion(
+                'ventas',
+                encabezados,
+                queryset.order_by('venta__fecha', 'venta_id', 'id').values_list(
+                    'venta__folio', 'venta__fecha', 'venta__usuario__email', 'venta__total',
+                    'producto__sku', 'producto__nombre', 'cantidad', 'precio_unitario', 'subtotal'
+                ),
+                request.query_params.get('formato', 'csv')
+            )
+        except ValueError as e:
+            return Response({'error': str(e)}, status=400)
+
     # Aseguramos que acepte POST para solucionar el error 405
     @action(detail=False, methods=['post'])
     def registrar(self, request):
-        items = request.data.get('items', [])
         total_recibido = request.data.get('total')
 
-        if not items:
-            return Response({'error': 'El carrito está vacío.'}, status=400)
+        try:
+            lineas = leer_lineas(request.data.get('items', []))
+            clave = leer_clave(request.data.get('clave_idempotencia'))
+            carrito = request.data.get('carrito')
+            if carrito is not None:
+                carrito = leer_carrito(carrito)
+            ubicacion = leer_ubicacion(request.data.get('ubicacion'))
+
+            # Un reintento de una venta ya registrada devuelve el ticket original
+            if clave is not None:
+                venta = venta_por_clave(clave)
+                if venta is not None:
+                    return Response({'message': 'La venta ya estaba registrada', 'ticket': ticket_registrado(venta)})
+
+            # Folio consecutivo por caja; se reserva fuera de la transacción de la
+            # venta para que un rollback no provoque folios repetidos
+            folio_nuevo = siguiente_folio(request.data.get('caja'))
+
+            try:
+                with transaction.atomic():
+                    pedido = {'folio': folio_nuevo, 'total': total_recibido, 'lineas': lineas, 'clave': clave}
+                    if carrito is not None:
+                        # Lo reservado por el carrito ya está apartado: se descuenta sin bloquear el producto
+                        pedido['cubierto'] = consumir(request.user, carrito, requerido_por_producto(lineas))
+                    resultado = aplicar_ventas(request.user, [pedido], ubicacion=ubicacion)[0]
+                    if isinstance(resultado, VentaRechazada):
+                        raise resultado
+                    venta, items_ticket = resultado
+            except IntegrityError:
+                # Otra petición con la misma clave se confirmó primero: su ticket es el de esta venta
+                venta = venta_por_clave(clave) if clave is not None else None
+                if venta is None:
+                    raise
+                return Response({'message': 'La venta ya estaba registrada', 'ticket': ticket_registrado(venta)})
+
+            # --- RESPUESTA FINAL CON DATOS DEL TICKET ---
+            return Response({
+                'message': 'Venta registrada exitosamente',
+                'ticket': ticket(venta, items_ticket, request.user)
+            }, status=201)
+
+        except (VentaRechazada, ReservaRechazada, StockUbicacionInsuficiente) as e:
+            return Response({'error': str(e)}, status=e.status)
+        except Exception as e:
+            return Response({'error': str(e)}, status=400)
 
+    @action(detail=False, methods=['post'])
+    def lote(self, request):
+        """Ventas encoladas sin conexión, cada una con su ``clave_idempotencia``.
+
+        Se aplican en bloques de ``bloque`` ventas por transacción y se responde
+        el resultado de cada una; reenviar el mismo lote es seguro.
+        """
+        ventas = request.data.get('ventas')
+        if not isinstance(ventas, list) or not ventas:
+            return Response({'error': "Envía una lista no vacía en 'ventas'."}, status=400)
+        if len(ventas) > MAX_VENTAS_LOTE:
+            return Response({'error': f'Máximo {MAX_VENTAS_LOTE} ventas por lote.'}, status=400)
+        caja = request.data.get('caja')
         try:
-            with transaction.atomic():
-                # Creamos un folio único basado en el tiempo
-                folio_nuevo = f"V-{int(time.time())}"
-                
-                venta = Venta.objects.create(
-                    folio=folio_nuevo,
-                    total=total_recibido,
-                    usuario=request.user
-                    # La fecha se pone sola si tienes auto_now_add=True en el modelo
-                )
+            prefijo_para(caja)
+            bloque = int(request.data.get('bloque', TAMANO_BLOQUE_VENTAS))
+            ubicacion = leer_ubicacion(request.data.get('ubicacion'))
+        except (TypeError, ValueError) as e:
+            return Response({'error': str(e)}, status=400)
 
-                # Lista para guardar los datos del ticket
-                items_ticket = []
+        reporte = LoteVentas(request.user, caja, bloque, ubicacion).ejecutar(ventas)
+        pendientes = reporte['rechazadas'] or reporte['errores']
+        return Response(reporte, status=207 if pendientes else 201)
 
-                for item in items:
-                    prod_id = item.get('id_producto') # O SKU, depende de tu frontend
-                    cantidad = int(item.get('cantidad'))
-                    precio = float(item.get('precio')) # Aseguramos que sea número
+# --- DASHBOARD ---
+class DashboardView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
 
-                    # Bloqueamos el producto para evitar condiciones de carrera
-                    producto_db = Producto.objects.select_for_update().get(id=prod_id)
+    def get(self, request):
+        # Totales mantenidos incrementalmente (ver core/inventario.py)
+        resumen = leer_resumen()
 
-                    if producto_db.stock_actual < cantidad:
-                        raise Exception(f"Stock insuficiente para {producto_db.nombre}")
+        return Response({
+            'totalProductos': resumen['total_productos'],
+            'totalStock': resumen['total_stock'],
+            'valorInventario': resumen['valor_inventario'],
+            'productosBajoStock': resumen['productos_bajo_stock'],
+            'totalEntradas': resumen['total_entradas'],
+            'totalSalidas': resumen['total_salidas'],
+            # También incrementales: ResumenUbicacion (ver core/ubicaciones.py)
+            'stockPorUbicacion': leer_stock_ubicaciones()
+        })
+
+# --- UBICACIONES ---
+class UbicacionViewSet(RespuestaCondicionalMixin, viewsets.ModelViewSet):
+    queryset = Ubicacion.objects.all().order_by('id')
+    serializer_class = UbicacionSerializer
+    # Se desactivan en lugar de borrarse: sus movimientos las siguen referenciando
+    http_method_names = ['get', 'post', 'patch', 'head', 'options']
 
-                    # Descontamos stock
-                    producto_db.stock_actual -= cantidad
-                    producto_db.save()
+    def get_permissions(self):
+        if self.action in ['create', 'partial_update']:
+            return [permissions.IsAuthenticated(), IsSuperadmin()]
+        return [permissions.IsAuthenticated()]
 
-                    # Calculamos subtotal
-                    subtotal_item = precio * cantidad
+    @transaction.atomic
+    def perform_create(self, serializer):
+        serializer.save()
+        tocar_revision()
+
+    @transaction.atomic
+    def perform_update(self, serializer):
+        if serializer.validated_data.get('is_active') is False and StockUbicacion.objects.filter(
+                ubicacion=serializer.instance, stock__gt=0).exists():
+            raise ValidationError({'is_active': 'La ubicación tiene stock; transfiérelo antes de desactivarla.'})
+        serializer.save()
+        tocar_revision()
+
+# --- CIERRES Y STOCK A UNA FECHA ---
+class CierreStockView(APIView):
+    def get_permissions(self):
+        if self.request.method == 'POST':
+            return [permissions.IsAuthenticated(), IsSuperadmin()]
+        return [permissions.IsAuthenticated()]
 
-                    # Guardamos el detalle
-                    DetalleVenta.objects.create(
-                        venta=venta,
-                        producto=producto_db,
-                        cantidad=cantidad,
-                        precio_unitario=precio,
-                        subtotal=subtotal_item
-                    )
-                    
-                    # Guardamos movimiento en Kardex
-                    Movimiento.objects.create(
-                        tipo='Salida',
-                        producto=producto_db,
-                        cantidad=cantidad,
-                        usuario=request.user
-                    )
+    def get(self, request):
+        cierres = CierreStock.objects.all()[:100]
+        return Response(CierreStockSerializer(cierres, many=True).data)
 
-                    # --- ARMADO DEL TICKET ---
-                    items_ticket.append({
-                        "producto": producto_db.nombre,
-                        "cantidad": cantidad,
-                        "precio_unit": precio,
-                        "subtotal": subtotal_item
-                    })
+    def post(self, request):
+        try:
+            fecha_corte = parsear_fecha(request.data.get('fecha_corte'))
+            cierre = cerrar_periodo(request.data.get('tipo', 'Diario'), fecha_corte)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=400)
+        return Response(CierreStockSerializer(cierre).data, status=201)
 
-                # --- RESPUESTA FINAL CON DATOS DEL TICKET ---
-                return Response({
-                    'message': 'Venta registrada exitosamente',
-                    'ticket': {
-                        'folio': folio_nuevo,
-                        'fecha': datetime.now().strftime("%d/%m/%Y %H:%M"),
-                        'cajero': request.user.email, # O username
-                        'items': items_ticket,
-                        'total': total_recibido
-                    }
-                }, status=201)
+class StockEnFechaView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
 
-        except Producto.DoesNotExist:
-            return Response({'error': 'Uno de los productos no existe.'}, status=404)
-        except Exception as e:
+    def get(self, request):
+        try:
+            fecha = parsear_fecha(request.query_params.get('fecha'))
+        except ValueError as e:
             return Response({'error': str(e)}, status=400)
+        if fecha is None:
+            return Response({'error': "El parámetro 'fecha' es obligatorio."}, status=400)
+
+        sku = request.query_params.get('sku')
+        if sku:
+            producto = Producto.objects.filter(sku=sku).first()
+            if producto is None:
+                return Response({'error': 'Producto no encontrado.'}, status=404)
+            stocks, cierre = stock_en_fecha(fecha, [producto.id])
+            if producto.id not in stocks:
+                return Response({'error': 'El producto no existía en esa fecha.'}, status=404)
+            stock, costo, _ = stocks[producto.id]
+            return Response({
+                'SKU': producto.sku,
+                'fecha': fecha,
+                'stock': stock,
+                'costo': costo,
+                'valor': stock * costo,
+                'cierreBase': cierre.fecha_corte if cierre else None
+            })
+
+        stocks, cierre = stock_en_fecha(fecha)
+        activos = [(stock, costo) for stock, costo, activo in stocks.values() if activo]
+        return Response({
+            'fecha': fecha,
+            'totalProductos': len(activos),
+            'totalStock': sum(stock for stock, _ in activos),
+            'valorInventario': sum(stock * costo for stock, costo in activos),
+            'cierreBase': cierre.fecha_corte if cierre else None
+        })
+
+# --- ALERTAS DE STOCK BAJO ---
+class AlertasStockView(APIView):
+    """Alertas activas; con ``desde=<version>`` solo las que cambiaron, incluidas las resueltas."""
+    permission_classes = [permissions.IsAuthenticated]
 
-# --- DASHBOARD ---
-class DashboardView(APIView):
+    def get(self, request):
+        desde = request.query_params.get('desde')
+        if desde is not None:
+            try:
+                desde = int(desde)
+            except ValueError:
+                return Response({'error': "El parámetro 'desde' debe ser un número entero."}, status=400)
+
+        version, filas = listar_alertas(desde)
+        return Response({
+            'version': version,
+            'alertas': [{
+                'ID_Producto': fila['producto_id'],
+                'SKU': fila['producto__sku'],
+                'Nombre_Producto': fila['producto__nombre'],
+                'Stock_Actual': fila['stock'],
+                'Nivel_Minimo_Stock': fila['minimo'],
+                'activa': fila['activa'],
+                'fecha': fila['fecha'],
+            } for fila in filas]
+        })
+
+
+# --- RESERVAS DE CARRITOS ---
+class ReservasView(APIView):
+    """Reservas del carrito ``carrito`` del usuario: consultar, apartar un producto o liberar todo."""
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
-        total_productos = Producto.objects.filter(is_active=True).count()
-        
-        # Calculamos valor solo de productos activos
-        valor_inventario = sum([p.stock_actual * p.costo for p in Producto.objects.filter(is_active=True)])
-        
-        total_stock = Producto.objects.filter(is_active=True).aggregate(Sum('stock_actual'))['stock_actual__sum'] or 0
-        
-        # --- AQUÍ ESTÁ EL CAMBIO CLAVE ---
-        # Contamos si:
-        # 1. Tiene configuración de alerta Y el stock es bajo.
-        # 2. O (OR) si el stock es 0 (aunque no tenga configuración).
-        productos_bajo_stock = Producto.objects.filter(is_active=True).filter(
-            Q(nivel_minimo_stock__gt=0, stock_actual__lte=F('nivel_minimo_stock')) | 
-            Q(stock_actual=0)
-        ).count()
-
-        total_entradas = Movimiento.objects.filter(tipo='Entrada').count()
-        total_salidas = Movimiento.objects.filter(tipo='Salida').count()
+        try:
+            carrito = leer_carrito(request.query_params.get('carrito'))
+        except ReservaRechazada as e:
+            return Response({'error': str(e)}, status=e.status)
+        reservas = Reserva.objects.filter(usuario=request.user, carrito=carrito).order_by('id').values(
+            'producto_id', 'producto__sku', 'producto__nombre', 'cantidad', 'expira'
+        )
+        return Response({
+            'carrito': carrito,
+            'reservas': [{
+                'ID_Producto': r['producto_id'],
+                'SKU': r['producto__sku'],
+                'Nombre_Producto': r['producto__nombre'],
+                'cantidad': r['cantidad'],
+                'expira': r['expira'],
+            } for r in reservas]
+        })
 
+    def post(self, request):
+        """Deja en ``cantidad`` lo reservado de ``id_producto``; 0 lo libera."""
+        try:
+            carrito = leer_carrito(request.data.get('carrito'))
+            id_producto = int(request.data.get('id_producto'))
+            reserva = reservar(request.user, carrito, id_producto, request.data.get('cantidad'))
+        except ReservaRechazada as e:
+            return Response({'error': str(e)}, status=e.status)
+        except (TypeError, ValueError):
+            return Response({'error': "'id_producto' debe ser un número entero."}, status=400)
+
+        producto = Producto.objects.filter(id=id_producto).values('sku', 'stock_actual', 'stock_reservado').first()
+        if producto is None:
+            return Response({'error': 'Producto no encontrado.'}, status=404)
         return Response({
-            'totalProductos': total_productos,
-            'totalStock': total_stock,
-            'valorInventario': valor_inventario,
-            'productosBajoStock': productos_bajo_stock,
-            'totalEntradas': total_entradas,
-            'totalSalidas': total_salidas
-        })
\ No newline at end of file
+            'carrito': carrito,
+            'ID_Producto': id_producto,
+            'SKU': producto['sku'],
+            'cantidad': reserva.cantidad if reserva else 0,
+            'expira': reserva.expira if reserva else None,
+            'Stock_Actual': producto['stock_actual'],
+            'Stock_Reservado': producto['stock_reservado'],
+            'Stock_Disponible': producto['stock_actual'] - producto['stock_reservado'],
+        })
+
+    def delete(self, request):
+        try:
+            carrito = leer_carrito(request.query_params.get('carrito'))
+        except ReservaRechazada as e:
+            return Response({'error': str(e)}, status=e.status)
+        return Response({'carrito': carrito, 'liberadas': liberar_carrito(request.user, carrito)})
+
+
+# --- ANALÍTICA DE VENTAS ---
+AGRUPACIONES = {
+    'dia': None,
+    'semana': TruncWeek,
+    'mes': TruncMonth,
+}
+
+class AnaliticaVentasView(APIView):
+    """Totales de venta por día, semana o mes leídos de los rollups diarios.
+
+    Como en el Kardex, un Operador solo ve sus propias ventas.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        params = request.query_params
+        agrupacion = params.get('agrupacion', 'dia')
+        if agrupacion not in AGRUPACIONES:
+            return Response({'error': "La agrupación debe ser 'dia', 'semana' o 'mes'."}, status=400)
+
+        try:
+            filas = filtrar_rango_fechas(VentaDiariaCajero.objects.all(), params)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=400)
+        if request.user.role != 'Superadmin':
+            filas = filas.filter(usuario_id=request.user.id)
+        elif params.get('usuario'):
+            filas = filas.filter(usuario__email=params['usuario'])
+
+        truncar = AGRUPACIONES[agrupacion]
+        periodo = truncar('fecha') if truncar else F('fecha')
+        filas = (
+            filas.annotate(periodo=periodo)
+            .values('periodo')
+            .annotate(ventas=Sum('num_ventas'), unidades=Sum('unidades'), importe=Sum('importe'))
+            .order_by('periodo')
+        )
+        return Response({'agrupacion': agrupacion, 'resultados': list(filas)})
+
+class TopProductosView(APIView):
+    """Productos más vendidos en un rango, por unidades o por importe."""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        params = request.query_params
+        orden = params.get('orden', 'unidades')
+        if orden not in ('unidades', 'importe'):
+            return Response({'error': "El orden debe ser 'unidades' o 'importe'."}, status=400)
+
+        try:
+            limite = leer_limite(params, default=10, maximo=100)
+            filas = filtrar_rango_fechas(VentaDiariaProducto.objects.all(), params)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=400)
+        categoria = params.get('categoria')
+        if categoria and not categoria.isdigit():
+            return Response({'error': 'La categoría debe ser un id numérico.'}, status=400)
+        if categoria:
+            filas = filas.filter(producto__categoria_id=int(categoria))
+
+        filas = (
+            filas.values('producto_id')
+            .annotate(unidades=Sum('unidades'), importe=Sum('importe'))
+            .order_by(f'-{orden}', 'producto_id')[:limite]
+        )
+        ranking = list(filas)
+        productos = Producto.objects.in_bulk([f['producto_id'] for f in ranking])
+        return Response({
+            'orden': orden,
+            'resultados': [
+                {
+                    'ID_Producto': f['producto_id'],
+                    'SKU': productos[f['producto_id']].sku,
+                    'Nombre_Producto': productos[f['producto_id']].nombre,
+                    'unidades': f['unidades'],
+                    'importe': f['importe']
+                }
+                for f in ranking
+            ]
+        })
+
+
+# --- RENDIMIENTO ---
+class RendimientoView(APIView):
+    """Estadísticas por endpoint de InstrumentacionMiddleware (solo del proceso que responde)."""
+    permission_classes = [permissions.IsAuthenticated, IsSuperadmin]
+
+    def get(self, request):
+        return Response(estadisticas_rendimiento.resumen())
+
+    def delete(self, request):
+        estadisticas_rendimiento.reiniciar()
+        return Response(status=204)
@@ -0,0 +1,188 @@
+"""Vistas de lectura asíncronas para el modo ASGI.
+
+Son las mismas consultas que los endpoints de DRF (``/api/dashboard/metrics``,
+``/api/productos``, ``/api/movimientos`` y ``/api/ventas``) pero escritas como
+vistas async de Django, de modo que bajo un servidor ASGI una lectura que espera
+a la base de datos no bloquea un hilo del worker. DRF no tiene vistas async,
+así que aquí se autentica el JWT a mano y las filas se arman desde ``values()``
+con el mismo formato que los serializadores. Las pruebas de paridad en
+``core/tests.py`` comparan ambas respuestas.
+
+Los endpoints de escritura siguen en ``core/views.py``: son transaccionales y
+bajo ASGI Django los ejecuta en un hilo aparte sin cambios.
+"""
+import functools
+from collections import defaultdict
+
+from django.http import HttpResponse
+from django.views.decorators.http import require_GET
+from rest_framework import serializers
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.settings import api_settings
+from rest_framework_simplejwt.exceptions import InvalidToken
+
+from .autenticacion import autenticar_async
+from .catalogo import CAMPOS as CAMPOS_CATALOGO, con_ubicaciones, fila_producto, filtrar_catalogo
+from .filtros import filtrar_movimientos
+from .inventario import aleer_resumen
+from .models import DetalleVenta, Movimiento, Producto, Venta
+from .paginacion import apaginar_keyset, leer_limite
+from .ubicaciones import aagregar_stock_ubicaciones, aleer_stock_ubicaciones
+
+CAMPOS_MOVIMIENTO = (
+    'id', 'tipo', 'cantidad', 'fecha', 'producto__nombre', 'producto__sku', 'usuario__email',
+    'ubicacion_id', 'ubicacion_destino_id',
+)
+CAMPOS_VENTA = ('id', 'folio', 'fecha', 'total', 'usuario__email')
+CAMPOS_DETALLE = ('venta_id', 'cantidad', 'precio_unitario', 'subtotal', 'producto__nombre')
+
+# Mismo formato de fechas y decimales que los serializadores
+_fecha = serializers.DateTimeField()
+_importe = serializers.DecimalField(max_digits=10, decimal_places=2)
+
+
+def _json(datos, status=200):
+    # El mismo renderer JSON que usa DRF (ver DEFAULT_RENDERER_CLASSES)
+    renderer = api_settings.DEFAULT_RENDERER_CLASSES[0]()
+    return HttpResponse(renderer.render(datos), status=status, content_type='application/json')
+
+
+def requiere_jwt(vista):
+    """Autentica con el mismo JWT que DRF; responde 401 igual que ``IsAuthenticated``."""
+    @functools.wraps(vista)
+    async def envoltura(request, *args, **kwargs):
+        try:
+            usuario = await autenticar_async(request)
+        except (InvalidToken, AuthenticationFailed) as e:
+            detalle = e.detail if isinstance(e.detail, dict) else {'detail': e.detail}
+            return _json(detalle, status=401)
+        if usuario is None:
+            return _json({'detail': 'Authentication credentials were not provided.'}, status=401)
+        request.user = usuario
+        return await vista(request, *args, **kwargs)
+    return envoltura
+
+
+def fila_movimiento(valores):
+    fila = {
+        'id': valores['id'],
+        'tipo': valores['tipo'],
+        'Cantidad': valores['cantidad'],
+        'Fecha': _fecha.to_representation(valores['fecha']),
+    }
+    # Igual que el serializador: sin producto o usuario se omiten sus campos
+    if valores['producto__sku'] is not None:
+        fila['Nombre_Producto'] = valores['producto__nombre']
+    if valores['usuario__email'] is not None:
+        fila['Email_Usuario'] = valores['usuario__email']
+    if valores['producto__sku'] is not None:
+        fila['SKU'] = valores['producto__sku']
+    fila['Ubicacion'] = valores['ubicacion_id']
+    fila['Ubicacion_Destino'] = valores['ubicacion_destino_id']
+    return fila
+
+
+async def filas_ventas(ventas):
+    """Ventas con sus detalles anidados, en dos consultas."""
+    detalles = defaultdict(list)
+    ids = [v['id'] for v in ventas]
+    async for d in DetalleVenta.objects.filter(venta_id__in=ids).order_by('id').values(*CAMPOS_DETALLE):
+        detalles[d['venta_id']].append({
+            'cantidad': d['cantidad'],
+            'precio_unitario': _importe.to_representation(d['precio_unitario']),
+            'subtotal': _importe.to_representation(d['subtotal']),
+            'Nombre_Producto': d['producto__nombre'],
+        })
+
+    filas = []
+    for v in ventas:
+        fila = {
+            'id': v['id'],
+            'folio': v['folio'],
+            'fecha': _fecha.to_representation(v['fecha']),
+            'total': _importe.to_representation(v['total']),
+        }
+        if v['usuario__email'] is not None:
+            fila['Usuario'] = v['usuario__email']
+        fila['detalles'] = detalles[v['id']]
+        filas.append(fila)
+    return filas
+
+
+async def _listado(queryset, params, orden, armar):
+    """Lista completa, o página keyset si llegan ``cursor`` o ``limite``."""
+    if 'cursor' in params or 'limite' in params:
+        try:
+            filas, siguiente = await apaginar_keyset(queryset, orden, params.get('cursor'), leer_limite(params))
+        except ValueError as e:
+            return _json({'error': str(e)}, status=400)
+        return _json({'resultados': await armar(filas), 'siguienteCursor': siguiente})
+
+    return _json(await armar([fila async for fila in queryset.order_by(*orden)]))
+
+
+# --- DASHBOARD ---
+@require_GET
+@requiere_jwt
+async def dashboard(request):
+    resumen = await aleer_resumen()
+    return _json({
+        'totalProductos': resumen['total_productos'],
+        'totalStock': resumen['total_stock'],
+        'valorInventario': resumen['valor_inventario'],
+        'productosBajoStock': resumen['productos_bajo_stock'],
+        'totalEntradas': resumen['total_entradas'],
+        'totalSalidas': resumen['total_salidas'],
+        'stockPorUbicacion': await aleer_stock_ubicaciones()
+    })
+
+
+# --- PRODUCTOS ---
+async def _filas_productos(filas):
+    return [fila_producto(v) for v in filas]
+
+
+async def _filas_productos_ubicaciones(filas):
+    return await aagregar_stock_ubicaciones([fila_producto(v) for v in filas])
+
+
+@require_GET
+@requiere_jwt
+async def productos(request):
+    try:
+        queryset = filtrar_catalogo(request.GET)
+    except ValueError as e:
+        return _json({'error': str(e)}, status=400)
+    armar = _filas_productos_ubicaciones if con_ubicaciones(request.GET) else _filas_productos
+    return await _listado(queryset.values(*CAMPOS_CATALOGO), request.GET, ('id',), armar)
+
+
+@require_GET
+@requiere_jwt
+async def producto(request, sku):
+    valores = await Producto.objects.filter(is_active=True, sku=sku).values(*CAMPOS_CATALOGO).afirst()
+    if valores is None:
+        return _json({'detail': 'No Producto matches the given query.'}, status=404)
+    return _json(fila_producto(valores))
+
+
+# --- MOVIMIENTOS ---
+async def _filas_movimientos(filas):
+    return [fila_movimiento(v) for v in filas]
+
+
+@require_GET
+@requiere_jwt
+async def movimientos(request):
+    try:
+        queryset = filtrar_movimientos(Movimiento.objects.all(), request.GET, request.user)
+    except ValueError as e:
+        return _json({'error': str(e)}, status=400)
+    return await _listado(queryset.values(*CAMPOS_MOVIMIENTO), request.GET, ('-fecha', '-id'), _filas_movimientos)
+
+
+# --- VENTAS ---
+@require_GET
+@requiere_jwt
+async def ventas(request):
+    return await _listado(Venta.objects.values(*CAMPOS_VENTA), request.GET, ('-fecha', '-id'), filas_ventas)
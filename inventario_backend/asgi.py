@@ -3,6 +3,14 @@ ASGI config for inventario_backend project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Modo ASGI: ``start.sh`` con ``MODO_SERVIDOR=asgi`` ejecuta
+``gunicorn inventario_backend.asgi:application -k uvicorn_worker.UvicornWorker``.
+Las lecturas bajo ``/api/async/`` (ver ``core/vistas_async.py``) corren como
+vistas async sin ocupar un hilo mientras esperan a la base de datos; los demás
+endpoints de DRF funcionan igual que en WSGI, ejecutados en un hilo aparte.
+En este modo ``settings.py`` desactiva las conexiones persistentes
+(``CONN_MAX_AGE=0``); para reutilizarlas conviene un pooler externo.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -9,14 +9,24 @@ from core.views import (
     DashboardView, 
     CustomLoginView, 
     RegisterView, 
-    VentaViewSet 
+    VentaViewSet,
+    CierreStockView,
+    StockEnFechaView,
+    AlertasStockView,
+    ReservasView,
+    AnaliticaVentasView,
+    TopProductosView,
+    RendimientoView,
+    UbicacionViewSet
 )
+from core import vistas_async
 
 router = DefaultRouter()
 router.register(r'usuarios', UsuarioViewSet)
 router.register(r'productos', ProductoViewSet)
 router.register(r'categorias', CategoriaViewSet)
 router.register(r'ventas', VentaViewSet, basename='ventas')
+router.register(r'ubicaciones', UbicacionViewSet)
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -31,6 +41,31 @@ urlpatterns = [
     path('api/movimientos', MovimientoViewSet.as_view({'get': 'list'})),
     path('api/movimientos/entrada', MovimientoViewSet.as_view({'post': 'entrada'})),
     path('api/movimientos/salida', MovimientoViewSet.as_view({'post': 'salida'})),
+    path('api/movimientos/exportar', MovimientoViewSet.as_view({'get': 'exportar'})),
+    path('api/movimientos/lote', MovimientoViewSet.as_view({'post': 'lote'})),
+    path('api/movimientos/transferencia', MovimientoViewSet.as_view({'post': 'transferencia'})),
+
+    # Cierres y stock a una fecha
+    path('api/stock/cierres', CierreStockView.as_view()),
+    path('api/stock/fecha', StockEnFechaView.as_view()),
+    path('api/stock/alertas', AlertasStockView.as_view()),
+
+    # Reservas de carritos abiertos
+    path('api/reservas', ReservasView.as_view()),
+
+    # Analítica de ventas
+    path('api/analitica/ventas', AnaliticaVentasView.as_view()),
+    path('api/analitica/top-productos', TopProductosView.as_view()),
+
+    # Rendimiento por endpoint (Superadmin)
+    path('api/rendimiento', RendimientoView.as_view()),
+
+    # Lecturas async (modo ASGI, ver core/vistas_async.py)
+    path('api/async/dashboard/metrics', vistas_async.dashboard),
+    path('api/async/productos', vistas_async.productos),
+    path('api/async/productos/<str:sku>', vistas_async.producto),
+    path('api/async/movimientos', vistas_async.movimientos),
+    path('api/async/ventas', vistas_async.ventas),
 
     # Ventas (POS)
     ##path('api/ventas/registrar', VentaViewSet.as_view({'post': 'registrar'})),
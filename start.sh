@@ -0,0 +1,11 @@
+#!/usr/bin/env bash
+# Script de arranque para Render
+# MODO_SERVIDOR=asgi sirve con workers de uvicorn (vistas async en /api/async/);
+# por defecto se usa el WSGI de siempre.
+set -o errexit
+
+if [ "${MODO_SERVIDOR:-wsgi}" = "asgi" ]; then
+    exec gunicorn inventario_backend.asgi:application -k uvicorn_worker.UvicornWorker
+else
+    exec gunicorn inventario_backend.wsgi:application
+fi